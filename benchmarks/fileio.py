@@ -0,0 +1,95 @@
+'''Benchmark Path file I/O against naive open().read() / write().
+
+    python benchmarks/fileio.py [--size MiB] [--files N]
+
+(Not named io.py, it would shadow the io module for this script.)
+'''
+from __future__ import with_statement
+import os
+import sys
+import time
+import shutil
+import tempfile
+import optparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from cu import Path
+from cu.atomic import AtomicBatch
+
+
+def timed(label, func, repeat=5):
+    best = None
+    for _ in range(repeat):
+        start = time.time()
+        func()
+        elapsed = time.time() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    print('%-32s %8.4fs' % (label, best))
+
+
+def naive_read(path):
+    with open(path, 'rb') as fh:
+        return fh.read()
+
+
+def naive_lines(path):
+    with open(path, 'rb') as fh:
+        return sum(1 for line in fh)
+
+
+def naive_write(path, data):
+    with open(path, 'wb') as fh:
+        fh.write(data)
+        fh.flush()
+        os.fsync(fh.fileno())
+
+
+def main():
+    parser = optparse.OptionParser()
+    parser.add_option('--size', type='int', default=64, help='MiB file to read')
+    parser.add_option('--files', type='int', default=200, help='small files to write atomically')
+    options, args = parser.parse_args()
+    root = tempfile.mkdtemp(prefix='cuprum_bench_')
+    try:
+        big = Path(root) / 'big'
+        big.write_bytes(os.urandom(1024) * 1024 * options.size)
+        lines = Path(root) / 'lines'
+        lines.write_bytes(('x' * 79 + '\n').encode('ascii') * (options.size * 1024 * 1024 // 80))
+
+        timed('open().read()', lambda: naive_read(str(big)))
+        timed('Path.read_bytes()', big.read_bytes)
+
+        def mapped():
+            m = big.mmap()
+            m.find('needle'.encode('ascii'))
+            m.close()
+        timed('Path.mmap().find()', mapped)
+        timed('open() line iteration', lambda: naive_lines(str(lines)))
+        timed('Path.iter_lines()', lambda: sum(1 for line in lines.iter_lines()))
+
+        data = 'small file contents\n'.encode('ascii')
+        small = [os.path.join(root, 'small%d' % i) for i in range(options.files)]
+
+        def each_fsync():
+            for path in small:
+                naive_write(path, data)
+        timed('open().write()+fsync x%d' % options.files, each_fsync, 1)
+
+        def each_atomic():
+            for path in small:
+                Path(path).write_atomic(data)
+        timed('write_atomic() x%d' % options.files, each_atomic, 1)
+
+        def batched():
+            with AtomicBatch() as batch:
+                for path in small:
+                    batch.write(path, data)
+        timed('AtomicBatch x%d' % options.files, batched, 1)
+    finally:
+        shutil.rmtree(root)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+'''Benchmark cu.walk.walk against os.walk on a synthetic tree.
+
+    python benchmarks/walk.py [--latency SECONDS]
+
+``--latency`` sleeps in every directory listing to imitate an NFS/FUSE
+round trip, which is where the parallel walker pays off.
+'''
+from __future__ import with_statement
+import os
+import sys
+import time
+import shutil
+import tempfile
+import optparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from cu.walk import walk
+
+
+def make_tree(root, width, depth, files):
+    if depth == 0:
+        return
+    for i in range(files):
+        open(os.path.join(root, 'f%d' % i), 'w').close()
+    for i in range(width):
+        sub = os.path.join(root, 'd%d' % i)
+        os.mkdir(sub)
+        make_tree(sub, width, depth - 1, files)
+
+
+def timed(label, func):
+    start = time.time()
+    count = 0
+    for dirpath, dirnames, filenames in func():
+        count += len(filenames)
+    print('%-24s %8.3fs  %d files' % (label, time.time() - start, count))
+
+
+def main():
+    parser = optparse.OptionParser()
+    parser.add_option('--width', type='int', default=6)
+    parser.add_option('--depth', type='int', default=4)
+    parser.add_option('--files', type='int', default=20)
+    parser.add_option('--latency', type='float', default=0.0)
+    options, args = parser.parse_args()
+    root = tempfile.mkdtemp(prefix='cuprum_bench_')
+    try:
+        make_tree(root, options.width, options.depth, options.files)
+        if options.latency:
+            scandir = os.scandir
+
+            def slow_scandir(path):
+                time.sleep(options.latency)
+                return scandir(path)
+            os.scandir = slow_scandir
+        timed('os.walk', lambda: os.walk(root))
+        for workers in (1, 4, 16, 32):
+            timed('walk(workers=%d)' % workers, lambda: walk(root, workers))
+        timed('walk(16, ordered)', lambda: walk(root, 16, ordered=True))
+    finally:
+        shutil.rmtree(root)
+
+
+if __name__ == '__main__':
+    main()
@@ -6,11 +6,12 @@ import subprocess
 from tempfile import NamedTemporaryFile, mkstemp, mkdtemp
 
 from .command import (
-        FG, BG, ERROUT,
+        FG, BG, ERROUT, RunResult,
         CommandNotFound, ProcessExecutionError, ProcessTimedOut, RedirectionError
         )
 from .local import LocalSystem
 from .path import Path
+from .metrics import profile
 
 
 local = LocalSystem()
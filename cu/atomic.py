@@ -0,0 +1,179 @@
+'''Atomic
+
+Atomic file replacement: write a temporary file in the same directory,
+fsync it, rename it over the target, fsync the directory. Readers see the
+old contents or the new, never a torn file, and the new contents survive
+a crash once write returns.
+
+An AtomicBatch does the same for many files but defers the durability
+work to the end: every temporary file is fsynced concurrently (so the
+filesystem can commit them in one journal transaction), then all are
+renamed, then each directory involved is fsynced once.
+'''
+from __future__ import with_statement
+import os
+import sys
+import stat
+import tempfile
+import threading
+import logging
+log = logging.getLogger('cu.atomic')
+
+import six
+
+from cu.pool import WorkerPool, DEFAULT_WORKERS
+from cu.path import _umask, _NEW_FILE
+
+
+def _to_bytes(data, encoding):
+    if isinstance(data, bytes):
+        return data
+    return data.encode(encoding or 'utf-8')
+
+
+def _fsync_dir(dirpath):
+    '''Persist the directory entry of a rename; not every OS allows it.'''
+    try:
+        fd = os.open(dirpath or os.curdir, os.O_RDONLY | getattr(os, 'O_DIRECTORY', 0))
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def _fsync_file(path):
+    '''fsync a file already written and closed.'''
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _write_temp(path, data, fsync=False):
+    '''Write data to a new temp file next to path, with path's mode (or
+    the default a new file would get).
+    :param fsync: [False] fsync before closing it
+    :return: temp path
+    '''
+    dirpath, name = os.path.split(path)
+    try:
+        mode = stat.S_IMODE(os.stat(path).st_mode)
+    except OSError:
+        mode = _NEW_FILE & ~_umask()
+    fd, tmp = tempfile.mkstemp(prefix='.%s.' % (name, ), suffix='.cu-tmp', dir=dirpath or os.curdir)
+    try:
+        try:
+            os.fchmod(fd, mode)
+            view = memoryview(data)
+            while view:
+                view = view[os.write(fd, view):]
+            if fsync:
+                os.fsync(fd)
+        finally:
+            os.close(fd)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+    return tmp
+
+
+def write_atomic(path, data, encoding=None, fsync=True):
+    '''Replace the contents of path with data, atomically.
+    :param data: bytes, or text encoded with ``encoding``
+    :param encoding: [utf-8] for text data
+    :param fsync: [True] False skips fsyncs: still atomic, not durable
+    '''
+    path = str(path)
+    tmp = _write_temp(path, _to_bytes(data, encoding), fsync)
+    try:
+        os.rename(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+    if fsync:
+        _fsync_dir(os.path.dirname(path))
+
+
+class AtomicBatch(object):
+    '''Atomically replace many files, paying for durability once.
+    Files are written (and closed, so batches may be large) as added, and
+    become visible on commit (which is all or, on error, none of the
+    renames that have not happened yet).
+    Instances of this class may be used as *context-managers*, committing
+    on clean exit and discarding on exception.
+    '''
+    def __init__(self, fsync=True, workers=None):
+        '''
+        :param fsync: [True] False skips fsyncs: still atomic, not durable
+        :param workers: [8] threads fsyncing concurrently
+        '''
+        self.fsync = fsync
+        self.workers = workers
+        self._pending = list()
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, t, v, tb):
+        if t is None:
+            self.commit()
+        else:
+            self.discard()
+
+    def __len__(self):
+        return len(self._pending)
+
+    def write(self, path, data, encoding=None):
+        '''Write data to a temp file beside path; replaced on commit.'''
+        path = str(path)
+        tmp = _write_temp(path, _to_bytes(data, encoding))
+        with self._lock:
+            self._pending.append((tmp, path))
+
+    def commit(self):
+        '''fsync all temp files, rename them into place, fsync directories.'''
+        with self._lock:
+            pending, self._pending = self._pending, list()
+        try:
+            if self.fsync and pending:
+                with WorkerPool(min(self.workers or DEFAULT_WORKERS, len(pending))) as pool:
+                    for tmp, path in pending:
+                        pool.submit(_fsync_file, tmp)
+        except BaseException:
+            error = sys.exc_info()
+            self._discard(pending)
+            six.reraise(*error)
+        dirs = list()
+        for n, (tmp, path) in enumerate(pending):
+            try:
+                os.rename(tmp, path)
+            except BaseException:
+                error = sys.exc_info()
+                self._discard(pending[n:])
+                six.reraise(*error)
+            dirpath = os.path.dirname(path)
+            if dirpath not in dirs:
+                dirs.append(dirpath)
+        if self.fsync:
+            for dirpath in dirs:
+                _fsync_dir(dirpath)
+        log.info('Committed %d atomic writes' % (len(pending), ))
+
+    def _discard(self, pending):
+        for tmp, path in pending:
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+
+    def discard(self):
+        '''Drop all uncommitted writes.'''
+        with self._lock:
+            pending, self._pending = self._pending, list()
+        self._discard(pending)
@@ -0,0 +1,291 @@
+'''Batch
+
+Deferred bulk filesystem changes. A Batch records mkdir, touch, symlink,
+chown and chmod calls, drops repeats (the last chmod of a path wins), and
+on exit applies them in dependency order: directories parents first, then
+links and files, then ownership, then modes (so taking away write
+permission can't block an earlier step). Entries of one directory are
+changed through a single directory fd with the ``dir_fd`` variants of the
+syscalls, directories may be processed in parallel, and failures are
+collected and raised together at the end.
+'''
+from __future__ import with_statement
+import os
+import sys
+import stat
+import errno
+import threading
+import logging
+log = logging.getLogger('cu.batch')
+
+from cu.pool import WorkerPool
+from cu.path import parse_mode, _uid, _gid, _umask, _uses_umask, _NEW_FILE
+
+
+HAVE_DIR_FD = (
+        hasattr(os, 'supports_dir_fd')
+        and set([os.open, os.mkdir, os.symlink, os.utime, os.chmod, os.chown, os.stat, os.unlink,
+                 os.readlink]) <= os.supports_dir_fd)
+
+_O_DIR = os.O_RDONLY | getattr(os, 'O_DIRECTORY', 0)
+
+MKDIR = 'mkdir'
+SYMLINK = 'symlink'
+TOUCH = 'touch'
+CHOWN = 'chown'
+CHMOD = 'chmod'
+# order operations are applied in
+PHASES = (MKDIR, SYMLINK, TOUCH, CHOWN, CHMOD)
+
+_DIR_MODE = stat.S_IRWXU | stat.S_IRWXG | stat.S_IRWXO
+
+
+class BatchError(Exception):
+    '''Raised when a Batch is applied and any of its operations failed.
+    ``failures`` is a list of (operation, path, exception), in the order
+    the operations were attempted; the rest of the batch was applied.
+    '''
+    def __init__(self, failures):
+        super(BatchError, self).__init__(failures)
+        self.failures = failures
+
+    def __str__(self):
+        lines = ['%d operations failed:' % (len(self.failures), )]
+        lines.extend('%s %s: %s' % failure for failure in self.failures)
+        return '\n'.join(lines)
+
+
+def _at(dir_fd):
+    '''Keyword arguments addressing name relative to dir_fd, if there is one.'''
+    if dir_fd is None:
+        return dict()
+    return dict(dir_fd=dir_fd)
+
+
+def _mkdir(name, dir_fd, mode):
+    try:
+        os.mkdir(name, mode, **_at(dir_fd))
+    except OSError:
+        if sys.exc_info()[1].errno != errno.EEXIST:
+            raise
+        if not stat.S_ISDIR(os.stat(name, **_at(dir_fd)).st_mode):
+            raise
+
+
+def _symlink(name, dir_fd, target, force):
+    try:
+        os.symlink(target, name, **_at(dir_fd))
+    except OSError:
+        if sys.exc_info()[1].errno != errno.EEXIST:
+            raise
+        try:
+            current = os.readlink(name, **_at(dir_fd))
+        except OSError:
+            current = None
+        if current == target:
+            return
+        if not force:
+            raise
+        os.unlink(name, **_at(dir_fd))
+        os.symlink(target, name, **_at(dir_fd))
+
+
+def _touch(name, dir_fd, stamp):
+    times = None
+    if stamp is not None:
+        times = (stamp, stamp)
+    try:
+        os.utime(name, times, **_at(dir_fd))
+        return
+    except OSError:
+        if sys.exc_info()[1].errno != errno.ENOENT:
+            raise
+    os.close(os.open(name, os.O_WRONLY | os.O_CREAT, _NEW_FILE, **_at(dir_fd)))
+    os.utime(name, times, **_at(dir_fd))
+
+
+def _chown(name, dir_fd, uid, gid):
+    if dir_fd is None:
+        st = os.lstat(name)
+    else:
+        st = os.stat(name, dir_fd=dir_fd, follow_symlinks=False)
+    if uid in (-1, st.st_uid) and gid in (-1, st.st_gid):
+        return
+    if dir_fd is not None:
+        os.chown(name, uid, gid, dir_fd=dir_fd, follow_symlinks=False)
+    elif stat.S_ISLNK(st.st_mode):
+        os.lchown(name, uid, gid)
+    else:
+        os.chown(name, uid, gid)
+
+
+def _chmod(name, dir_fd, mode, umask):
+    st = os.stat(name, **_at(dir_fd))
+    bits = parse_mode(mode, st.st_mode, stat.S_ISDIR(st.st_mode), umask)
+    if bits != stat.S_IMODE(st.st_mode):
+        os.chmod(name, bits, **_at(dir_fd))
+
+
+class Batch(object):
+    '''Record filesystem changes, apply them together.
+    Instances of this class may be used as *context-managers*, applying
+    on clean exit and discarding on exception.
+    '''
+    def __init__(self, workers=1):
+        '''
+        :param workers: [1] threads applying changes, a directory per task
+        '''
+        self.workers = workers
+        self._ops = dict()  # (op, path) -> args
+        self._order = list()
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, t, v, tb):
+        if t is None:
+            self.apply()
+        else:
+            self.discard()
+
+    def __len__(self):
+        return len(self._ops)
+
+    def _record(self, op, path, *args):
+        key = (op, os.path.normpath(str(path)))
+        with self._lock:
+            if key not in self._ops:
+                self._order.append(key)
+            self._ops[key] = args
+        return self
+
+    def mkdir(self, path, mode=_DIR_MODE):
+        '''Directory path, and any missing parents. Existing is fine.'''
+        return self._record(MKDIR, path, mode)
+
+    def symlink(self, target, link, force=False):
+        '''Symbolic link at link to target. An existing link to target is fine.
+        :param force: [False] replace whatever else is at link
+        '''
+        return self._record(SYMLINK, link, str(target), force)
+
+    def touch(self, path, stamp=None):
+        '''Create file path if necessary and set its atime and mtime.
+        :param stamp: [now()] seconds since epoch
+        '''
+        return self._record(TOUCH, path, stamp)
+
+    def chown(self, path, owner='', group=''):
+        '''Ownership of path (not followed if a link). See Path.chown.
+        Unknown users and groups fail now (KeyError), not when applied.
+        '''
+        owner, group = str(owner), str(group)
+        if ':' in owner:
+            owner, group = owner.split(':', 1)
+        return self._record(CHOWN, path, _uid(owner), _gid(group))
+
+    def chmod(self, path, mode):
+        '''Mode of path, octal or symbolic. See parse_mode.'''
+        mode = str(mode).strip()
+        parse_mode(mode)  # invalid modes fail now, not when applied
+        return self._record(CHMOD, path, mode)
+
+    def discard(self):
+        '''Forget all recorded changes.'''
+        with self._lock:
+            self._ops.clear()
+            del self._order[:]
+
+    def _plan(self):
+        '''Recorded operations by phase then parent directory.
+        :return: list of steps, each a list of (dirpath, [(name, op, args)]) that
+                 may be applied in parallel
+        '''
+        with self._lock:
+            ops = [(key, self._ops[key]) for key in self._order]
+            self._ops.clear()
+            del self._order[:]
+        umask = None
+        for (op, path), args in ops:
+            if op == CHMOD and _uses_umask(args[0]):
+                umask = _umask()
+                break
+        phases = dict((op, list()) for op in PHASES)
+        recorded = set(key for key, args in ops)
+        dirs = set()
+        for (op, path), args in ops:  # grows with missing parents as it goes
+            if op == MKDIR:
+                dirs.add(path)
+                # missing parents, like os.makedirs
+                parent = os.path.dirname(path)
+                while parent and parent not in dirs and (MKDIR, parent) not in recorded and not os.path.isdir(parent):
+                    dirs.add(parent)
+                    ops.append(((MKDIR, parent), (_DIR_MODE, )))
+                    parent = os.path.dirname(parent)
+            elif op == CHMOD:
+                args = args + (umask, )
+            phases[op].append((path, args))
+        plan = list()
+        for op in PHASES:
+            items = phases[op]
+            if op == MKDIR:
+                # one step per depth, so parents exist before children
+                depths = dict()
+                for path, args in items:
+                    depths.setdefault(path.count(os.sep), list()).append((path, args))
+                steps = [depths[d] for d in sorted(depths)]
+            else:
+                steps = [items]
+            for step in steps:
+                groups = dict()
+                for path, args in step:
+                    dirpath, name = os.path.split(path)
+                    groups.setdefault(dirpath, list()).append((name, op, args))
+                if groups:
+                    plan.append(sorted(groups.items()))
+        return plan
+
+    def apply(self):
+        '''Apply and forget all recorded changes.
+        :raises BatchError: listing every operation that failed
+        '''
+        failures = list()
+        lock = threading.Lock()
+        funcs = {MKDIR: _mkdir, SYMLINK: _symlink, TOUCH: _touch, CHOWN: _chown, CHMOD: _chmod}
+
+        def apply_dir(dirpath, items):
+            dir_fd = None
+            if HAVE_DIR_FD:
+                try:
+                    dir_fd = os.open(dirpath or os.curdir, _O_DIR)
+                except OSError:
+                    error = sys.exc_info()[1]
+                    with lock:
+                        failures.extend((op, os.path.join(dirpath, name), error) for name, op, args in items)
+                    return
+            try:
+                for name, op, args in items:
+                    target = name if dir_fd is not None else os.path.join(dirpath, name)
+                    try:
+                        funcs[op](target, dir_fd, *args)
+                    except (OSError, IOError):
+                        with lock:
+                            failures.append((op, os.path.join(dirpath, name), sys.exc_info()[1]))
+            finally:
+                if dir_fd is not None:
+                    os.close(dir_fd)
+
+        plan = self._plan()
+        count = sum(len(items) for step in plan for dirpath, items in step)
+        log.info('Batch of %d changes' % (count, ))
+        for step in plan:
+            if self.workers > 1 and len(step) > 1:
+                with WorkerPool(min(self.workers, len(step))) as pool:
+                    for dirpath, items in step:
+                        pool.submit(apply_dir, dirpath, items)
+            else:
+                for dirpath, items in step:
+                    apply_dir(dirpath, items)
+        if failures:
+            raise BatchError(failures)
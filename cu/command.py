@@ -1,5 +1,9 @@
 from __future__ import with_statement
+import os
+import re
 import sys
+import errno
+import signal
 import time
 import heapq
 import tempfile
@@ -16,18 +20,20 @@ if not six.PY3:
 
 if not hasattr(subprocess.Popen, 'kill'):
     # python 2.5 compatibility
-    import os
-    import signal
     subprocess.Popen.kill = lambda s: os.kill(s.pid, signal.SIGKILL)
     subprocess.Popen.terminate = lambda s: os.kill(s.pid, signal.SIGTERM)
     subprocess.Popen.send_signal = lambda s, sig: os.kill(s.pid, sig)
 
+from cu import metrics
 from cu.env import Environment
+from cu.limits import Limits
 
 
 # modified from the stdlib pipes module for windows
 _safechars = 'abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789!@%_-+=:,./'
 _funnychars = '"`$\\'
+_unsafe = re.compile('[^%s]' % (re.escape(_safechars), ))
+_funny = re.compile('[%s]' % (re.escape(_funnychars), ))
 
 
 def shquote(text):
@@ -35,15 +41,11 @@ def shquote(text):
     if not text:
         return "''"
     text = str(text)
-    for c in text:
-        if c not in _safechars:
-            break
-    else:
+    if _unsafe.search(text) is None:
         return text
     if "'" not in text:
         return "'" + text + "'"
-    res = ''.join(('\\' + c if c in _funnychars else c) for c in text)
-    return '"' + res + '"'
+    return '"' + _funny.sub(r'\\\g<0>', text) + '"'
 
 
 def shquote_list(seq):
@@ -102,6 +104,138 @@ thd.setDaemon(True)
 thd.start()
 
 
+class Popen(subprocess.Popen):
+    '''subprocess.Popen that reaps the child with os.wait4 (where there is
+    one), keeping its resource usage in ``rusage``, and tells cu.metrics
+    once it has been reaped, whoever waited for it.
+    '''
+    rusage = None
+
+    def _reaped(self):
+        if metrics.registry is not None and getattr(self, '_metered', None) is not None:
+            metrics.registry.reaped(self)
+
+    def wait(self, *args, **kwargs):
+        if six.PY3 or not hasattr(os, 'wait4'):
+            returncode = super(Popen, self).wait(*args, **kwargs)
+        else:
+            # Python 2's wait calls os.waitpid itself, not a hook
+            while self.returncode is None:
+                try:
+                    pid, sts = self._try_wait(0)
+                except OSError:
+                    if sys.exc_info()[1].errno != errno.EINTR:
+                        raise
+                    continue
+                if pid == self.pid:
+                    self._handle_exitstatus(sts)
+            returncode = self.returncode
+        self._reaped()
+        return returncode
+
+    def poll(self):
+        returncode = super(Popen, self).poll()
+        if returncode is not None:
+            self._reaped()
+        return returncode
+
+    if hasattr(os, 'wait4'):
+        def _wait4(self, pid, flags):
+            pid, sts, rusage = os.wait4(pid, flags)
+            if pid:  # 0 if WNOHANG and still running
+                self.rusage = rusage
+            return pid, sts
+
+        def _try_wait(self, wait_flags):
+            try:
+                return self._wait4(self.pid, wait_flags)
+            except OSError:
+                # child reaped elsewhere or SIGCHLD ignored; status is lost
+                if sys.exc_info()[1].errno != errno.ECHILD:
+                    raise
+                return self.pid, 0
+
+        def _internal_poll(self, _deadstate=None, **kwargs):
+            return super(Popen, self)._internal_poll(_deadstate, _waitpid=self._wait4)
+
+
+# seconds to let earlier stages of a finished pipeline exit, for their
+# rusage, while metrics or a profile are collecting
+STAGE_GRACE = 0.1
+
+
+def _stages(proc, grace=0):
+    '''proc and the earlier stages of its pipeline, last first; those that
+    have exited are reaped.
+    :param grace: [0] seconds to wait for each still running
+    '''
+    stages = [proc]
+    while getattr(stages[-1], 'srcproc', None) is not None:
+        stages.append(stages[-1].srcproc)
+    for stage in stages[1:]:
+        if stage.poll() is None and grace:
+            deadline = time.time() + grace
+            while stage.poll() is None and time.time() < deadline:
+                time.sleep(0.005)
+    return stages
+
+
+class RunResult(tuple):
+    '''(return code, stdout, stderr) of a finished command, with how long it
+    took and what it used. Resource usage (from os.wait4) is summed over
+    the stages of a pipeline, maxrss is the largest of any; it is None
+    where the platform has no wait4. maxrss is in KiB on Linux, bytes on
+    BSD / OS X. inblock and oublock count filesystem block I/O operations.
+    Stages still running when the last exits are left out, unless cu.metrics
+    or a profile is collecting (they are then given STAGE_GRACE to exit).
+    '''
+    def __new__(cls, returncode, stdout=None, stderr=None, argv=None, wall=None, rusage=None, executable=None):
+        self = super(RunResult, cls).__new__(cls, (returncode, stdout, stderr))
+        self.argv = argv
+        self.executable = executable  # 'a | b' for a pipeline
+        if executable is None and argv:
+            self.executable = argv[0]
+        self.wall = wall
+        self.cached = False  # from a cu.memo.Memo, not run
+        self.utime = self.stime = self.maxrss = self.inblock = self.oublock = None
+        if rusage:
+            self.utime = sum(r.ru_utime for r in rusage)
+            self.stime = sum(r.ru_stime for r in rusage)
+            self.maxrss = max(r.ru_maxrss for r in rusage)
+            self.inblock = sum(r.ru_inblock for r in rusage)
+            self.oublock = sum(r.ru_oublock for r in rusage)
+        return self
+
+    def __reduce__(self):
+        '''Pickle and copy with the attributes, not just the tuple.'''
+        return (self.__class__, tuple(self), self.__dict__)
+
+    @classmethod
+    def of(cls, proc, stdout, stderr, grace=0):
+        '''RunResult of proc, waited for, and its pipeline's earlier stages.
+        :param grace: [0] seconds to wait for each earlier stage still running
+        '''
+        stages = _stages(proc, grace)
+        wall = None
+        starts = [s._start_time for s in stages if getattr(s, '_start_time', None) is not None]
+        if starts and getattr(proc, '_end_time', None) is not None:
+            wall = proc._end_time - min(starts)
+        rusage = [s.rusage for s in stages if getattr(s, 'rusage', None) is not None]
+        executable = ' | '.join(str(s.argv[0]) for s in reversed(stages) if getattr(s, 'argv', None)) or None
+        return cls(proc.returncode, stdout, stderr, getattr(proc, 'argv', None), wall, rusage, executable)
+
+    returncode = property(lambda self: self[0])
+    stdout = property(lambda self: self[1])
+    stderr = property(lambda self: self[2])
+
+    @property
+    def cpu(self):
+        '''User plus system CPU seconds, None if unknown.'''
+        if self.utime is None:
+            return None
+        return self.utime + self.stime
+
+
 def run_proc(proc, retcode, timeout=None):
     '''Waits for the given process to terminate, with the expected exit code.
 
@@ -118,7 +252,7 @@ def run_proc(proc, retcode, timeout=None):
         be killed and :class:`ProcessTimedOut <cu.cli.ProcessTimedOut>`
         will be raised
 
-    :returns: A tuple of (return code, stdout, stderr)
+    :returns: A :class:`RunResult <cu.command.RunResult>`, a tuple of (return code, stdout, stderr)
     '''
     if timeout is not None:
         _timeout_queue.put((proc, time.time() + timeout))
@@ -128,18 +262,30 @@ def run_proc(proc, retcode, timeout=None):
         stdout = six.b('')
     if not stderr:
         stderr = six.b('')
+    captured = (len(stdout), len(stderr))  # bytes, before decoding
     if getattr(proc, 'encoding', None):
         stdout = stdout.decode(proc.encoding, 'ignore')
         stderr = stderr.decode(proc.encoding, 'ignore')
-    if getattr(proc, '_timed_out', False):
-        raise ProcessTimedOut('Process did not terminate within %s seconds' % (timeout,), getattr(proc, 'argv', None))
+    timed_out = getattr(proc, '_timed_out', False)
+    failed = False
     if retcode is not None:
         if hasattr(retcode, '__contains__'):
-            if proc.returncode not in retcode:
-                raise ProcessExecutionError(getattr(proc, 'argv', None), proc.returncode, stdout, stderr)
-        elif proc.returncode != retcode:
-            raise ProcessExecutionError(getattr(proc, 'argv', None), proc.returncode, stdout, stderr)
-    return proc.returncode, stdout, stderr
+            failed = proc.returncode not in retcode
+        else:
+            failed = proc.returncode != retcode
+    if metrics.registry is not None:
+        metrics.registry.finished(proc, captured, failed, timed_out)
+    grace = 0
+    if metrics.registry is not None or metrics.profiles:
+        grace = STAGE_GRACE
+    result = RunResult.of(proc, stdout, stderr, grace)
+    if metrics.profiles:
+        metrics.profiled(result)
+    if timed_out:
+        raise ProcessTimedOut('Process did not terminate within %s seconds' % (timeout,), getattr(proc, 'argv', None))
+    if failed:
+        raise ProcessExecutionError(getattr(proc, 'argv', None), proc.returncode, stdout, stderr)
+    return result
 
 
 class BaseCommand(object):
@@ -188,6 +334,25 @@ class BaseCommand(object):
     def _get_encoding(self):
         raise NotImplementedError()
 
+    def as_script(self, pipefail=False):
+        '''This command, pipelines and redirections and all, as one ``sh``
+        script spawned once instead of a Popen per stage.
+        :param pipefail: [False] exit status is that of the last stage to fail
+        :returns: :class:`ShellScript <cu.command.ShellScript>`
+        '''
+        return ShellScript(self, pipefail)
+
+    def cached(self, env=(), inputs=(), memo=None):
+        '''This command, runs of which are memoized: a run like an earlier
+        one returns its result without spawning. For read-only commands.
+        See cu.memo.
+        :param env: [()] names of environment variables its output depends on
+        :param inputs: [()] files its output depends on (by mtime, size, inode)
+        :param memo: [cu.memo.default] cu.memo.Memo to keep results in
+        :returns: :class:`CachedCommand <cu.command.CachedCommand>`
+        '''
+        return CachedCommand(self, env, inputs, memo)
+
     def formulate(self, level=0, args=()):
         '''Formulates the command into a command-line, i.e., a list of shell-quoted strings
         that can be executed by ``Popen`` or shells.
@@ -220,9 +385,15 @@ class BaseCommand(object):
                        ``None`` means no timeout is imposed; otherwise, if the process hasn't
                        terminated after that many seconds, the process will be forcefully
                        terminated an exception will be raised
+        :param shell_mode: [False] compile to one ``sh`` script and run that, see as_script
+        :param pipefail: [False] with shell_mode, fail if any stage of a pipeline fails
         :param kwargs: Any keyword-arguments to be passed to the ``Popen`` constructor
-        :returns: A tuple of (return code, stdout, stderr)
+        :returns: A :class:`RunResult <cu.command.RunResult>`, a tuple of (return code, stdout, stderr)
         '''
+        shell_mode = kwargs.pop('shell_mode', False)
+        pipefail = kwargs.pop('pipefail', False)
+        if shell_mode:
+            return self.as_script(pipefail).run(args, **kwargs)
         retcode = kwargs.pop('retcode', 0)
         timeout = kwargs.pop('timeout', None)
         p = self.popen(args, **kwargs)
@@ -248,20 +419,29 @@ class Command(BaseCommand):
         self.encoding = encoding
         self.cwd = None
         self.env = None
+        self.limits = None  # default Limits (or dict of its keywords)
 
     def _get_encoding(self):
         return self.encoding
 
-    def popen(self, args=(), cwd=None, env=None, **kwargs):
+    def popen(self, args=(), **kwargs):
         if isinstance(args, six.string_types):
             args = (args,)
+        return self._spawn(self.formulate(0, args), **kwargs)
+
+    def _spawn(self, argv, cwd=None, env=None, **kwargs):
+        '''Popen already formulated argv, with this command's cwd, env and limits
+        defaults. See cu.limits.Limits for the nice, ionice, affinity and rlimits
+        keywords.
+        '''
         return self._popen(
-            self.executable, self.formulate(0, args),
+            self.executable, argv,
             cwd=self.cwd if cwd is None else cwd,
             env=self.env if env is None else env,
+            limits=Limits.pop(kwargs, self.limits),
             **kwargs)
 
-    def _popen(self, executable, argv, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE, cwd=None, env=None, **kwargs):
+    def _popen(self, executable, argv, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE, cwd=None, env=None, limits=None, **kwargs):
         from cu import local
         if subprocess.mswindows and 'startupinfo' not in kwargs and stdin not in (sys.stdin, None):
             kwargs['startupinfo'] = sui = subprocess.STARTUPINFO()
@@ -272,18 +452,38 @@ class Command(BaseCommand):
         if env is None:
             env = local.env
         if isinstance(env, Environment):
-            env = env.as_dict()
+            env = env.snapshot()
+        in_child = limits is not None and limits.in_child()
+        if in_child:
+            kwargs['preexec_fn'] = limits.preexec_fn(kwargs.get('preexec_fn'))
         log.debug('Running %r', argv)
-        proc = subprocess.Popen(
+        proc = Popen(
             argv, executable=str(executable), stdin=stdin, stdout=stdout,
             stderr=stderr, cwd=str(cwd), env=env, **kwargs)  # bufsize=4096
+        if limits is not None and not in_child:
+            try:
+                limits.apply(proc.pid)
+            except Exception:
+                # don't leave it running unconstrained
+                error = sys.exc_info()
+                proc.kill()
+                proc.communicate()
+                six.reraise(*error)
         proc._start_time = time.time()
         proc.encoding = self.encoding
         proc.argv = argv
+        if metrics.registry is not None:
+            metrics.registry.spawned(proc, str(executable))
         return proc
 
     def formulate(self, level=0, args=()):
-        argv = [str(self.executable)]
+        executable = str(self.executable)
+        if level >= self.QUOTE_LEVEL:
+            executable = shquote(executable)
+        return [executable] + self._formulate_args(level, args)
+
+    def _formulate_args(self, level, args):
+        argv = []
         for a in args:
             if not a:
                 continue
@@ -302,22 +502,52 @@ class Command(BaseCommand):
         return argv
 
 
+def _constant(arg):
+    '''Does arg always formulate the same?'''
+    from cu.path import Path, CWD
+    if isinstance(arg, Path):
+        return not isinstance(arg, CWD)
+    return isinstance(arg, six.string_types + six.integer_types + (float, ))
+
+
 class BoundCommand(BaseCommand):
     def __init__(self, executable, args):
         super(BoundCommand, self).__init__()
         self.executable = executable
-        self.args = args
+        self.args = tuple(args)
+        # Formulation of a Command with constant args is cached per level
+        # and only call-time args are formulated on each run.
+        self._prefixes = None
+        self._str = None
+        if isinstance(executable, Command) and all(_constant(a) for a in self.args):
+            self._prefixes = dict()
+
+    def __str__(self):
+        if self._prefixes is None:
+            return super(BoundCommand, self).__str__()
+        if self._str is None:
+            self._str = ' '.join(self.formulate())
+        return self._str
 
     def _get_encoding(self):
         return self.executable._get_encoding()
 
     def formulate(self, level=0, args=()):
-        return self.executable.formulate(level + 1, self.args + tuple(args))
+        if self._prefixes is None:
+            return self.executable.formulate(level + 1, self.args + tuple(args))
+        prefix = self._prefixes.get(level)
+        if prefix is None:
+            prefix = self._prefixes[level] = self.executable.formulate(level + 1, self.args)
+        if not args:
+            return list(prefix)
+        return prefix + self.executable._formulate_args(level + 1, args)
 
     def popen(self, args=(), **kwargs):
-        if isinstance(args, str):
+        if isinstance(args, six.string_types):
             args = (args,)
-        return self.executable.popen(self.args + tuple(args), **kwargs)
+        if self._prefixes is None:
+            return self.executable.popen(self.args + tuple(args), **kwargs)
+        return self.executable._spawn(self.formulate(0, args), **kwargs)
 
 
 class Pipeline(BaseCommand):
@@ -333,7 +563,8 @@ class Pipeline(BaseCommand):
         return self.src_executable._get_encoding() or self.dst_executable._get_encoding()
 
     def formulate(self, level=0, args=()):
-        return self.src_executable.formulate(level + 1) + ['|'] + self.dst_executable.formulate(level + 1, args)
+        # args go to the first stage, as in popen
+        return self.src_executable.formulate(level + 1, args) + ['|'] + self.dst_executable.formulate(level + 1)
 
     def popen(self, args=(), **kwargs):
         src_kwargs = kwargs.copy()
@@ -368,14 +599,21 @@ class BaseRedirection(BaseCommand):
         return self.executable._get_encoding()
 
     def formulate(self, level=0, args=()):
-        return self.executable.formulate(level + 1, args) + [self.SYM, shquote(getattr(self.file, 'name', self.file))]
+        argv = self.executable.formulate(level + 1, args)
+        if isinstance(self.executable, Pipeline) and self.KWARG == 'stdin':
+            argv = ['{'] + argv + [';', '}']  # into the first stage, as in popen
+        if isinstance(self.file, ERROUT):
+            return argv + [self.SYM + '&1']
+        return argv + [self.SYM, shquote(getattr(self.file, 'name', self.file))]
 
     def popen(self, args=(), **kwargs):
+        from cu import local
         from cu.local import Path
         if self.KWARG in kwargs and kwargs[self.KWARG] not in (subprocess.PIPE, None):
             raise RedirectionError('%s is already redirected' % (self.KWARG,))
         if isinstance(self.file, (str, Path)):
-            f = kwargs[self.KWARG] = open(str(self.file), self.MODE)
+            # relative to the (virtual) cwd, like the shell would
+            f = kwargs[self.KWARG] = open(os.path.join(str(local.cwd), str(self.file)), self.MODE)
         else:
             kwargs[self.KWARG] = self.file
             f = None
@@ -424,7 +662,7 @@ class StdinDataRedirection(BaseCommand):
         return self.executable._get_encoding()
 
     def formulate(self, level=0, args=()):
-        return ['echo %s' % (shquote(self.data),), '|', self.executable.formulate(level + 1, args)]
+        return ['printf', "'%s'", shquote(self.data), '|'] + self.executable.formulate(level + 1, args)
 
     def popen(self, args=(), **kwargs):
         if 'stdin' in kwargs and kwargs['stdin'] != subprocess.PIPE:
@@ -444,6 +682,163 @@ class StdinDataRedirection(BaseCommand):
             f.close()
 
 
+def _killpg(proc):
+    '''Kill proc's whole process group, so no stage of a script outlives it.'''
+    try:
+        os.killpg(proc.pid, signal.SIGKILL)
+    except OSError:
+        if sys.exc_info()[1].errno != errno.ESRCH:
+            raise
+
+
+class ShellScript(BaseCommand):
+    '''A command tree compiled, using ``formulate``, into a script run by
+    one ``sh -c``: a single spawn however many stages and redirections, the
+    shell rather than Python connecting them. cwd and env are those of the
+    ``sh``; those set on the Commands inside are not used.
+    '''
+    SHELL = '/bin/sh'
+    PIPEFAIL_SHELL = 'bash'  # POSIX sh (e.g. dash) may lack pipefail
+
+    def __init__(self, command, pipefail=False):
+        '''
+        :param command: BaseCommand to compile
+        :param pipefail: [False] ``set -o pipefail``, run by PIPEFAIL_SHELL
+        '''
+        super(ShellScript, self).__init__()
+        self.command = command
+        self.pipefail = pipefail
+        self.executable = self.SHELL
+        if pipefail:
+            from cu import local
+            self.executable = str(local.which(self.PIPEFAIL_SHELL))
+
+    def __repr__(self):
+        return 'ShellScript(%r)' % (self.command, )
+
+    def _get_encoding(self):
+        return self.command._get_encoding()
+
+    def script(self, args=()):
+        '''The script text.
+        :param args: arguments passed to the command, as in popen
+        '''
+        # bound, so every Command in the tree formulates at a quoting level
+        text = ' '.join(BoundCommand(self.command, args).formulate(1))
+        if self.pipefail:
+            text = 'set -o pipefail; ' + text
+        return text
+
+    def formulate(self, level=0, args=()):
+        argv = [self.executable, '-c', self.script(args)]
+        if level >= Command.QUOTE_LEVEL:
+            return shquote_list(argv)
+        return argv
+
+    def popen(self, args=(), **kwargs):
+        '''
+        :param process_group: [False] run in a new process group, which kill()
+                              kills entirely (run does this when given a timeout)
+        '''
+        if isinstance(args, six.string_types):
+            args = (args,)
+        group = kwargs.pop('process_group', False) and os.name == 'posix'
+        if group:
+            kwargs['preexec_fn'] = os.setpgrp
+        # a shell forks at once, so limit it before exec
+        limits = Limits.pop(kwargs)
+        if limits is not None:
+            kwargs['limits'] = limits.update(Limits(preexec=True))
+        shell = Command(self.executable, self._get_encoding())
+        proc = shell._spawn([self.executable, '-c', self.script(args)], **kwargs)
+        if group:
+            proc.kill = lambda: _killpg(proc)
+        return proc
+
+    def run(self, args=(), **kwargs):
+        if kwargs.get('timeout') is not None:
+            # killing just sh would leave the stages running, holding its pipes
+            kwargs.setdefault('process_group', True)
+        return super(ShellScript, self).run(args, **kwargs)
+
+
+class CachedCommand(BaseCommand):
+    '''A command whose runs are memoized, see BaseCommand.cached. Only
+    run (and so calling) is; runs given Popen keywords (redirecting a
+    stream, say) and popen always spawn. Runs that raise are not kept.
+    '''
+    def __init__(self, command, env=(), inputs=(), memo=None):
+        super(CachedCommand, self).__init__()
+        self.command = command
+        self.env_names = tuple(env)
+        self.inputs = tuple(str(i) for i in inputs)
+        self.memo = memo
+
+    def __repr__(self):
+        return 'CachedCommand(%r)' % (self.command, )
+
+    @property
+    def executable(self):
+        return self.command.executable
+
+    def _get_encoding(self):
+        return self.command._get_encoding()
+
+    def formulate(self, level=0, args=()):
+        return self.command.formulate(level, args)
+
+    def __getitem__(self, args):
+        '''The wrapped command bound to args, memoized as this one is.'''
+        bound = self.command[args]
+        if bound is self.command:
+            return self
+        return CachedCommand(bound, self.env_names, self.inputs, self.memo)
+
+    def popen(self, args=(), **kwargs):
+        return self.command.popen(args, **kwargs)
+
+    def _context(self):
+        '''(cwd, env) the wrapped command runs in: its own, else local's.'''
+        from cu import local
+        command = self.command
+        while isinstance(command, BoundCommand):
+            command = command.executable
+        cwd = getattr(command, 'cwd', None)
+        env = getattr(command, 'env', None)
+        return (local.cwd if cwd is None else cwd), (local.env if env is None else env)
+
+    def _key(self, args):
+        from cu.memo import key
+        if isinstance(args, six.string_types):
+            args = (args,)
+        cwd, environ = self._context()
+        env = dict((name, environ.get(name)) for name in self.env_names)
+        return key(self.command.formulate(0, args), str(cwd), env, self._get_encoding(), self.inputs)
+
+    def run(self, args=(), **kwargs):
+        from cu import memo
+        retcode = kwargs.get('retcode', 0)
+        if set(kwargs) - set(['retcode', 'timeout']):
+            return self.command.run(args, **kwargs)
+        store = self.memo or memo.default
+        key = self._key(args)
+        hit = store.get(key)
+        if hit is None:
+            result = self.command.run(args, **kwargs)
+            store.put(key, result)
+            return result
+        result = RunResult(*hit, argv=self.command.formulate(0, args))
+        result.cached = True
+        if retcode is not None:
+            if hasattr(retcode, '__contains__'):
+                failed = result.returncode not in retcode
+            else:
+                failed = result.returncode != retcode
+            if failed:
+                raise ProcessExecutionError(result.argv, result.returncode, result.stdout, result.stderr)
+        return result
+
+
 class Future(object):
     '''Represents a 'future result' of a running process. It basically wraps a ``Popen``
     object and the expected exit code, and provides poll(), wait(), returncode, stdout,
@@ -456,6 +851,7 @@ class Future(object):
         self._returncode = None
         self._stdout = None
         self._stderr = None
+        self._result = None
 
     def __str__(self):
         return self.__repr__()
@@ -481,6 +877,13 @@ class Future(object):
         self.wait()
         return self._returncode
 
+    @property
+    def result(self):
+        '''The process' :class:`RunResult <cu.command.RunResult>`; accessing this property
+        will wait for the process to finish.'''
+        self.wait()
+        return self._result
+
     def poll(self):
         '''Polls the underlying process for termination; returns ``None`` if still running,
         or the process' returncode if terminated.'''
@@ -495,8 +898,8 @@ class Future(object):
         :class:`cu.command.ProcessExecutionError` in case of failure.'''
         if self._returncode is not None:
             return
-        self._returncode, self._stdout, self._stderr = run_proc(self.proc,
-            self._expected_retcode, self._timeout)
+        self._result = run_proc(self.proc, self._expected_retcode, self._timeout)
+        self._returncode, self._stdout, self._stderr = self._result
 
 
 class ExecutionModifier(object):
@@ -0,0 +1,48 @@
+'''Context
+
+contextvars.ContextVar where the interpreter has it (3.7+), so state is
+local to a thread or an asyncio task; otherwise a stand-in with the same
+get/set/reset interface that is local to a thread.
+'''
+import threading
+
+try:
+    from contextvars import ContextVar
+except ImportError:
+    _MISSING = object()
+
+    class Token(object):
+        def __init__(self, var, old):
+            self.var = var
+            self.old_value = old
+
+    class ContextVar(object):
+        '''Thread-local stand-in for contextvars.ContextVar.'''
+        def __init__(self, name, default=_MISSING):
+            self.name = name
+            self._default = default
+            self._local = threading.local()
+
+        def __repr__(self):
+            return '<ContextVar name=%r>' % (self.name, )
+
+        def get(self, *default):
+            try:
+                return self._local.value
+            except AttributeError:
+                if default:
+                    return default[0]
+                if self._default is not _MISSING:
+                    return self._default
+                raise LookupError(self)
+
+        def set(self, value):
+            token = Token(self, getattr(self._local, 'value', _MISSING))
+            self._local.value = value
+            return token
+
+        def reset(self, token):
+            if token.old_value is _MISSING:
+                del self._local.value
+            else:
+                self._local.value = token.old_value
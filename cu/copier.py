@@ -0,0 +1,403 @@
+'''Copier
+
+File and tree copying that keeps data in the kernel. In order of
+preference a file is reflinked (FICLONE, copy-on-write filesystems such as
+btrfs and XFS), copied with os.copy_file_range, os.sendfile, or finally
+plain read/write. Holes in sparse files are preserved with
+SEEK_DATA/SEEK_HOLE. Trees are copied a file per WorkerPool thread.
+'''
+from __future__ import with_statement
+import os
+import sys
+import stat
+import time
+import errno
+import json
+import shutil
+import threading
+import logging
+log = logging.getLogger('cu.copier')
+
+from cu.pool import imap_unordered
+from cu.digest import hash_file, _mtime_ns
+
+try:
+    import fcntl
+except ImportError:  # windows
+    fcntl = None
+
+
+FICLONE = 0x40049409  # _IOW(0x94, 9, int) from linux/fs.h
+CHUNK_SIZE = 1024 * 1024 * 8
+BUFFER_SIZE = 1024 * 1024
+
+# Kernel says "can't do that here", try the next method.
+_UNSUPPORTED = set([errno.EXDEV, errno.EINVAL, errno.ENOSYS, errno.EOPNOTSUPP, errno.ENOTTY, errno.EBADF, errno.EPERM])
+if hasattr(errno, 'ENOTSUP'):
+    _UNSUPPORTED.add(errno.ENOTSUP)
+
+SameFileError = getattr(shutil, 'SameFileError', shutil.Error)  # 3.4+
+SpecialFileError = shutil.SpecialFileError
+
+
+class Progress(object):
+    '''Running totals of a copy, handed to progress callbacks.'''
+    def __init__(self):
+        self.bytes = 0
+        self.files = 0
+        self.start = time.time()
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return '<%s %d files %d bytes %.1f files/s %.0f bytes/s>' % (
+                self.__class__.__name__, self.files, self.bytes, self.files_per_second, self.bytes_per_second)
+
+    def add(self, nbytes, nfiles=1):
+        with self._lock:
+            self.bytes += nbytes
+            self.files += nfiles
+
+    @property
+    def elapsed(self):
+        return max(time.time() - self.start, 1e-9)
+
+    @property
+    def bytes_per_second(self):
+        return self.bytes / self.elapsed
+
+    @property
+    def files_per_second(self):
+        return self.files / self.elapsed
+
+
+def _reflink(src_fd, dst_fd):
+    if fcntl is None or not sys.platform.startswith('linux'):
+        return False
+    try:
+        fcntl.ioctl(dst_fd, FICLONE, src_fd)
+        return True
+    except (IOError, OSError):
+        if sys.exc_info()[1].errno in _UNSUPPORTED:
+            return False
+        raise
+
+
+def _copy_range(src_fd, dst_fd, offset, count):
+    '''Copy count bytes at offset (same offset in dst), fastest way available.'''
+    end = offset + count
+    pos = offset
+    if hasattr(os, 'copy_file_range'):
+        try:
+            while pos < end:
+                n = os.copy_file_range(src_fd, dst_fd, min(end - pos, CHUNK_SIZE), pos, pos)
+                if n == 0:
+                    return pos - offset  # source shrank
+                pos += n
+            return count
+        except OSError:
+            if sys.exc_info()[1].errno not in _UNSUPPORTED:
+                raise
+    if hasattr(os, 'sendfile') and sys.platform.startswith('linux'):
+        try:
+            os.lseek(dst_fd, pos, os.SEEK_SET)
+            while pos < end:
+                n = os.sendfile(dst_fd, src_fd, pos, min(end - pos, CHUNK_SIZE))
+                if n == 0:
+                    return pos - offset
+                pos += n
+            return count
+        except OSError:
+            if sys.exc_info()[1].errno not in _UNSUPPORTED:
+                raise
+    os.lseek(src_fd, pos, os.SEEK_SET)
+    os.lseek(dst_fd, pos, os.SEEK_SET)
+    while pos < end:
+        data = os.read(src_fd, min(end - pos, BUFFER_SIZE))
+        if not data:
+            break
+        while data:
+            n = os.write(dst_fd, data)
+            data = data[n:]
+            pos += n
+    return pos - offset
+
+
+def _data_segments(fd, size):
+    '''(offset, length) of the non-hole parts of fd.'''
+    pos = 0
+    while pos < size:
+        try:
+            data = os.lseek(fd, pos, os.SEEK_DATA)
+        except OSError:
+            if sys.exc_info()[1].errno == errno.ENXIO:  # only a hole left
+                return
+            raise
+        hole = os.lseek(fd, data, os.SEEK_HOLE)
+        yield data, hole - data
+        pos = hole
+
+
+def _special(st):
+    return stat.S_ISFIFO(st.st_mode) or stat.S_ISCHR(st.st_mode) or stat.S_ISBLK(st.st_mode) or stat.S_ISSOCK(st.st_mode)
+
+
+def _check(src, dst):
+    '''Raise, as shutil does, rather than empty a file copied onto itself or
+    block opening a named pipe.
+    '''
+    st = os.stat(src)
+    if _special(st):
+        raise SpecialFileError('`%s` is a named pipe, socket or device' % (src, ))
+    try:
+        dst_st = os.stat(dst)
+    except OSError:
+        return
+    if os.path.samestat(st, dst_st):
+        raise SameFileError('%r and %r are the same file' % (src, dst))
+    if _special(dst_st):
+        raise SpecialFileError('`%s` is a named pipe, socket or device' % (dst, ))
+
+
+def copy_file(src, dst, reflink=True, sparse=True, verify=None):
+    '''Copy contents of file src to dst (created or truncated), then
+    permission bits and times, like shutil.copy2.
+    :param reflink: [True] try a copy-on-write clone first
+    :param sparse: [True] leave holes in dst where src has them
+    :param verify: [None] hashlib algorithm name, compare digests afterwards
+    :return: number of bytes copied
+    :raises SameFileError: src and dst are the same file
+    :raises SpecialFileError: either is a named pipe, socket or device
+    '''
+    src, dst = str(src), str(dst)
+    _check(src, dst)
+    src_fd = os.open(src, os.O_RDONLY)
+    try:
+        st = os.fstat(src_fd)
+        dst_fd = os.open(dst, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, stat.S_IMODE(st.st_mode))
+        try:
+            if not (reflink and _reflink(src_fd, dst_fd)):
+                holes = (sparse and hasattr(os, 'SEEK_DATA')
+                         and getattr(st, 'st_blocks', None) is not None
+                         and st.st_blocks * 512 < st.st_size)
+                if holes:
+                    for offset, length in _data_segments(src_fd, st.st_size):
+                        _copy_range(src_fd, dst_fd, offset, length)
+                    os.ftruncate(dst_fd, st.st_size)
+                else:
+                    _copy_range(src_fd, dst_fd, 0, st.st_size)
+        finally:
+            os.close(dst_fd)
+    finally:
+        os.close(src_fd)
+    shutil.copystat(src, dst)
+    if verify and hash_file(src, verify) != hash_file(dst, verify):
+        raise IOError(errno.EIO, '%s digest mismatch after copy' % (verify, ), dst)
+    return st.st_size
+
+
+def copy_tree(src, dst, symlinks=False, workers=None, progress=None, reflink=True, sparse=True, verify=None):
+    '''Recursively copy directory src to dst, which must not exist, like
+    shutil.copytree but files are copied concurrently with `copy_file`.
+    Errors are collected and raised together as shutil.Error; named pipes,
+    sockets and devices are among them, as copy_file refuses them.
+    :param symlinks: [False] copy symbolic links as links, not their targets
+    :param workers: [8] copying threads
+    :param progress: [None] called with a Progress after every file
+    :param reflink: [True] see copy_file
+    :param sparse: [True] see copy_file
+    :param verify: [None] see copy_file
+    :return: Progress
+    '''
+    src, dst = str(src), str(dst)
+    totals = Progress()
+    errors = list()
+    dirs = list()
+
+    def jobs():
+        # symlinks=False copies linked directories as real ones, as copytree does
+        for root, dirnames, filenames in os.walk(src, followlinks=not symlinks):
+            target = dst if root == src else os.path.join(dst, os.path.relpath(root, src))
+            os.mkdir(target)
+            dirs.append((root, target))
+            if symlinks:
+                for name in list(dirnames):
+                    if os.path.islink(os.path.join(root, name)):
+                        dirnames.remove(name)
+                        filenames.append(name)
+            for name in filenames:
+                yield os.path.join(root, name), os.path.join(target, name)
+
+    def copy(job):
+        s, d = job
+        if symlinks and os.path.islink(s):
+            os.symlink(os.readlink(s), d)
+            return 0
+        return copy_file(s, d, reflink, sparse, verify)
+
+    for job, size, error in imap_unordered(copy, jobs(), workers):
+        if error is not None:
+            errors.append((job[0], job[1], str(error)))
+            continue
+        totals.add(size)
+        if progress is not None:
+            progress(totals)
+    for s, d in reversed(dirs):
+        try:
+            shutil.copystat(s, d)
+        except OSError:
+            errors.append((s, d, str(sys.exc_info()[1])))
+    if errors:
+        raise shutil.Error(errors)
+    return totals
+
+
+class SyncSummary(object):
+    '''What `sync` did, relative paths in each list.'''
+    def __init__(self):
+        self.copied = list()
+        self.updated = list()
+        self.deleted = list()
+        self.unchanged = 0
+        self.bytes = 0
+
+    def __repr__(self):
+        return '<%s %d copied %d updated %d deleted %d unchanged %d bytes>' % (
+                self.__class__.__name__, len(self.copied), len(self.updated),
+                len(self.deleted), self.unchanged, self.bytes)
+
+    def __nonzero__(self):
+        '''True if anything changed.'''
+        return bool(self.copied or self.updated or self.deleted)
+
+    __bool__ = __nonzero__
+
+
+def _load_manifest(path, src, dst):
+    '''Files recorded by a sync of src to dst; nothing if the manifest
+    was written for other directories.
+    '''
+    try:
+        with open(path) as fh:
+            data = json.load(fh)
+        if data['src'] != os.path.abspath(src) or data['dst'] != os.path.abspath(dst):
+            return dict()
+        return dict((k, tuple(v)) for k, v in data['files'].items())
+    except (IOError, OSError, ValueError, KeyError, TypeError, AttributeError):
+        return dict()
+
+
+def _save_manifest(path, src, dst, files):
+    tmp = '%s.tmp' % (path, )
+    with open(tmp, 'w') as fh:
+        json.dump(dict(src=os.path.abspath(src), dst=os.path.abspath(dst), files=files), fh)
+    os.rename(tmp, path)
+
+
+def sync(src, dst, checksum=False, delete=False, manifest=None, workers=None, verify=None):
+    '''Make directory dst a copy of directory src, copying only what changed.
+    A file is changed if size or mtime (whole seconds, like rsync) differ,
+    or with ``checksum`` if size or content differ. Symbolic links are
+    copied as links. Changed files are written to a temporary name and
+    renamed over the old one.
+    :param checksum: [False] compare content digests instead of mtime
+    :param delete: [False] remove entries in dst that aren't in src
+    :param manifest: [None] file recording each file's source size and
+                     mtime after it was synced. Files that still match are
+                     skipped without stat'ing dst, which assumes nothing
+                     else modifies dst. Ignored if written for another
+                     src or dst.
+    :param workers: [8] copying threads
+    :param verify: [None] see copy_file
+    :return: SyncSummary
+    '''
+    from cu.remover import remove
+    src, dst = str(src).rstrip(os.sep) or os.sep, str(dst).rstrip(os.sep) or os.sep
+    summary = SyncSummary()
+    known = _load_manifest(manifest, src, dst) if manifest else dict()
+    seen = dict()
+    errors = list()
+
+    def changed(s, d, st):
+        try:
+            dst_st = os.lstat(d)
+        except OSError:
+            return 'copied'
+        if stat.S_ISLNK(st.st_mode):
+            if not stat.S_ISLNK(dst_st.st_mode) or os.readlink(s) != os.readlink(d):
+                return 'updated'
+            return None
+        if not stat.S_ISREG(dst_st.st_mode) or st.st_size != dst_st.st_size:
+            return 'updated'
+        if checksum:
+            if hash_file(s, 'sha1') != hash_file(d, 'sha1'):
+                return 'updated'
+        elif int(st.st_mtime) != int(dst_st.st_mtime):
+            return 'updated'
+        return None
+
+    def jobs():
+        for root, dirnames, filenames in os.walk(src):
+            rel_root = os.path.relpath(root, src)
+            target = dst if root == src else os.path.join(dst, rel_root)
+            if root != src and (os.path.islink(target) or os.path.lexists(target) and not os.path.isdir(target)):
+                remove(target)
+                summary.deleted.append(rel_root)
+            if not os.path.isdir(target):
+                os.mkdir(target)
+            for name in list(dirnames):
+                if os.path.islink(os.path.join(root, name)):
+                    dirnames.remove(name)
+                    filenames.append(name)
+            if delete:
+                wanted = set(dirnames + filenames)
+                for name in os.listdir(target):
+                    if name not in wanted:
+                        remove(os.path.join(target, name))
+                        summary.deleted.append(os.path.normpath(os.path.join(rel_root, name)))
+            for name in filenames:
+                s = os.path.join(root, name)
+                d = os.path.join(target, name)
+                rel = os.path.normpath(os.path.join(rel_root, name))
+                st = os.lstat(s)
+                record = (st.st_size, _mtime_ns(st))
+                seen[rel] = record
+                if known.get(rel) == record:
+                    summary.unchanged += 1
+                    continue
+                what = changed(s, d, st)
+                if what is None:
+                    summary.unchanged += 1
+                    continue
+                yield s, d, rel, what
+
+    def copy(job):
+        s, d, rel, what = job
+        tmp = os.path.join(os.path.dirname(d), '.%s.cu-sync' % (os.path.basename(d), ))
+        try:  # left by a sync that died
+            os.unlink(tmp)
+        except OSError:
+            if sys.exc_info()[1].errno != errno.ENOENT:
+                raise
+        if os.path.islink(s):
+            os.symlink(os.readlink(s), tmp)
+            size = 0
+        else:
+            size = copy_file(s, tmp, verify=verify)
+        if os.path.isdir(d) and not os.path.islink(d):
+            remove(d)
+        os.rename(tmp, d)
+        return size
+
+    for job, size, error in imap_unordered(copy, jobs(), workers):
+        s, d, rel, what = job
+        if error is not None:
+            errors.append((s, d, str(error)))
+            seen.pop(rel, None)
+            continue
+        getattr(summary, what).append(rel)
+        summary.bytes += size
+    if manifest:
+        _save_manifest(manifest, src, dst, seen)
+    if errors:
+        raise shutil.Error(errors)
+    return summary
@@ -0,0 +1,296 @@
+'''Digest
+
+Content hashing of files and trees. hashlib releases the GIL while
+hashing large buffers, so trees are hashed a file per WorkerPool thread.
+A DigestCache remembers digests by (st_dev, st_ino, size, mtime_ns), so
+unchanged files are not read again. find_duplicates narrows candidates by
+size and partial digests before reading any file in full.
+'''
+from __future__ import with_statement
+import os
+import sys
+import json
+import mmap
+import stat
+import errno
+import shutil
+import hashlib
+import threading
+import logging
+log = logging.getLogger('cu.digest')
+
+import six
+
+from cu.pool import imap_unordered
+
+
+BUFFER_SIZE = 1024 * 1024
+
+
+def _mtime_ns(st):
+    return getattr(st, 'st_mtime_ns', None) or int(st.st_mtime * 1000000000)
+
+
+def _hash_fd(fd, algo, size, bufsize, use_mmap):
+    h = hashlib.new(algo)
+    if use_mmap and size:
+        m = mmap.mmap(fd, 0, access=mmap.ACCESS_READ)
+        try:
+            h.update(m)
+        finally:
+            m.close()
+        return h.hexdigest()
+    buf = bytearray(bufsize)
+    view = memoryview(buf)
+    with os.fdopen(os.dup(fd), 'rb', 0) as fh:
+        while True:
+            n = fh.readinto(buf)
+            if not n:
+                return h.hexdigest()
+            h.update(view[:n])
+
+
+def hash_file(path, algo='sha256', bufsize=BUFFER_SIZE, use_mmap=False, cache=None):
+    '''Hex digest of the contents of file path.
+    :param algo: ['sha256'] any hashlib algorithm
+    :param bufsize: [1MiB] read size, reused buffer so no per-read allocation
+    :param use_mmap: [False] hash a read-only mapping of the whole file instead
+    :param cache: [None] DigestCache to consult and update
+    '''
+    fd = os.open(str(path), os.O_RDONLY)
+    try:
+        st = os.fstat(fd)
+        if cache is not None:
+            digest = cache.lookup(st, algo)
+            if digest is not None:
+                return digest
+        digest = _hash_fd(fd, algo, st.st_size, bufsize, use_mmap)
+        if cache is not None:
+            cache.store(st, algo, digest)
+        return digest
+    finally:
+        os.close(fd)
+
+
+def hash_tree(root, algo='sha256', workers=None, cache=None, followlinks=False):
+    '''Hex digests of every file under root, hashed in parallel.
+    :param workers: [8] hashing threads
+    :param cache: [None] DigestCache to consult and update
+    :param followlinks: [False] descend into symlinks to directories
+    :return: dict of path relative to root -> hex digest
+    '''
+    root = str(root)
+
+    def files():
+        for dirpath, dirnames, filenames in os.walk(root, followlinks=followlinks):
+            for name in filenames:
+                path = os.path.join(dirpath, name)
+                if os.path.isfile(path):
+                    yield path
+
+    digests = dict()
+    for path, digest, error in imap_unordered(lambda p: hash_file(p, algo, cache=cache), files(), workers):
+        if error is not None:
+            raise error
+        digests[os.path.relpath(path, root)] = digest
+    return digests
+
+
+class DigestCache(object):
+    '''Digests keyed on (st_dev, st_ino, size, mtime_ns), optionally
+    persisted as JSON. Thread safe. Instances of this class may be used as
+    *context-managers*, saving on exit.
+    '''
+    def __init__(self, path=None):
+        '''
+        :param path: [None] file to load from and save to, None for memory only
+        '''
+        self.path = path and str(path)
+        self._digests = dict()
+        self._lock = threading.Lock()
+        self._dirty = False
+        if self.path and os.path.exists(self.path):
+            self.load()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, t, v, tb):
+        self.save()
+
+    def __len__(self):
+        return len(self._digests)
+
+    def _key(self, st, algo):
+        return '%s:%d:%d:%d:%d' % (algo, st.st_dev, st.st_ino, st.st_size, _mtime_ns(st))
+
+    def lookup(self, st, algo):
+        '''Cached digest for stat result st, or None.'''
+        return self._digests.get(self._key(st, algo))
+
+    def store(self, st, algo, digest):
+        with self._lock:
+            self._digests[self._key(st, algo)] = digest
+            self._dirty = True
+
+    def clear(self):
+        with self._lock:
+            self._digests.clear()
+            self._dirty = True
+
+    def load(self):
+        with open(self.path) as fh:
+            digests = json.load(fh)
+        with self._lock:
+            self._digests.update(digests)
+
+    def save(self):
+        '''Write to path (atomically), if there is one and anything changed.'''
+        if not self.path or not self._dirty:
+            return
+        with self._lock:
+            tmp = '%s.tmp' % (self.path, )
+            with open(tmp, 'w') as fh:
+                json.dump(self._digests, fh)
+            os.rename(tmp, self.path)
+            self._dirty = False
+
+
+PARTIAL_SIZE = 64 * 1024
+
+
+def _partial_hash(path, size, algo):
+    '''Digest of the first and last PARTIAL_SIZE bytes, the whole file if small.'''
+    h = hashlib.new(algo)
+    with open(path, 'rb') as fh:
+        h.update(fh.read(PARTIAL_SIZE))
+        if size > 2 * PARTIAL_SIZE:
+            fh.seek(-PARTIAL_SIZE, os.SEEK_END)
+        h.update(fh.read(PARTIAL_SIZE))
+    return h.hexdigest()
+
+
+def _regroup(groups, func, workers):
+    '''Split every group of paths by func(path), in parallel.
+    :return: list of groups (of two or more) with equal func(path)
+    '''
+    keys = dict()
+    for group in groups:
+        for path in group:
+            keys[path] = id(group)
+    buckets = dict()
+    for path, key, error in imap_unordered(func, list(keys), workers):
+        if error is not None:
+            log.warning('Skipping %s: %s', path, error)
+            continue
+        buckets.setdefault((keys[path], key), list()).append(path)
+    return [sorted(g) for g in buckets.values() if len(g) > 1]
+
+
+class _Found(str):
+    '''Path find_duplicates reports, with (size, mtime_ns) when it was found.'''
+    def __new__(cls, path, st):
+        self = super(_Found, cls).__new__(cls, path)
+        self.snapshot = (st.st_size, _mtime_ns(st))
+        return self
+
+
+def _changed(path, st):
+    '''Has path changed since find_duplicates saw it? Unknown for plain paths.'''
+    snapshot = getattr(path, 'snapshot', None)
+    return snapshot is not None and snapshot != (st.st_size, _mtime_ns(st))
+
+
+def find_duplicates(roots, algo='sha256', min_size=1, workers=None, cache=None):
+    '''Groups of files with identical contents under roots. Candidates are
+    grouped by size, then by a digest of their first and last blocks, and
+    only those still matching are hashed in full, so most files are never
+    read completely. Names hard linked to the same inode count as one file.
+    :param min_size: [1] ignore files smaller than this, by default empty ones
+    :param workers: [8] hashing threads
+    :param cache: [None] DigestCache for the full hashes
+    :return: list of sorted lists of paths, largest files first
+    '''
+    sizes = dict()
+    inodes = set()
+    for root in roots:
+        for dirpath, dirnames, filenames in os.walk(str(root)):
+            dirnames.sort()
+            for name in sorted(filenames):  # which link to an inode is reported
+                path = os.path.join(dirpath, name)
+                try:
+                    st = os.lstat(path)
+                except OSError:
+                    continue
+                if not stat.S_ISREG(st.st_mode) or st.st_size < min_size:
+                    continue
+                if (st.st_dev, st.st_ino) in inodes:
+                    continue
+                inodes.add((st.st_dev, st.st_ino))
+                sizes.setdefault(st.st_size, list()).append(_Found(path, st))
+    groups = [g for g in sizes.values() if len(g) > 1]
+    size_of = dict()
+    for size, group in sizes.items():
+        for path in group:
+            size_of[path] = size
+    groups = _regroup(groups, lambda p: _partial_hash(p, size_of[p], algo), workers)
+    # a partial digest of a small file covered all of it
+    small = [g for g in groups if size_of[g[0]] <= 2 * PARTIAL_SIZE]
+    large = [g for g in groups if size_of[g[0]] > 2 * PARTIAL_SIZE]
+    groups = small + _regroup(large, lambda p: hash_file(p, algo, cache=cache), workers)
+    groups.sort(key=lambda g: (-size_of[g[0]], g))
+    return groups
+
+
+def _link_over(keep, dup, reflink):
+    '''Replace dup with a (ref)link to keep, atomically via a temp name.'''
+    tmp = os.path.join(os.path.dirname(dup), '.%s.cu-dedupe-%d' % (os.path.basename(dup), os.getpid()))
+    if reflink:
+        from cu.copier import _reflink
+        with open(keep, 'rb') as src:
+            with open(tmp, 'wb') as dst:
+                try:
+                    if not _reflink(src.fileno(), dst.fileno()):
+                        raise OSError(errno.EOPNOTSUPP, 'Reflinks not supported', dup)
+                    shutil.copystat(dup, tmp)
+                except BaseException:
+                    error = sys.exc_info()
+                    os.unlink(tmp)
+                    six.reraise(*error)
+    else:
+        os.link(keep, tmp)
+    try:
+        os.rename(tmp, dup)
+    except BaseException:
+        error = sys.exc_info()
+        os.unlink(tmp)
+        six.reraise(*error)
+
+
+def link_duplicates(groups, reflink=False):
+    '''Replace every file but the first of each group by a hard link to
+    (or, if ``reflink``, a copy-on-write clone of) the first. Each
+    replacement is atomic. Files on another device than the first of
+    their group, of another size, or (for groups from find_duplicates)
+    modified since they were found, are left alone.
+    :return: number of files replaced
+    '''
+    replaced = 0
+    for group in groups:
+        keep_st = os.stat(str(group[0]))
+        if _changed(group[0], keep_st):
+            log.warning('%s changed since it was hashed, group left alone', group[0])
+            continue
+        keep = str(group[0])
+        for dup in group[1:]:
+            st = os.stat(str(dup))
+            if st.st_dev != keep_st.st_dev:
+                continue
+            if st.st_size != keep_st.st_size or _changed(dup, st):
+                log.warning('%s changed since it was hashed, left alone', dup)
+                continue
+            dup = str(dup)
+            log.info('Replace %s with %s of %s', dup, reflink and 'reflink' or 'hard link', keep)
+            _link_over(keep, dup, reflink)
+            replaced += 1
+    return replaced
@@ -0,0 +1,91 @@
+'''Du
+
+Disk usage of a tree, like ``du -s``, from a parallel cu.walk: apparent
+size and allocated blocks, files and directories, hard links counted
+once.
+'''
+from __future__ import with_statement
+import os
+from stat import S_ISDIR
+import logging
+log = logging.getLogger('cu.du')
+
+from cu.walk import walk
+
+# st_blocks is in 512 byte units whatever the filesystem block size.
+BLOCK_UNIT = 512
+
+
+class Usage(object):
+    '''Disk usage of a tree.
+    :ivar size: apparent size, bytes
+    :ivar blocks: allocated, bytes (st_blocks); less than size if sparse
+    :ivar files: non-directory entries
+    :ivar dirs: directories, including the top
+    '''
+    __slots__ = ('size', 'blocks', 'files', 'dirs')
+
+    def __init__(self):
+        self.size = self.blocks = self.files = self.dirs = 0
+
+    def __repr__(self):
+        return '<Usage size=%d blocks=%d files=%d dirs=%d>' % (self.size, self.blocks, self.files, self.dirs)
+
+    def add(self, st):
+        self.size += st.st_size
+        if hasattr(st, 'st_blocks'):
+            self.blocks += st.st_blocks * BLOCK_UNIT
+        else:  # windows
+            self.blocks += st.st_size
+        if S_ISDIR(st.st_mode):
+            self.dirs += 1
+        else:
+            self.files += 1
+
+    def update(self, other):
+        self.size += other.size
+        self.blocks += other.blocks
+        self.files += other.files
+        self.dirs += other.dirs
+
+
+def du(top, depth=0, workers=None, onerror=None):
+    '''Disk usage of the tree under top, like ``du -s`` (and ``--apparent-size``),
+    from a parallel walk. A file with several hard links is counted once.
+    Memory is bounded: only the (dev, ino) of multiply linked files, and
+    totals for directories no deeper than ``depth``, are kept.
+    :param depth: [0] also total each directory this many levels down
+    :param workers: [DEFAULT_WORKERS] listing threads
+    :param onerror: [None] called with the OSError of unlistable directories
+    :return: dict path relative to top ('.' for top) -> Usage
+    '''
+    top = str(top)
+    totals = dict()
+    totals['.'] = Usage()
+    totals['.'].add(os.lstat(top))
+    seen = set()
+
+    def chain(parts, limit):
+        return [os.sep.join(parts[:k]) or '.' for k in range(min(depth, limit) + 1)]
+
+    for dirpath, dirnames, filenames, stats in walk(top, workers, stat=True, onerror=onerror):
+        rel = os.path.relpath(dirpath, top)
+        parts = rel != '.' and rel.split(os.sep) or []
+        local = Usage()
+        for name, st in stats.items():
+            if st.st_nlink > 1 and not S_ISDIR(st.st_mode):
+                key = (st.st_dev, st.st_ino)
+                if key in seen:
+                    continue
+                seen.add(key)
+            if S_ISDIR(st.st_mode) and len(parts) < depth:
+                # a directory's own inode counts toward it, as du
+                usage = Usage()
+                usage.add(st)
+                for key in chain(parts + [name], len(parts) + 1):
+                    totals.setdefault(key, Usage()).update(usage)
+            else:
+                local.add(st)
+        for key in chain(parts, len(parts)):
+            totals.setdefault(key, Usage()).update(local)
+    return totals
@@ -1,16 +1,76 @@
 from __future__ import with_statement
 import os
+import re
 import functools
+import itertools
 import contextlib
 import logging
 log = logging.getLogger('cu.env')
 
+import six
+
 from cu.path import Path
+from cu.context import ContextVar
+
+
+# id(mapping) -> version, bumped by every change made through an
+# Environment, shared by all Environments over the same mapping.
+_versions = dict()
+_version = itertools.count(1)
+
+# subprocess on POSIX fsencodes every name and value of env at each spawn,
+# snapshots already hold bytes so that is a no-op.
+_ENCODE = six.PY3 and os.name == 'posix'
+
+
+class Snapshot(dict):
+    '''Immutable copy of an environment, as subprocess.Popen's env wants it.'''
+    def _immutable(self, *args, **kwargs):
+        raise TypeError('Environment snapshots are immutable')
+
+    __setitem__ = __delitem__ = clear = pop = popitem = setdefault = update = _immutable
+
+
+_DELETED = object()  # tombstone of a name deleted in a layer
+
+
+class _Layer(dict):
+    '''One overlay of an Environment: name -> value, or _DELETED. Not
+    changed once on the stack, see Environment._change_top.
+    '''
+    def __init__(self, *args, **kwargs):
+        super(_Layer, self).__init__(*args, **kwargs)
+        self.cache = (None, None)  # (snapshot below, snapshot with this layer)
+
+    def snapshot(self, below):
+        cached_below, snapshot = self.cache
+        if cached_below is not below:
+            merged = dict(below)
+            for name, value in self.items():
+                if _ENCODE:
+                    name = os.fsencode(name)
+                if value is _DELETED:
+                    merged.pop(name, None)
+                elif _ENCODE:
+                    merged[name] = os.fsencode(value)
+                else:
+                    merged[name] = value
+            snapshot = Snapshot(merged)
+            self.cache = (below, snapshot)
+        return snapshot
+
+
+# id(mapping) -> tuple of _Layers active in this thread / task
+_overlays = ContextVar('cu.env.overlays', default=None)
+
+_VAR = re.compile(r'\$(\w+|\{[^}]*\})')
 
 
 class Environment(object):
     '''Machine's environment; exposes a dict-like interface.
-    TODO:
+    Calling it opens a layer: changes inside the with block are kept in an
+    overlay local to the thread (or asyncio task) rather than made to the
+    underlying mapping, commands run inside see them, and they vanish on exit.
     '''
     CASE_SENSITIVE = os.name != 'nt'
 
@@ -22,52 +82,147 @@ class Environment(object):
         # os.environ already takes care of upper'ing on windows
         self._environment = environment
         self._path_factory = path_factory
+        self._snapshot = (None, None, None)  # (version, environment copied, Snapshot)
         if os.name == 'nt' and 'HOME' not in self and self.home is not None:
             self['HOME'] = self.home
 
     def __getattr__(self, name):
         return getattr(self._environment, name)
 
+    def _layers(self):
+        overlays = _overlays.get()
+        if not overlays:
+            return ()
+        return overlays.get(id(self._environment), ())
+
+    def _change_top(self, changes):
+        '''Apply changes to the top layer. Layers are shared with contexts
+        (asyncio tasks, copied contexts) started inside the block, so the top
+        one is copied and replaced in this context only, never written to.
+        '''
+        layers = self._layers()
+        top = _Layer(layers[-1])
+        top.update(changes)
+        overlays = dict(_overlays.get())
+        overlays[id(self._environment)] = layers[:-1] + (top, )
+        _overlays.set(overlays)
+
+    def _name(self, name):
+        if not self.CASE_SENSITIVE:
+            return name.upper()
+        return name
+
+    def _view(self):
+        '''What is visible: the environment itself or, if layers are
+        active, a dict of it with them applied.
+        '''
+        layers = self._layers()
+        if not layers:
+            return self._environment
+        view = dict(self._environment)
+        for layer in layers:
+            for name, value in layer.items():
+                if value is _DELETED:
+                    view.pop(name, None)
+                else:
+                    view[name] = value
+        return view
+
     def __iter__(self):
-        return iter(self._environment)
+        return iter(list(self._view()))
 
     def __hash__(self):
         raise TypeError('unhashable type')
 
     def __len__(self):
-        return len(self._environment)
+        return len(self._view())
 
     def __contains__(self, name):
         '''Environment variable in current environment?'''
-        if not self.CASE_SENSITIVE:
-            name = name.upper()
-        return name in self._environment
+        return self.get(name, _DELETED) is not _DELETED
 
     def __getitem__(self, name):
         '''Environment variable from current environment.'''
-        if not self.CASE_SENSITIVE:
-            name = name.upper()
-        return self._environment[name]
+        value = self.get(name, _DELETED)
+        if value is _DELETED:
+            raise KeyError(name)
+        return value
 
     def __setitem__(self, name, value):
-        '''Sets environment variable in current environment.'''
-        if not self.CASE_SENSITIVE:
-            name = name.upper()
-        self._environment[name] = str(value)
+        '''Sets environment variable in current environment (top layer, if any).'''
+        self.update(**{self._name(name): value})
 
     def __delitem__(self, name):
-        '''Deletes environment variable from current environment.'''
-        if not self.CASE_SENSITIVE:
-            name = name.upper()
-        del self._environment[name]
+        '''Deletes environment variable from current environment (top layer, if any).'''
+        name = self._name(name)
+        layers = self._layers()
+        if layers:
+            if name not in self:
+                raise KeyError(name)
+            self._change_top([(name, _DELETED)])
+        else:
+            del self._environment[name]
+            self.changed()
+
+    def changed(self):
+        '''Invalidate snapshots. Called by every change made through an
+        Environment; direct changes to os.environ are noticed anyway.
+        '''
+        _versions[id(self._environment)] = next(_version)
+
+    def keys(self):
+        return list(self._view().keys())
+
+    def values(self):
+        return list(self._view().values())
+
+    def items(self):
+        return list(self._view().items())
+
+    def copy(self):
+        return dict(self._view())
+
+    def clear(self):
+        if self._layers():
+            for name in self.keys():
+                del self[name]
+        else:
+            self._environment.clear()
+            self.changed()
+
+    def pop(self, name, *default):
+        if name not in self:
+            if default:
+                return default[0]
+            raise KeyError(name)
+        value = self[name]
+        del self[name]
+        return value
+
+    def popitem(self):
+        for name in self:
+            return name, self.pop(name)
+        raise KeyError('popitem(): environment is empty')
+
+    def setdefault(self, name, value=''):
+        if name not in self:
+            self[name] = value
+        return self[name]
 
     def get(self, name, *default):
-        if not self.CASE_SENSITIVE:
-            name = name.upper()
+        name = self._name(name)
+        for layer in reversed(self._layers()):
+            if name in layer:
+                value = layer[name]
+                if value is not _DELETED:
+                    return value
+                if default:
+                    return default[0]
+                return None
         return self._environment.get(name, *default)
 
     def update(self, **kwargs):
-        '''Updates the environment.'''
+        '''Updates the environment (top layer, if any).'''
         proper = dict()
         if self.CASE_SENSITIVE:
             for k, v in kwargs.items():
@@ -75,20 +230,50 @@ class Environment(object):
         else:
             for k, v in kwargs.items():
                 proper[k.upper()] = str(v)
-        self._environment.update(**proper)
+        layers = self._layers()
+        if layers:
+            self._change_top(proper)
+        else:
+            self._environment.update(**proper)
+            self.changed()
 
     def as_dict(self):
         '''Environment as a real dictionary.'''
-        return dict((k, str(v)) for k, v in self._environment.items())
+        return dict((k, str(v)) for k, v in self._view().items())
+
+    def snapshot(self):
+        '''Environment as an immutable dict, ready to pass to subprocess
+        (names and values bytes on Python 3 POSIX). Built once and reused
+        until the environment is changed, by any means; with layers active
+        only they are applied, to the cached snapshot of the environment
+        beneath.
+        '''
+        version = _versions.get(id(self._environment), 0)
+        cached_version, source, snapshot = self._snapshot
+        current = dict(self._environment)
+        # comparing is much cheaper than encoding, and sees direct changes to os.environ
+        if cached_version != version or snapshot is None or source != current:
+            if _ENCODE:
+                snapshot = Snapshot((os.fsencode(k), os.fsencode(str(v))) for k, v in current.items())
+            else:
+                snapshot = Snapshot((k, str(v)) for k, v in current.items())
+            self._snapshot = (version, current, snapshot)
+        for layer in self._layers():
+            snapshot = layer.snapshot(snapshot)
+        return snapshot
 
     @property
-    def path(self, safe=False):
+    def path(self):
         '''The system's ``PATH`` (as an easy-to-manipulate list).
-        Returned object will update environment variable PATH.  But, unless
-        safe=True changes to PATH from other sources will not be noticed.
-        :param safe: if True, PATH env var will be reread prior to every operation.
+        Returned object will update environment variable PATH.  But changes
+        to PATH from other sources will not be noticed, see safe_path.
         '''
-        return SystemPathList(self._environment, self._path_factory, safe)
+        return SystemPathList(self, self._path_factory)
+
+    @property
+    def safe_path(self):
+        '''As path, but PATH env var is reread (if changed) prior to every operation.'''
+        return SystemPathList(self, self._path_factory, safe=True)
 
     @property
     def user(self):
@@ -127,22 +312,32 @@ class Environment(object):
              home shortcuts (as ``~/.bashrc``)
         :returns: expanded string
         '''
-        return os.path.expanduser(os.path.expandvars(text))
+        def var(match):
+            name = match.group(1)
+            if name.startswith('{'):
+                name = name[1:-1]
+            return self.get(name, match.group(0))
+        text = _VAR.sub(var, text)
+        if text.startswith('~') and (len(text) == 1 or text[1] == os.sep) and 'HOME' in self:
+            return (self['HOME'].rstrip(os.sep) + text[1:]) or os.sep
+        return os.path.expanduser(text)
 
     @contextlib.contextmanager
     def __call__(self, **kwargs):
         '''Context manager for temporal modifications of the environment.
-        Any time you enter the context, a copy of the old environment is stored,
-        and then restored, when the context exits.
+        Opens a layer, local to this thread or asyncio task, holding kwargs
+        and any changes made inside; the underlying environment (os.environ)
+        is not touched and the layer is dropped when the context exits.
         :param kwargs: ENVIRONMENT_VAR => value
         '''
-        prev = self._environment.copy()
-        self.update(**kwargs)
+        overlays = dict(_overlays.get() or ())
+        overlays[id(self._environment)] = self._layers() + (_Layer(), )
+        token = _overlays.set(overlays)
         try:
+            self.update(**kwargs)
             yield
         finally:
-            self.clear()
-            self.update(**prev)
+            _overlays.reset(token)
 
 
 class SystemPathList(list):
@@ -158,12 +353,16 @@ class SystemPathList(list):
         self._environment = environment
         self._path_factory = lambda *a, **k: path_factory(*a, **dict(keep_trailing_slash=False, **k))  # dict garbage cause keyword after *args is Python 2.5 syntax error
         self._safe = safe
+        self._text = None  # PATH as last loaded / dumped
+        self._batching = 0
+        self._dirty = False
         self.load()
 
     def wrapper(func):
         @functools.wraps(func)
         def inner(self, *args, **kwargs):
-            if self._safe:
+            # reparse only if PATH changed behind our back
+            if self._safe and not self._batching and self._environment.get('PATH', '') != self._text:
                 self.load()
             return func(self, *args, **kwargs)
         return inner
@@ -223,8 +422,32 @@ class SystemPathList(list):
         '''From text or Environment.'''
         if text is None:
             text = self._environment.get('PATH', '')
-        self[:] = [self._path_factory(p) for p in text.split(self.sep) if p]
+        super(SystemPathList, self).__setitem__(slice(None), [self._path_factory(p) for p in text.split(self.sep) if p])
+        self._text = text
 
     def dump(self):
-        '''To environment.'''
-        self._environment['PATH'] = self.sep.join(str(p) for p in self)
+        '''To environment, unless in a batch (then once at its end).'''
+        if self._batching:
+            self._dirty = True
+            return
+        text = self.sep.join(str(p) for p in self)
+        if text != self._environment.get('PATH'):
+            self._environment['PATH'] = text
+        self._text = text
+        self._dirty = False
+
+    @contextlib.contextmanager
+    def batch(self):
+        '''Context manager deferring writes of PATH: any number of changes
+        inside, one dump (and so one invalidation of snapshots) at exit.
+        Nests.
+        '''
+        if self._safe and not self._batching and self._environment.get('PATH', '') != self._text:
+            self.load()
+        self._batching += 1
+        try:
+            yield self
+        finally:
+            self._batching -= 1
+            if not self._batching and self._dirty:
+                self.dump()
@@ -0,0 +1,201 @@
+'''Follow
+
+``tail`` and ``tail -F`` without a subprocess. tail reads backwards from
+EOF a block at a time, so the cost is the size of the last n lines, not
+of the file. Follow yields lines as they are appended, reopening the file
+when logrotate renames it away (a new inode at the same path) and starting
+over when it is truncated. Between reads it sleeps on inotify for the
+file's directory, where available, rather than polling.
+'''
+from __future__ import with_statement
+import os
+import sys
+import time
+import errno
+import logging
+log = logging.getLogger('cu.follow')
+
+import six
+
+from cu.watch import Inotify, HAVE_INOTIFY
+
+
+BLOCK_SIZE = 64 * 1024
+_NL = six.b('\n')
+_ENDS = six.b('\r\n')
+
+
+def _finish(lines, encoding, keepends):
+    if not keepends:
+        lines = [l.rstrip(_ENDS) for l in lines]
+    if encoding is not None:
+        lines = [l.decode(encoding) for l in lines]
+    return lines
+
+
+def tail(path, n=10, encoding=None, keepends=True, blocksize=BLOCK_SIZE):
+    '''Last n lines of file path, reading backwards from the end in blocks.
+    :param encoding: [None] decode lines with this, else bytes
+    :param keepends: [True] leave line endings on
+    :return: list of lines
+    '''
+    if n <= 0:
+        return list()
+    with open(str(path), 'rb') as fh:
+        fh.seek(0, os.SEEK_END)
+        position = fh.tell()
+        blocks = list()
+        newlines = 0
+        # the final line needn't end in a newline, but if it does that
+        # newline doesn't start another line
+        wanted = n
+        while position > 0 and newlines <= wanted:
+            size = min(blocksize, position)
+            position -= size
+            fh.seek(position)
+            block = fh.read(size)
+            if not blocks and block.endswith(_NL):
+                wanted += 1
+            blocks.append(block)
+            newlines += block.count(_NL)
+    data = six.b('').join(reversed(blocks))
+    lines = data.splitlines(True)[-n:]
+    return _finish(lines, encoding, keepends)
+
+
+class Follow(object):
+    '''Iterate lines appended to a file, like ``tail -F``.
+    ``offset`` (just past the last line yielded, an unfinished line isn't
+    counted) and ``inode`` are where reading has got to, a later Follow
+    given them carries on from there (if the file is still the same one).
+    '''
+    def __init__(self, path, offset=None, inode=None, encoding=None, keepends=True,
+                 interval=1.0, timeout=None):
+        '''
+        :param offset: [None] start here, None is the current end of file
+        :param inode: [None] only honour offset if the file still has this inode
+        :param encoding: [None] decode lines with this, else bytes
+        :param keepends: [True] leave line endings on
+        :param interval: [1.0] most seconds between checks (inotify wakes sooner)
+        :param timeout: [None] stop after this many seconds with no new lines
+        '''
+        self.path = str(path)
+        self.encoding = encoding
+        self.keepends = keepends
+        self.interval = interval
+        self.timeout = timeout
+        self.offset = 0
+        self.inode = None
+        self._end = 0  # bytes read, offset plus undelivered
+        self._fh = None
+        self._partial = six.b('')
+        self._notify = None
+        self._lines = None
+        if HAVE_INOTIFY:
+            try:
+                self._notify = Inotify(os.path.dirname(self.path) or os.curdir, recursive=False)
+            except OSError:
+                log.debug('No inotify for %s, polling', self.path)
+        if self._open():
+            st = os.fstat(self._fh.fileno())
+            if offset is None:
+                self.offset = st.st_size
+            elif (inode is None or inode == st.st_ino) and offset <= st.st_size:
+                self.offset = offset
+            self._end = self.offset
+            self._fh.seek(self.offset)
+
+    def __iter__(self):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, t, v, tb):
+        self.close()
+
+    def close(self):
+        if self._fh is not None:
+            self._fh.close()
+            self._fh = None
+        if self._notify is not None:
+            self._notify.close()
+            self._notify = None
+
+    def _open(self):
+        try:
+            self._fh = open(self.path, 'rb')
+        except IOError:
+            if sys.exc_info()[1].errno != errno.ENOENT:
+                raise
+            self._fh = None
+            return False
+        self.inode = os.fstat(self._fh.fileno()).st_ino
+        self.offset = self._end = 0
+        self._partial = six.b('')
+        return True
+
+    def _read(self):
+        '''Complete lines available now.'''
+        if self._fh is None:
+            if not self._open():
+                return list()
+            log.info('Following %s', self.path)
+        data = self._fh.read()
+        if data:
+            self._end += len(data)
+            data = self._partial + data
+            lines = data.splitlines(True)
+            if lines and not lines[-1].endswith(_NL):
+                self._partial = lines.pop()
+            else:
+                self._partial = six.b('')
+            return lines
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return list()  # rotated away, new one not there yet
+        if st.st_ino != self.inode:
+            log.info('%s rotated, reopening', self.path)
+            self._fh.close()
+            self._open()
+            return self._read()
+        if st.st_size < self._end:
+            log.info('%s truncated, rereading', self.path)
+            self._fh.seek(0)
+            self.offset = self._end = 0
+            self._partial = six.b('')
+            return self._read()
+        return list()
+
+    def _wait(self, seconds):
+        if self._notify is not None:
+            self._notify.read(seconds)
+        else:
+            time.sleep(seconds)
+
+    def lines(self):
+        '''Generator of lines, blocking until they arrive.'''
+        quiet = time.time()
+        while True:
+            lines = self._read()
+            if lines:
+                for raw, line in zip(lines, _finish(lines, self.encoding, self.keepends)):
+                    self.offset += len(raw)
+                    yield line
+                quiet = time.time()
+                continue
+            wait = self.interval
+            if self.timeout is not None:
+                left = self.timeout - (time.time() - quiet)
+                if left <= 0:
+                    return
+                wait = min(wait, left)
+            self._wait(wait)
+
+    def __next__(self):
+        if self._lines is None:
+            self._lines = self.lines()
+        return next(self._lines)
+
+    next = __next__
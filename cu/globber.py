@@ -0,0 +1,202 @@
+'''Globber
+
+Glob engine. Any number of patterns, with ``**`` (zero or more
+directories) and ``!negations``, are compiled into one matcher that walks
+the tree once with os.scandir. Matching is a small NFA over path segments:
+each directory carries the set of (pattern, segment) states still alive,
+and a directory with no live states is never listed.
+
+Like glob.glob, wildcards don't match names starting with '.' unless the
+pattern segment does, and literal segments ('..', 'src') are looked up
+directly rather than by listing. ``**`` does not descend into symbolic
+links, so link cycles can't loop.
+'''
+import os
+import re
+import fnmatch
+import logging
+log = logging.getLogger('cu.globber')
+
+
+_MAGIC = re.compile('[*?[]')
+
+
+class _Segment(object):
+    __slots__ = ('text', 'double', 'literal', 'match', 'hidden')
+
+    def __init__(self, text):
+        self.text = text
+        self.double = text == '**'
+        self.literal = not self.double and not _MAGIC.search(text)
+        self.hidden = text.startswith('.')
+        if not self.double and not self.literal:
+            self.match = re.compile(fnmatch.translate(os.path.normcase(text))).match
+
+    def matches(self, name):
+        if self.literal:
+            return os.path.normcase(name) == os.path.normcase(self.text)
+        if name.startswith('.') and not self.hidden:
+            return False
+        if self.double:
+            return True
+        return self.match(os.path.normcase(name)) is not None
+
+
+class _Pattern(object):
+    def __init__(self, text):
+        self.text = text
+        self.negate = text.startswith('!')
+        if self.negate:
+            text = text[1:]
+        self.dir_only = text.endswith('/')
+        segments = [s for s in text.split('/') if s and s != '.']
+        # a/**/**/b == a/**/b
+        self.segments = list()
+        for s in segments:
+            if s == '**' and self.segments and self.segments[-1].double:
+                continue
+            self.segments.append(_Segment(s))
+
+
+class Matcher(object):
+    '''One or more glob patterns compiled into a single matcher.
+    Patterns are relative, '/' separated; prefix with '!' to exclude.
+    '''
+    def __init__(self, *patterns):
+        if len(patterns) == 1 and not isinstance(patterns[0], str):
+            patterns = tuple(patterns[0])
+        self.patterns = [_Pattern(str(p)) for p in patterns]
+        self.start = self._closure((i, 0) for i in range(len(self.patterns)))
+
+    def _closure(self, states):
+        '''Add states reachable by ``**`` matching zero segments.'''
+        closed = set()
+        for p, i in states:
+            segments = self.patterns[p].segments
+            while True:
+                closed.add((p, i))
+                if i < len(segments) and segments[i].double:
+                    i += 1
+                else:
+                    break
+        return frozenset(closed)
+
+    def advance(self, states, name, isdir=False, islink=False):
+        '''Consume one path segment.
+        :return: (matched, states) matched is True if name completes a
+                 positive pattern and no negative one; states for below name
+        '''
+        after = list()
+        for p, i in states:
+            segments = self.patterns[p].segments
+            if i == len(segments):
+                continue
+            seg = segments[i]
+            if not seg.matches(name):
+                continue
+            if seg.double:
+                if isdir and not islink:
+                    after.append((p, i))
+                if i + 1 == len(segments):
+                    after.append((p, i + 1))  # trailing ** also matches name
+            else:
+                after.append((p, i + 1))
+        after = self._closure(after)
+        included = excluded = False
+        for p, i in after:
+            pattern = self.patterns[p]
+            if i == len(pattern.segments) and (isdir or not pattern.dir_only):
+                if pattern.negate:
+                    excluded = True
+                else:
+                    included = True
+        return included and not excluded, after
+
+    def descend(self, states):
+        '''Is anything below a directory with these states worth listing?'''
+        alive = False
+        for p, i in states:
+            pattern = self.patterns[p]
+            rest = pattern.segments[i:]
+            if pattern.negate:
+                if len(rest) == 1 and rest[0].double:
+                    return False  # everything below is excluded
+            elif rest:
+                alive = True
+        return alive
+
+    def match(self, path, isdir=False):
+        '''Does relative path (no filesystem access) match?'''
+        states = self.start
+        names = [n for n in str(path).split('/') if n and n != '.']
+        matched = False
+        for n, name in enumerate(names):
+            last = n == len(names) - 1
+            matched, states = self.advance(states, name, isdir or not last)
+        return matched
+
+    def _names(self, dirpath, states):
+        '''(name, isdir, islink) of entries of dirpath any state could match.'''
+        listing = False
+        literals = set()
+        for p, i in states:
+            segments = self.patterns[p].segments
+            if i < len(segments):
+                if segments[i].literal:
+                    literals.add(segments[i].text)
+                else:
+                    listing = True
+        seen = set()
+        if listing:
+            try:
+                if hasattr(os, 'scandir'):
+                    entries = os.scandir(dirpath or os.curdir)
+                    try:
+                        for entry in entries:
+                            try:
+                                isdir = entry.is_dir()
+                            except OSError:
+                                isdir = False
+                            seen.add(entry.name)
+                            yield entry.name, isdir, entry.is_symlink()
+                    finally:
+                        close = getattr(entries, 'close', None)
+                        if close is not None:
+                            close()
+                else:
+                    for name in os.listdir(dirpath or os.curdir):
+                        full = os.path.join(dirpath, name)
+                        seen.add(name)
+                        yield name, os.path.isdir(full), os.path.islink(full)
+            except OSError:
+                return
+        for name in literals:
+            if name in seen:
+                continue
+            full = os.path.join(dirpath, name)
+            if os.path.lexists(full):
+                yield name, os.path.isdir(full), os.path.islink(full)
+
+    def walk(self, root=''):
+        '''Lazily yield paths under root matching, preorder. Paths are
+        root joined with the relative path, as glob.glob returns them.
+        '''
+        root = str(root)
+        stack = [(root, self.start)]
+        while stack:
+            dirpath, states = stack.pop()
+            below = list()
+            for name, isdir, islink in self._names(dirpath, states):
+                matched, after = self.advance(states, name, isdir, islink)
+                path = os.path.join(dirpath, name)
+                if matched:
+                    yield path
+                if isdir and self.descend(after):
+                    below.append((path, after))
+            below.reverse()
+            stack.extend(below)
+
+
+def iglob(root, *patterns):
+    '''Paths under root matching any of patterns (and no !pattern), one pass.'''
+    return Matcher(*patterns).walk(root)
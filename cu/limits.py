@@ -0,0 +1,200 @@
+'''Limits
+
+Resource limits, niceness, I/O priority and CPU affinity of spawned
+commands. Resource limits are always set in the child between fork and
+exec, so nothing it forks or allocates escapes them. Where the platform
+lets one process change another's (Linux: setpriority,
+sched_setaffinity, ioprio_set) niceness, I/O priority and affinity are
+applied by the parent to the child's pid just after it is spawned, so
+spawning doesn't pay for a Python preexec_fn; the child runs briefly
+without them. Otherwise, or with preexec (always for shell scripts), they
+are applied in the child too.
+
+    ls(nice=10, ionice='idle', affinity=(0, 1), rlimits=dict(cpu=60, nofile=256))
+    ls(limits=Limits(nice=10))
+    ls.limits = dict(nice=10)  # default for every run of ls
+'''
+import os
+import sys
+import errno
+import platform
+import logging
+log = logging.getLogger('cu.limits')
+
+try:
+    import resource
+except ImportError:  # windows
+    resource = None
+
+
+KEYWORDS = ('nice', 'ionice', 'affinity', 'rlimits')
+
+IOPRIO_CLASSES = dict(realtime=1, rt=1, best_effort=2, be=2, idle=3)
+IOPRIO_CLASS_SHIFT = 13
+IOPRIO_WHO_PROCESS = 1
+# SYS_ioprio_set by machine
+_IOPRIO_SET = dict(x86_64=251, amd64=251, i386=289, i686=289, aarch64=30, arm64=30, armv7l=314, ppc64le=273, s390x=282)
+
+_libc = None
+if sys.platform.startswith('linux'):
+    try:
+        import ctypes
+        import ctypes.util
+        _libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        _libc.syscall
+    except (ImportError, OSError, AttributeError):
+        _libc = None
+
+HAVE_IOPRIO = _libc is not None and platform.machine().lower() in _IOPRIO_SET
+# can the parent change each of them for the child's pid? (rlimits are
+# always set in the child)
+_REMOTE = dict(
+        nice=hasattr(os, 'setpriority'),
+        ionice=HAVE_IOPRIO,
+        affinity=hasattr(os, 'sched_setaffinity'),
+        )
+
+
+def _ioprio(value):
+    '''ioprio of 'idle', 'best-effort', 'realtime', a class number, or (class, level).'''
+    level = None
+    if isinstance(value, (tuple, list)):
+        value, level = value
+    if not isinstance(value, int):
+        value = IOPRIO_CLASSES[str(value).lower().replace('-', '_')]
+    if level is None:
+        level = 4  # the kernel's default
+        if value == IOPRIO_CLASSES['idle']:
+            level = 0
+    if not 0 <= level <= 7:
+        raise ValueError('I/O priority level out of 0-7: %r' % (level, ))
+    return (value << IOPRIO_CLASS_SHIFT) | level
+
+
+def ioprio_set(pid, ioprio):
+    '''Set I/O priority of pid, 0 for this process (Linux only).'''
+    if not HAVE_IOPRIO:
+        raise OSError(errno.ENOSYS, 'ioprio_set not supported here')
+    import ctypes
+    if _libc.syscall(_IOPRIO_SET[platform.machine().lower()], IOPRIO_WHO_PROCESS, pid, ioprio) != 0:
+        code = ctypes.get_errno()
+        raise OSError(code, os.strerror(code))
+
+
+def _cpus(affinity):
+    '''Set of CPU numbers from an iterable of them or a bit mask.'''
+    if isinstance(affinity, int):
+        return set(i for i in range(affinity.bit_length()) if affinity >> i & 1)
+    return set(affinity)
+
+
+def _rlimit(name):
+    if isinstance(name, int):
+        return name
+    return getattr(resource, 'RLIMIT_' + str(name).upper())
+
+
+class Limits(object):
+    '''What to constrain a spawned command by. Unset (None) is left as
+    inherited. A Limits is false if it sets nothing.
+    '''
+    def __init__(self, nice=None, ionice=None, affinity=None, rlimits=None, preexec=False):
+        '''
+        :param nice: [None] niceness increment, as nice(1); negative needs privilege
+        :param ionice: [None] I/O scheduling class, 'idle', 'best-effort' or
+                       'realtime', or (class, level 0-7)
+        :param affinity: [None] CPUs to run on, iterable of numbers or a bit mask
+        :param rlimits: [None] {name: soft or (soft, hard)}; names as 'as', 'cpu',
+                        'nofile' (resource.RLIMIT_<NAME>) or the constants; -1 unlimited
+        :param preexec: [False] always apply in the child before exec; use for
+                        programs that fork at once (e.g. a shell), which could
+                        otherwise start children before the limits apply
+        '''
+        self.nice = nice
+        self.ionice = None if ionice is None else _ioprio(ionice)
+        self.affinity = affinity is not None and _cpus(affinity) or None
+        self.rlimits = dict()
+        for name, value in (rlimits or dict()).items():
+            if not isinstance(value, (tuple, list)):
+                value = (value, None)
+            self.rlimits[_rlimit(name)] = tuple(value)
+        self.preexec = preexec
+
+    def __repr__(self):
+        return '<Limits nice=%r ionice=%r affinity=%r rlimits=%r>' % (self.nice, self.ionice, self.affinity, self.rlimits)
+
+    def __bool__(self):
+        return bool(self.nice or self.ionice is not None or self.affinity or self.rlimits)
+
+    __nonzero__ = __bool__
+
+    @classmethod
+    def pop(cls, kwargs, default=None):
+        '''Limits from, and removed from, popen keyword arguments: a Limits as
+        ``limits`` and any of the individual keywords, over default.
+        :param kwargs: dict of keyword arguments
+        :param default: [None] Limits, dict of keywords, or None
+        :return: Limits, or None if there are none
+        '''
+        limits = None
+        given = dict((k, kwargs.pop(k)) for k in KEYWORDS if k in kwargs)
+        for layer in (default, kwargs.pop('limits', None), given or None):
+            if isinstance(layer, dict):
+                layer = cls(**layer)
+            if layer is None:
+                continue
+            limits = layer if limits is None else limits.update(layer)
+        return limits or None
+
+    def update(self, other):
+        '''New Limits of self with what other sets replacing it.'''
+        limits = Limits()
+        for name in ('nice', 'ionice', 'affinity'):
+            value = getattr(other, name)
+            setattr(limits, name, value if value is not None else getattr(self, name))
+        limits.rlimits = dict(self.rlimits)
+        limits.rlimits.update(other.rlimits)
+        limits.preexec = self.preexec or other.preexec
+        return limits
+
+    def in_child(self):
+        '''Must these be applied in the child, before exec?'''
+        if self.preexec or self.rlimits:
+            return True
+        if self.ionice is not None and not _REMOTE['ionice']:
+            return True
+        return bool(self.nice and not _REMOTE['nice'] or self.affinity and not _REMOTE['affinity'])
+
+    def apply(self, pid):
+        '''Apply to running process pid, from outside it.'''
+        if self.nice:
+            os.setpriority(os.PRIO_PROCESS, pid, os.getpriority(os.PRIO_PROCESS, pid) + self.nice)
+        if self.ionice is not None:
+            ioprio_set(pid, self.ionice)
+        if self.affinity:
+            os.sched_setaffinity(pid, self.affinity)
+        for limit, (soft, hard) in self.rlimits.items():
+            if hard is None:
+                hard = resource.prlimit(pid, limit)[1]
+            resource.prlimit(pid, limit, (soft, hard))
+
+    def apply_self(self):
+        '''Apply to this process; what the child runs before exec.'''
+        if self.nice:
+            os.nice(self.nice)
+        if self.ionice is not None:
+            ioprio_set(0, self.ionice)
+        if self.affinity:
+            os.sched_setaffinity(0, self.affinity)
+        for limit, (soft, hard) in self.rlimits.items():
+            if hard is None:
+                hard = resource.getrlimit(limit)[1]
+            resource.setrlimit(limit, (soft, hard))
+
+    def preexec_fn(self, preexec_fn=None):
+        '''Function for Popen's preexec_fn applying these, after preexec_fn if given.'''
+        def preexec():
+            if preexec_fn is not None:
+                preexec_fn()
+            self.apply_self()
+        return preexec
@@ -105,13 +105,16 @@ class LocalSystem(object):
         '''Context manager that creates a temporary directory, which is
         removed when the context exits.
         :param suffix
+        :param background: [False] return at once and remove the directory
+                           from a background thread, see Path.delete
         :yields: :class:`Path` object
         '''
+        background = kwargs.pop('background', False)
         path = Path(tempfile.mkdtemp(*args, **kwargs))
         try:
             yield path
         finally:
-            path.delete()
+            path.delete(background=background)
 
     @contextlib.contextmanager
     def tempfile(self, mode='w+b', bufsize=-1, suffix='', prefix='tmp', dir=None):
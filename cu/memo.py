@@ -0,0 +1,213 @@
+'''Memo
+
+Memoized results of idempotent commands. A result is keyed on the
+formulated argv (so stdin data given with ``<<`` too), the working
+directory, the values of chosen environment variables, the encoding
+output is decoded with and the stat of declared input files. Results
+live in an in-memory LRU and, optionally, in a size-bounded directory
+shared by runs (and processes); a hit returns without spawning.
+
+    git_head = local['git']['rev-parse', 'HEAD'].cached(inputs=['.git/HEAD'])
+    memo.default.store = memo.DiskStore('~/.cache/cuprum')
+'''
+from __future__ import with_statement
+import os
+import sys
+import json
+import errno
+import base64
+import hashlib
+import threading
+import collections
+import logging
+log = logging.getLogger('cu.memo')
+
+
+class LRU(object):
+    '''Mapping that forgets the least recently used items beyond maxsize.'''
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self._items = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._items)
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                value = self._items.pop(key)
+            except KeyError:
+                return default
+            self._items[key] = value  # most recent
+            return value
+
+    def __setitem__(self, key, value):
+        with self._lock:
+            self._items.pop(key, None)
+            self._items[key] = value
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+
+class DiskStore(object):
+    '''Results as small JSON files under root, least recently used evicted
+    once they total more than max_bytes.
+    '''
+    def __init__(self, root, max_bytes=64 * 1024 * 1024):
+        '''
+        :param root: directory, created when needed; ~ is expanded
+        :param max_bytes: [64MiB] size the store is trimmed to
+        '''
+        self.root = os.path.expanduser(str(root))
+        self.max_bytes = max_bytes
+        self._size = None  # bytes stored, counted on first put
+        self._lock = threading.Lock()
+
+    def _path(self, key):
+        return os.path.join(self.root, key[:2], key)
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                data = json.loads(f.read().decode('utf-8'))
+            os.utime(path, None)  # recently used
+        except (IOError, OSError, ValueError):
+            return None
+        return tuple(data['result'][0:1]) + tuple(_decode(v) for v in data['result'][1:])
+
+    def put(self, key, result):
+        from cu.atomic import write_atomic
+        path = self._path(key)
+        data = json.dumps(dict(result=[result[0]] + [_encode(v) for v in result[1:3]]))
+        try:
+            os.makedirs(os.path.dirname(path))
+        except OSError:
+            if sys.exc_info()[1].errno != errno.EEXIST:
+                raise
+        try:
+            replaced = os.stat(path).st_size
+        except OSError:
+            replaced = 0
+        write_atomic(path, data, encoding='utf-8', fsync=False)
+        with self._lock:
+            if self._size is None:
+                self._size = sum(size for path, size, mtime in self._entries())
+            else:
+                self._size += len(data) - replaced
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _entries(self):
+        for dirpath, dirnames, filenames in os.walk(self.root):
+            for name in filenames:
+                path = os.path.join(dirpath, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                yield path, st.st_size, st.st_mtime
+
+    def _evict(self):
+        '''Remove least recently used entries down to 3/4 of max_bytes.'''
+        entries = sorted(self._entries(), key=lambda entry: entry[2])
+        size = sum(entry[1] for entry in entries)
+        target = self.max_bytes * 3 // 4
+        for path, entry_size, mtime in entries:
+            if size <= target:
+                break
+            try:
+                os.unlink(path)
+                size -= entry_size
+            except OSError:
+                pass
+        self._size = size
+
+    def clear(self):
+        with self._lock:
+            for path, size, mtime in list(self._entries()):
+                try:
+                    os.unlink(path)
+                except OSError:
+                    pass
+            self._size = 0
+
+
+def _encode(value):
+    if isinstance(value, bytes):
+        return dict(b64=base64.b64encode(value).decode('ascii'))
+    return value
+
+
+def _decode(value):
+    if isinstance(value, dict):
+        return base64.b64decode(value['b64'].encode('ascii'))
+    return value
+
+
+class Memo(object):
+    '''LRU in front of an optional DiskStore.'''
+    def __init__(self, maxsize=1024, store=None):
+        '''
+        :param maxsize: [1024] results kept in memory
+        :param store: [None] DiskStore, or its root directory
+        '''
+        self.lru = LRU(maxsize)
+        if store is not None and not isinstance(store, DiskStore):
+            store = DiskStore(store)
+        self.store = store
+        self.hits = self.misses = 0
+        self._lock = threading.Lock()  # for the counts
+
+    def get(self, key):
+        '''(returncode, stdout, stderr), None if not stored.'''
+        result = self.lru.get(key)
+        if result is None and self.store is not None:
+            result = self.store.get(key)
+            if result is not None:
+                self.lru[key] = result
+        with self._lock:
+            if result is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return result
+
+    def put(self, key, result):
+        result = tuple(result[:3])
+        self.lru[key] = result
+        if self.store is not None:
+            self.store.put(key, result)
+
+    def clear(self):
+        self.lru.clear()
+        if self.store is not None:
+            self.store.clear()
+
+
+default = Memo()
+
+
+def key(argv, cwd=None, env=None, encoding=None, inputs=()):
+    '''Hex digest identifying a run.
+    :param argv: formulated argv
+    :param cwd: [None] working directory
+    :param env: [None] {name: value} of the environment variables that matter
+    :param encoding: [None] output is decoded with
+    :param inputs: [()] files whose (mtime, size, inode) matter; missing is fine
+    '''
+    from cu.digest import _mtime_ns
+    stats = list()
+    for path in inputs:
+        try:
+            st = os.stat(str(path))
+            stats.append([str(path), _mtime_ns(st), st.st_size, st.st_ino])
+        except OSError:
+            stats.append([str(path), None])
+    text = json.dumps([[str(a) for a in argv], cwd and str(cwd), sorted((env or dict()).items()), encoding, stats])
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
@@ -0,0 +1,330 @@
+'''Metrics
+
+Counters, latency histograms and a gauge of command executions, per
+executable. Off by default: until enable() the hooks in cu.command cost a
+global lookup and an ``is None`` test per process. Export as a dict or in
+the Prometheus text format (e.g. for node_exporter's textfile collector).
+
+    from cu import metrics
+    metrics.enable()
+    ...
+    metrics.registry.write_prometheus('/var/lib/node_exporter/cu.prom')
+
+profile() reports, by executable, the wall time and resource usage of the
+commands run inside it (see cu.command.RunResult).
+
+    with cu.profile(sort='cpu'):
+        ...
+'''
+from __future__ import with_statement
+import sys
+import time
+import bisect
+import threading
+import logging
+log = logging.getLogger('cu.metrics')
+
+
+# upper bounds, in seconds, of the duration histogram buckets
+BUCKETS = (.005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10, 30, 60, 300)
+
+STARTED = 'cu_command_started_total'
+FINISHED = 'cu_command_finished_total'
+FAILED = 'cu_command_failed_total'
+TIMED_OUT = 'cu_command_timed_out_total'
+CAPTURED = 'cu_command_captured_bytes_total'
+SECONDS = 'cu_command_duration_seconds'
+RUNNING = 'cu_command_running'
+
+_HELP = (
+        (STARTED, 'counter', 'Processes spawned.'),
+        (FINISHED, 'counter', 'Processes waited for.'),
+        (FAILED, 'counter', 'Processes that exited with an unexpected code.'),
+        (TIMED_OUT, 'counter', 'Processes killed on timeout.'),
+        (CAPTURED, 'counter', 'Bytes of output captured, by stream.'),
+        (SECONDS, 'histogram', 'Wall time from spawn to exit.'),
+        (RUNNING, 'gauge', 'Processes spawned and not yet waited for.'),
+        )
+
+# None while disabled, checked by the hooks
+registry = None
+
+
+class Histogram(object):
+    '''Cumulative-bucket histogram, as Prometheus has them.'''
+    __slots__ = ('counts', 'count', 'sum')
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)  # last is +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(BUCKETS, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def as_dict(self):
+        buckets = list()
+        total = 0
+        for bound, count in zip(BUCKETS + (float('inf'), ), self.counts):
+            total += count
+            buckets.append((bound, total))
+        return dict(buckets=buckets, count=self.count, sum=self.sum)
+
+
+class Registry(object):
+    '''Metrics of the commands run since it was created or reset.'''
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._counters = dict()  # (name, labels) -> number
+            self._histograms = dict()  # executable -> Histogram
+            self._running = dict()  # executable -> number
+
+    def _inc(self, name, labels, value=1):
+        key = (name, labels)
+        self._counters[key] = self._counters.get(key, 0) + value
+
+    def spawned(self, proc, executable):
+        '''Hook: proc was started.'''
+        with self._lock:
+            # [running gauges it counts in, executable, reaped, outcome counted]
+            proc._metered = [self._running, executable, False, False]
+            self._inc(STARTED, (executable, ))
+            self._running[executable] = self._running.get(executable, 0) + 1
+
+    def _metering(self, proc):
+        '''proc's _metered if it was spawned since the last reset, else None.'''
+        metered = getattr(proc, '_metered', None)
+        if metered is not None and metered[0] is self._running:
+            return metered
+        return None
+
+    def _reap(self, proc, end):
+        metered = self._metering(proc)
+        if metered is None or metered[2]:
+            return
+        metered[2] = True  # only once
+        executable = metered[1]
+        self._inc(FINISHED, (executable, ))
+        self._running[executable] -= 1
+        start = getattr(proc, '_start_time', None)
+        if start is not None:
+            histogram = self._histograms.get(executable)
+            if histogram is None:
+                histogram = self._histograms[executable] = Histogram()
+            histogram.observe(max(0.0, end - start))
+
+    def reaped(self, proc):
+        '''Hook: proc exited and was waited for, by whoever; see cu.command.Popen.'''
+        with self._lock:
+            self._reap(proc, time.time())
+
+    def finished(self, proc, captured=(0, 0), failed=False, timed_out=False):
+        '''Hook: run_proc is done with proc (and any earlier pipeline stages).
+        Earlier stages still running are left to reaped, called when they
+        are waited for.
+        :param captured: [(0, 0)] bytes read from proc's stdout and stderr
+        '''
+        end = getattr(proc, '_end_time', None) or time.time()
+        with self._lock:
+            self._reap(proc, end)
+            stage = getattr(proc, 'srcproc', None)
+            while stage is not None:
+                if getattr(stage, 'returncode', None) is not None:
+                    self._reap(stage, end)
+                stage = getattr(stage, 'srcproc', None)
+            metered = self._metering(proc)
+            if metered is None or metered[3]:
+                return
+            metered[3] = True  # only once
+            executable = metered[1]
+            if failed:
+                self._inc(FAILED, (executable, ))
+            if timed_out:
+                self._inc(TIMED_OUT, (executable, ))
+            for stream, size in zip(('stdout', 'stderr'), captured):
+                if size:
+                    self._inc(CAPTURED, (executable, stream), size)
+
+    def as_dict(self):
+        '''{executable: {metric: value}}; the histogram as buckets,
+        count and sum; captured bytes as {stream: bytes}.
+        '''
+        result = dict()
+        with self._lock:
+            for (name, labels), value in self._counters.items():
+                metrics = result.setdefault(labels[0], dict())
+                if name == CAPTURED:
+                    metrics.setdefault(name, dict())[labels[1]] = value
+                else:
+                    metrics[name] = value
+            for executable, histogram in self._histograms.items():
+                result.setdefault(executable, dict())[SECONDS] = histogram.as_dict()
+            for executable, running in self._running.items():
+                result.setdefault(executable, dict())[RUNNING] = running
+        return result
+
+    def prometheus(self):
+        '''Metrics in the Prometheus text exposition format.'''
+        def label(executable, **extra):
+            pairs = [('executable', executable)] + sorted(extra.items())
+            return '{%s}' % (','.join('%s="%s"' % (k, _escape(v)) for k, v in pairs), )
+
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted((e, h.as_dict()) for e, h in self._histograms.items())
+            running = sorted(self._running.items())
+        lines = list()
+        for name, kind, text in _HELP:
+            lines.append('# HELP %s %s' % (name, text))
+            lines.append('# TYPE %s %s' % (name, kind))
+            if kind == 'counter':
+                for (counter, labels), value in counters:
+                    if counter != name:
+                        continue
+                    if name == CAPTURED:
+                        lines.append('%s%s %d' % (name, label(labels[0], stream=labels[1]), value))
+                    else:
+                        lines.append('%s%s %d' % (name, label(labels[0]), value))
+            elif kind == 'histogram':
+                for executable, histogram in histograms:
+                    for bound, count in histogram['buckets']:
+                        le = bound == float('inf') and '+Inf' or repr(bound)
+                        lines.append('%s_bucket%s %d' % (name, label(executable, le=le), count))
+                    lines.append('%s_sum%s %r' % (name, label(executable), histogram['sum']))
+                    lines.append('%s_count%s %d' % (name, label(executable), histogram['count']))
+            else:
+                for executable, value in running:
+                    lines.append('%s%s %d' % (name, label(executable), value))
+        return '\n'.join(lines) + '\n'
+
+    def write_prometheus(self, path):
+        '''Write prometheus() to path atomically, as textfile collectors need.'''
+        from cu.atomic import write_atomic
+        write_atomic(str(path), self.prometheus(), encoding='utf-8', fsync=False)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def enable():
+    '''Start collecting, into a new Registry unless already enabled.
+    :return: the Registry
+    '''
+    global registry
+    if registry is None:
+        registry = Registry()
+    return registry
+
+
+def disable():
+    '''Stop collecting.
+    :return: the Registry that was collecting, or None
+    '''
+    global registry
+    previous, registry = registry, None
+    return previous
+
+
+# active Profiles, each given the RunResult of every command run_proc waits for
+profiles = list()
+
+_COLUMNS = ('count', 'wall', 'utime', 'stime', 'maxrss', 'inblock', 'oublock')
+
+
+def profiled(result):
+    '''Hook: a command finished with cu.command.RunResult result.'''
+    for profile in list(profiles):
+        profile.add(result)
+
+
+class Profile(object):
+    '''Collects the RunResults of commands run, from any thread, while it is
+    active and reports totals by executable.
+    Instances of this class may be used as *context-managers*, reporting on exit.
+    '''
+    def __init__(self, stream=None, sort='wall'):
+        '''
+        :param stream: [sys.stderr] where the report goes on exit, False for nowhere
+        :param sort: ['wall'] column the report is sorted by (descending), one of
+                     count, wall, cpu, utime, stime, maxrss, inblock, oublock
+        '''
+        if sort not in _COLUMNS + ('cpu', ):
+            raise ValueError('Unknown sort column: %r' % (sort, ))
+        self.stream = stream
+        self.sort = sort
+        self.results = list()
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        profiles.append(self)
+        return self
+
+    def __exit__(self, t, v, tb):
+        profiles.remove(self)
+        if self.stream is not False:
+            self.report(self.stream)
+
+    def add(self, result):
+        with self._lock:
+            self.results.append(result)
+
+    def stats(self):
+        '''{executable: {column: total}}, maxrss is the largest; None where unknown.'''
+        stats = dict()
+        with self._lock:
+            results = list(self.results)
+        for result in results:
+            row = stats.get(result.executable)
+            if row is None:
+                row = stats[result.executable] = dict((c, None) for c in _COLUMNS)
+                row['count'] = 0
+            row['count'] += 1
+            for column in _COLUMNS[1:]:
+                value = getattr(result, column)
+                if value is None:
+                    continue
+                if row[column] is None:
+                    row[column] = value
+                elif column == 'maxrss':
+                    row[column] = max(row[column], value)
+                else:
+                    row[column] += value
+        for row in stats.values():
+            row['cpu'] = None
+            if row['utime'] is not None:
+                row['cpu'] = row['utime'] + row['stime']
+        return stats
+
+    def report(self, stream=None):
+        '''Write a table of stats(), sorted by self.sort.
+        :param stream: [sys.stderr]
+        '''
+        if stream is None:
+            stream = sys.stderr
+        stats = self.stats()
+        rows = sorted(stats.items(), key=lambda item: (item[1][self.sort] or 0, item[0]), reverse=True)
+        stream.write('%7s %9s %9s %9s %9s %9s %9s  %s\n' % (
+                'count', 'wall', 'user', 'sys', 'maxrss', 'inblock', 'oublock', 'executable'))
+        for executable, row in rows:
+            cells = [str(row['count'])]
+            for column in ('wall', 'utime', 'stime'):
+                cells.append(row[column] is None and '-' or '%.3f' % (row[column], ))
+            for column in ('maxrss', 'inblock', 'oublock'):
+                cells.append(row[column] is None and '-' or str(row[column]))
+            stream.write('%7s %9s %9s %9s %9s %9s %9s  %s\n' % tuple(cells + [executable]))
+
+
+def profile(stream=None, sort='wall'):
+    '''Context manager reporting the commands run inside it, see Profile.
+    :param stream: [sys.stderr] where the report goes, False for nowhere
+    :param sort: ['wall'] column to sort by
+    :return: Profile
+    '''
+    return Profile(stream, sort)
@@ -11,7 +11,9 @@ from __future__ import with_statement
 import os
 import pwd
 import grp
-import glob
+import stat
+import time
+import errno
 import shutil
 import contextlib
 import logging
@@ -19,7 +21,8 @@ log = logging.getLogger('cu.path')
 # log.info operations that change filesystem, otherwise quiet
 
 import six
-from six.moves import reduce
+
+from cu.context import ContextVar
 
 # TODO:
 # path.relpath
@@ -28,6 +31,237 @@ from six.moves import reduce
 from os.path import commonprefix, sameopenfile, samestat
 
 
+# name -> id, getpwnam/getgrnam can mean an NSS (LDAP, NIS) round trip.
+_uids = dict()
+_gids = dict()
+
+
+def _uid(owner):
+    '''uid for user name or id, -1 (unchanged) for ''.'''
+    owner = str(owner)
+    if not owner:
+        return -1
+    if owner.isdigit():
+        return int(owner)
+    if owner not in _uids:
+        _uids[owner] = pwd.getpwnam(owner).pw_uid
+    return _uids[owner]
+
+
+def _gid(group):
+    '''gid for group name or id, -1 (unchanged) for ''.'''
+    group = str(group)
+    if not group:
+        return -1
+    if group.isdigit():
+        return int(group)
+    if group not in _gids:
+        _gids[group] = grp.getgrnam(group).gr_gid
+    return _gids[group]
+
+
+# id -> name, same reason.
+_users = dict()
+_groups = dict()
+
+
+def _user_name(uid):
+    if uid not in _users:
+        _users[uid] = pwd.getpwuid(uid).pw_name
+    return _users[uid]
+
+
+def _group_name(gid):
+    if gid not in _groups:
+        _groups[gid] = grp.getgrgid(gid).gr_name
+    return _groups[gid]
+
+
+# who -> bits that clause may touch
+_WHO = dict(
+    u=stat.S_ISUID | stat.S_IRWXU,
+    g=stat.S_ISGID | stat.S_IRWXG,
+    o=stat.S_ISVTX | stat.S_IRWXO,
+    )
+_WHO['a'] = _WHO['u'] | _WHO['g'] | _WHO['o']
+# perm -> bits, before masking by who
+_PERM = dict(
+    r=stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH,
+    w=stat.S_IWUSR | stat.S_IWGRP | stat.S_IWOTH,
+    x=stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH,
+    s=stat.S_ISUID | stat.S_ISGID,
+    t=stat.S_ISVTX,
+    )
+# rw-rw-rw-, before umask, what open() gives a new file
+_NEW_FILE = _PERM['r'] | _PERM['w']
+
+
+# Virtual working directory of this thread / asyncio task, see CWD.
+# None means the process's.
+_cwd = ContextVar('cu.path.cwd', default=None)
+
+
+def getcwd():
+    '''Working directory of this thread / task: the one CWD.chdir set or,
+    if none, the process's (os.getcwd).
+    '''
+    path = _cwd.get()
+    if path is None:
+        return os.getcwd()
+    return path
+
+
+def _resolve(path):
+    '''path as filesystem calls should get it: joined to the virtual working
+    directory, if CWD.chdir set one and path is relative (and not '').
+    '''
+    cwd = _cwd.get()
+    if cwd is None or not path or os.path.isabs(path):
+        return path
+    return os.path.join(cwd, path)
+
+
+def _chdir(directory):
+    '''Set the virtual working directory to directory, relative to the
+    current one; never calls os.chdir.
+    :raises OSError: if directory is missing or not searchable, as os.chdir would
+    '''
+    path = os.path.normpath(os.path.join(getcwd(), str(directory)))
+    if not stat.S_ISDIR(os.stat(path).st_mode):
+        raise OSError(errno.ENOTDIR, os.strerror(errno.ENOTDIR), path)
+    if not os.access(path, os.X_OK):
+        raise OSError(errno.EACCES, os.strerror(errno.EACCES), path)
+    log.info('Chdir to %s' % (path, ))
+    _cwd.set(path)
+
+
+def _unresolve(path, roots):
+    '''Undo _resolve on path found below one of roots, (path, resolved) pairs.'''
+    for text, resolved in roots:
+        if text != resolved and path.startswith(resolved):
+            rest = path[len(resolved):]
+            if not text:
+                rest = rest.lstrip(os.sep)
+            return text + rest
+    return path
+
+
+def _umask():
+    '''The process umask. Read from /proc where the kernel shows it (Linux
+    4.7+), else set and restored, which leaves it 0 for a moment.
+    '''
+    try:
+        with open('/proc/self/status') as fh:
+            for line in fh:
+                if line.startswith('Umask:'):
+                    return int(line.split()[1], 8)
+    except (IOError, OSError, ValueError):
+        pass
+    mask = os.umask(0)
+    os.umask(mask)
+    return mask
+
+
+def _uses_umask(mode):
+    '''Does parse_mode need the umask for mode (a clause without who)?'''
+    mode = str(mode).strip()
+    if mode.isdigit():
+        return False
+    for clause in mode.split(','):
+        if clause[:1] not in ('u', 'g', 'o', 'a'):
+            return True
+    return False
+
+
+class _EmptyMap(bytes):
+    '''Path.mmap of an empty file.'''
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, t, v, tb):
+        pass
+
+
+def parse_mode(mode, current=0, isdir=False, umask=None):
+    '''Mode as /bin/chmod understands it, to permission bits.
+    Octal ('644', '0755' or 644) or symbolic ('u+rwX,go-w', 'a=r', 'g=u').
+    :param current: [0] existing st_mode, symbolic modes are relative to it
+    :param isdir: [False] X applies to directories regardless of current
+    :param umask: [process umask] masks clauses without who, like chmod does
+    :return: int
+    '''
+    mode = str(mode).strip()
+    if mode.isdigit():
+        return int(mode, 8)
+    current = current & _WHO['a']
+    for clause in mode.split(','):
+        who = ''
+        while clause and clause[0] in 'ugoa':
+            who, clause = who + clause[0], clause[1:]
+        if who:
+            affected = 0
+            for w in who:
+                affected |= _WHO[w]
+        else:
+            if umask is None:
+                umask = _umask()
+            affected = _WHO['a'] & ~umask
+        if not clause or clause[0] not in '+-=':
+            raise ValueError('Invalid mode: %r' % (mode, ))
+        while clause:
+            op, clause = clause[0], clause[1:]
+            bits = 0
+            if clause and clause[0] in 'ugo':
+                # copy permissions of another class, e.g. g=u
+                shift = dict(u=6, g=3, o=0)[clause[0]]
+                bits = ((current >> shift) & 7) * _PERM['x']
+                clause = clause[1:]
+            else:
+                while clause and clause[0] not in '+-=':
+                    perm, clause = clause[0], clause[1:]
+                    if perm == 'X':
+                        if isdir or current & _PERM['x']:
+                            bits |= _PERM['x']
+                    elif perm in _PERM:
+                        bits |= _PERM[perm]
+                    else:
+                        raise ValueError('Invalid mode: %r' % (mode, ))
+            bits &= affected
+            if op == '+':
+                current |= bits
+            elif op == '-':
+                current &= ~bits
+            else:
+                cleared = affected
+                if isdir:  # chmod keeps directory setuid/setgid unless named
+                    cleared &= ~(stat.S_ISUID | stat.S_ISGID)
+                current = (current & ~cleared) | bits
+    return current
+
+
+def _apply(top, func, recursive):
+    '''Call func(path, dir_fd, stat) on top (stat'ed, following a link)
+    then, if recursive, everything under it (lstat'ed, links are not
+    followed). One tree walk; with os.fwalk entries are addressed relative
+    to their directory's fd so the kernel doesn't re-resolve the full path.
+    '''
+    func(top, None, os.stat(top))
+    if not recursive or not os.path.isdir(top):
+        return
+    if hasattr(os, 'fwalk'):
+        for root, dirs, files, rootfd in os.fwalk(top):
+            for name in dirs + files:
+                func(name, rootfd, os.stat(name, dir_fd=rootfd, follow_symlinks=False))
+    else:
+        for root, dirs, files in os.walk(top):
+            for name in dirs + files:
+                name = os.path.join(root, name)
+                func(name, None, os.lstat(name))
+
+
 class Path(object):
     '''An abstraction over file system paths.
 
@@ -79,25 +313,28 @@ class Path(object):
     sep = os.path.sep
     unicode = os.path.supports_unicode_filenames
     _text = unicode if os.path.supports_unicode_filenames else str
+    stat_ttl = None  # seconds stat(cached=True) results live, None until refresh()
 
     @classmethod
     def common_prefix(cls, paths, *bits):
         '''Unlike os.path.commonprefix this compares by path segment.
         '/var/boo, /var/bog returns /var  not /var/bo
+        For many queries against one set of paths see cu.trie.PathTrie.
         :parameters: One iterable of string and Path instances.
                     Or, two or more string and Path instances.
         :return: new Path()
         '''
+        from cu.trie import segments
         # Support single iterable or bunch of parameters
         if bits:
             paths = (paths, ) + tuple(bits)
         prefix = list()
-        # Path.split keeps leading slash, booyah!
-        for segments in zip(*(Path(p).split() for p in paths)):
+        # segments keeps leading slash, booyah!
+        for segs in zip(*(segments(cls._normal(p)) for p in paths)):
             # All segments equal?
-            if not reduce(lambda a, b: a == b and a, segments):
+            if segs.count(segs[0]) != len(segs):
                 break
-            prefix.append(segments[0])
+            prefix.append(segs[0])
         if prefix:
             return Path(*prefix)
         else:
@@ -110,21 +347,25 @@ class Path(object):
                     Or, two or more string and Path instances.
         :return: new Path()
         '''
+        from cu.trie import segments
+
         def with_slash(path):
-            bits = Path(path).split()
-            if bits:
-                bits.reverse()
-                for p in bits[:-1]:
-                    yield p
-                    yield cls.sep
-                yield bits[-1]
+            bits = segments(cls._normal(path))
+            bits.reverse()
+            slashed = list()
+            for p in bits[:-1]:
+                slashed.append(p)
+                slashed.append(cls.sep)
+            slashed.extend(bits[-1:])
+            return slashed
         if bits:
             paths = (paths, ) + tuple(bits)
+        paths = list(paths)
         suffix = list()
-        for segments in zip(*(with_slash(p) for p in paths)):
-            if not reduce(lambda a, b: a == b and a, segments):
+        for segs in zip(*(with_slash(p) for p in paths)):
+            if segs.count(segs[0]) != len(segs):
                 break
-            suffix.append(segments[0])
+            suffix.append(segs[0])
         if suffix:
             suffix.reverse()
             # Replace trailing slash if all original paths had one.
@@ -134,24 +375,47 @@ class Path(object):
         else:
             return Path('')
 
+    @property
+    def _fs(self):
+        '''Text of this path for filesystem calls, see _resolve.'''
+        return _resolve(self._path)
+
+    @classmethod
+    def _normal(cls, path):
+        '''Normalized text of path, without making a Path if it is one.'''
+        if isinstance(path, Path):
+            return path._path
+        return Path(path)._path
+
+    @classmethod
+    def batch(cls, workers=1):
+        '''Record mkdir, touch, symlink, chown and chmod of many paths and
+        apply them together, parents first, on leaving the with block.
+        See cu.batch.Batch.
+        :param workers: [1] threads applying changes
+        :return: cu.batch.Batch
+        '''
+        from cu.batch import Batch
+        return Batch(workers)
+
     @classmethod
     def cwd(cls):
-        '''Current working directory as Path instance.'''
-        if os.path.supports_unicode_filenames:
-            return cls(os.getcwdu())
-        else:
-            return cls(os.getcwd())
+        '''Current working directory as Path instance.
+        The virtual one of this thread / task if CWD.chdir set it.
+        '''
+        return cls(cls._text(getcwd()))
 
     getcwd = cwd
 
     def __enter__(self):
-        '''Context manager.'''
-        self.__previous_directory = os.getcwd()
-        self.chdir(self._path)
+        '''Context manager, chdir to this path and back, see CWD.'''
+        self.__previous_directory = _cwd.get()
+        self.chdir()
+        return self
 
-    def __exit__(self):
+    def __exit__(self, t, v, tb):
         '''Context manager.'''
-        self.chdir(self.__previous_directory)
+        _cwd.set(self.__previous_directory)
 
     def __init__(self, path, *bits, **kwargs):
         '''Initialize Path from string/unicode, Path, iterator of those, multiple parameters of those
@@ -177,6 +441,7 @@ class Path(object):
             elif slasher and path != self.sep:
                 path += self.sep
         self._path = self._text(path)
+        self._snapshots = None
         if bits:
             # TODO: kind of lame
             self._path = self.join(*bits)._path
@@ -206,7 +471,7 @@ class Path(object):
         return iter(self.list())
 
     def __floordiv__(self, expr):
-        '''Returns a (possibly empty) list of paths that matched glob-pattern under this path.'''
+        '''Paths that match glob-pattern under this path, as Path.glob (a generator).'''
         return self.glob(expr)
 
     def __div__(self, other):
@@ -305,7 +570,7 @@ class Path(object):
         elif self == '':
             bits = ('', )
         else:
-            bits = (os.getcwd(), self)
+            bits = (getcwd(), self)
         # This garbage cause keyword after *args is syntax error in Python 2.5
         lame = self._pathize('')
         lame.__init_path__(*bits)
@@ -349,7 +614,7 @@ class Path(object):
 
     def exists(self):
         '''True if this path exist and is not a broken link.'''
-        return os.path.exists(self._path)
+        return os.path.exists(self._fs)
 
     isreal = exists
     is_real = exists
@@ -369,7 +634,7 @@ class Path(object):
 
     def is_dir(self):
         '''True if this path is a directory.'''
-        return os.path.isdir(self._path)
+        return os.path.isdir(self._fs)
 
     isdir = is_dir
 
@@ -381,41 +646,41 @@ class Path(object):
 
     def is_file(self):
         '''True if this path is a regular file.'''
-        return os.path.isfile(self._path)
+        return os.path.isfile(self._fs)
 
     isfile = is_file
 
     def is_link(self):
         '''True if this path is a symbolic link.'''
-        return os.path.islink(self._path)
+        return os.path.islink(self._fs)
 
     islink = is_link
 
     def is_mount(self):
         '''True if this path is a mount point.'''
-        return os.path.ismount(self._path)
+        return os.path.ismount(self._fs)
 
     ismount = is_mount
 
     def size(self):
         '''Size in bytes of leaf component of this path.'''
-        return os.stat(self._path).st_size
+        return os.stat(self._fs).st_size
 
     def atime(self):
         '''Access time of leaf component of this path.'''
-        return os.stat(self._path).st_atime
+        return os.stat(self._fs).st_atime
 
     def mtime(self):
         '''Modified time of leaf component of this path.'''
-        return os.stat(self._path).st_mtime
+        return os.stat(self._fs).st_mtime
 
     def ctime(self):
         '''Change/creation(win32) time of leaf component of this path.'''
-        return os.stat(self._path).st_ctime
+        return os.stat(self._fs).st_ctime
 
     def _get_owner(self):
         stat = self.stat()
-        return pwd.getpwuid(stat.st_uid)[0]
+        return _user_name(stat.st_uid)
 
     def _set_owner(self, owner):
         if ':' in owner:
@@ -427,7 +692,7 @@ class Path(object):
 
     def _get_group(self):
         stat = self.stat()
-        return grp.getgrgid(stat.st_gid)[0]
+        return _group_name(stat.st_gid)
 
     def _set_group(self, group):
         self.chown(group=group)
@@ -445,22 +710,48 @@ class Path(object):
 
     def same_file(self, path):
         '''os.path.samefile'''
-        return os.path.realpath(self._path, path)
+        return os.path.samefile(self._fs, _resolve(self._text(path)))
 
     samefile = same_file  # what os.path calls it
 
-    def stat(self, followlinks=True):
+    def stat(self, followlinks=True, cached=False):
         '''Same as os.stat(self).
         :param followlinks: [True] if False use os.lstat
+        :param cached: [False] if True reuse the result of an earlier cached
+                       call, until `refresh` or ``stat_ttl`` seconds pass.
         '''
+        if cached:
+            if self._snapshots is None:
+                self._snapshots = dict()
+            # a relative path names another file once the virtual cwd moves
+            key = (self._fs, followlinks)
+            if key not in self._snapshots:
+                self._snapshots[key] = Snapshot(key[0], followlinks, self.stat_ttl)
+            return self._snapshots[key].stat()
         if followlinks:
-            return os.stat(self._path)
+            return os.stat(self._fs)
         else:
-            return os.lstat(self._path)
+            return os.lstat(self._fs)
+
+    def snapshot(self, followlinks=True, ttl=None):
+        '''Stat this path once, read size, times, owner, group and mode from
+        that one result.
+        :param followlinks: [True] if False use os.lstat
+        :param ttl: [None] seconds until the snapshot re-stats itself, None never
+        :return: new Snapshot()
+        '''
+        return Snapshot(self._fs, followlinks, ttl)
+
+    def refresh(self):
+        '''Forget stat results cached by ``stat(cached=True)``.
+        :return: self (for chaining)
+        '''
+        self._snapshots = None
+        return self
 
     def statfs(self):
         '''Same as os.statvfs(self)'''
-        return os.statvfs(self._path)
+        return os.statvfs(self._fs)
 
     statvfs = statfs
 
@@ -574,11 +865,11 @@ class Path(object):
 
     def abspath(self):
         '''os.path.abspath'''
-        return self._pathize(os.path.abspath(self._path))
+        return self._pathize(os.path.abspath(os.path.join(getcwd(), self._path)))
 
     def realpath(self):
         '''os.path.realpath'''
-        return self._pathize(os.path.realpath(self._path))
+        return self._pathize(os.path.realpath(os.path.join(getcwd(), self._path)))
 
     def normpath(self):
         '''All Path instances are normalized on construction, os.path.normpath'''
@@ -603,19 +894,27 @@ class Path(object):
         '''Probably wanna use `expand` os.path.expandvars.'''
         return self._pathize(os.path.expandvars(self._path))
 
-    def glob(self, pattern):
-        '''Expand pattern as glob.glob rooted at this path.
-        :return: (possibly empty) generator of Path()s matching glob
+    def glob(self, pattern, *patterns):
+        '''Expand patterns rooted at this path in a single pass, see
+        cu.globber. Supports ``**`` and ``!pattern`` exclusions.
+        :return: (possibly empty) generator of Path()s matching any pattern
         '''
-        for path in glob.glob(self._text(self / pattern)):
-            yield self._pathize(path)
+        from cu.globber import Matcher
+        patterns = [self._text(p).lstrip(self.sep) for p in (pattern, ) + patterns]
+        root = self._fs
+        if not root and _cwd.get() is not None:
+            root = getcwd()
+        roots = ((self._path, root), )
+        for path in Matcher(*patterns).walk(root):
+            yield self._pathize(_unresolve(path, roots))
 
     def walk(self, topdown=True, onerror=None, followlinks=False):
         '''os.walk, a generator.
         :return: (dirpath, dirnames, filenames)
         '''
-        for x in os.walk(self._path, topdown, onerror, followlinks):
-            yield x
+        roots = ((self._path, self._fs), )
+        for dirpath, dirnames, filenames in os.walk(self._fs, topdown, onerror, followlinks):
+            yield (_unresolve(dirpath, roots), dirnames, filenames)
 
     def walk_iter(self, filter=lambda p: True):
         '''Yield all (recursive) sub-elements under this directory, that
@@ -633,23 +932,246 @@ class Path(object):
 
     walkiter = walk_iter  # for api consistancy
 
+    def walk_parallel(self, workers=None, followlinks=False, stat=False, ordered=False, onerror=None):
+        '''Like `walk` (top down) but directories are listed concurrently.
+        Worth it on NFS/FUSE where every listdir is a network round trip.
+        Pruning dirnames has no effect. See cu.walk.walk.
+        :param workers: [8] listing threads
+        :param followlinks: [False] descend into symlinks to directories
+        :param stat: [False] also lstat entries in the worker threads
+        :param ordered: [False] yield in os.walk order
+        :param onerror: [None] called with OSError of unlistable directories
+        :return: (dirpath, dirnames, filenames) or, if ``stat``,
+                 (dirpath, dirnames, filenames, {name: lstat})
+        '''
+        from cu.walk import walk
+        roots = ((self._path, self._fs), )
+        for x in walk(self._fs, workers, followlinks, stat, ordered, onerror):
+            yield (_unresolve(x[0], roots), ) + tuple(x[1:])
+
+    walkparallel = walk_parallel  # for api consistancy
+
+    def du(self, depth=0, workers=None):
+        '''Disk usage of this tree, hard links counted once, from a parallel
+        walk. See cu.du.
+        :param depth: [0] also total each directory this many levels down
+        :param workers: [8] listing threads
+        :return: dict of Path() -> cu.du.Usage (size, blocks, files, dirs),
+                 self for the whole tree
+        '''
+        from cu.du import du
+        return dict((self if rel == '.' else self / rel, usage) for rel, usage in du(self._fs, depth, workers).items())
+
     def walk_path(self, visit, arg=None):
         '''os.path.walk Does not exist Python >= 3.x
         :param visit: func(arg, dirname, names)
         :param arg: [None] passed to visit
         :return: self (for chaining)
         '''
-        os.path.walk(self._path, visit, arg)
+        os.path.walk(self._fs, visit, arg)
         return self
 
     walkpath = walk_path  # for api consistancy
 
+    def hash(self, algo='sha256', cache=None):
+        '''Hex digest of this file's contents. See cu.digest.
+        :param algo: ['sha256'] any hashlib algorithm
+        :param cache: [None] cu.digest.DigestCache, unchanged files aren't re-read
+        :return: text
+        '''
+        from cu.digest import hash_file
+        return hash_file(self._fs, algo, cache=cache)
+
+    def hash_tree(self, algo='sha256', workers=None, cache=None):
+        '''Hex digests of every file under this directory, hashed in parallel.
+        :param algo: ['sha256'] any hashlib algorithm
+        :param workers: [8] hashing threads
+        :param cache: [None] cu.digest.DigestCache, unchanged files aren't re-read
+        :return: dict of relative path -> hex digest
+        '''
+        from cu.digest import hash_tree
+        return hash_tree(self._fs, algo, workers, cache)
+
+    hashtree = hash_tree  # for api consistancy
+
+    def read_bytes(self):
+        '''Entire contents, read straight into one buffer sized from fstat.
+        :return: bytes
+        '''
+        fd = os.open(self._fs, os.O_RDONLY)
+        try:
+            remaining = os.fstat(fd).st_size
+            chunks = list()
+            while True:
+                chunk = os.read(fd, max(remaining, 65536))
+                if not chunk:
+                    break
+                chunks.append(chunk)
+                remaining -= len(chunk)
+        finally:
+            os.close(fd)
+        if len(chunks) == 1:
+            return chunks[0]
+        return bytes().join(chunks)
+
+    def read_text(self, encoding=None, errors=None):
+        '''Entire contents decoded.
+        :param encoding: [utf-8]
+        :param errors: ['strict'] as bytes.decode
+        :return: text
+        '''
+        return self.read_bytes().decode(encoding or 'utf-8', errors or 'strict')
+
+    def write_bytes(self, data):
+        '''Replace contents with data, creating file if necessary.
+        Not atomic, see write_atomic.
+        :return: self (for chaining)
+        '''
+        log.info('Write %d bytes to %s' % (len(data), self._path))
+        fd = os.open(self._fs, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, _NEW_FILE)
+        try:
+            view = memoryview(data)
+            while view:
+                view = view[os.write(fd, view):]
+        finally:
+            os.close(fd)
+        self.refresh()
+        return self
+
+    def write_text(self, text, encoding=None, errors=None):
+        '''Replace contents with encoded text, creating file if necessary.
+        :param encoding: [utf-8]
+        :param errors: ['strict'] as text.encode
+        :return: self (for chaining)
+        '''
+        return self.write_bytes(text.encode(encoding or 'utf-8', errors or 'strict'))
+
+    def iter_lines(self, encoding=None, keepends=True, bufsize=1024 * 1024):
+        '''Stream lines through one large read buffer, so huge files don't
+        cost a read() per line or need to fit in memory.
+        :param encoding: [None] decode lines with this, else yield bytes
+        :param keepends: [True] leave line endings on
+        :param bufsize: [1MiB] read buffer size
+        '''
+        import io
+        if encoding is None:
+            fh = io.open(self._fs, 'rb', buffering=bufsize)
+            ends = six.b('\r\n')
+        else:
+            fh = io.open(self._fs, 'r', buffering=bufsize, encoding=encoding)
+            ends = '\r\n'
+        with fh:
+            for line in fh:
+                if not keepends:
+                    line = line.rstrip(ends)
+                yield line
+
+    def mmap(self):
+        '''Read-only memory map of this file's contents; slicing it or
+        memoryview() of it copies nothing. Close it when done (it is a
+        context manager on Python 3). An empty file can't be mapped, it
+        gives empty bytes that can also be closed.
+        :return: mmap.mmap
+        '''
+        import mmap
+        fd = os.open(self._fs, os.O_RDONLY)
+        try:
+            if not os.fstat(fd).st_size:
+                return _EmptyMap()
+            return mmap.mmap(fd, 0, access=mmap.ACCESS_READ)
+        finally:
+            os.close(fd)
+
+    def write_atomic(self, data, encoding=None, fsync=True, batch=None):
+        '''Replace contents with data atomically: temp file, fsync, rename.
+        See cu.atomic.
+        :param data: bytes, or text encoded with ``encoding``
+        :param encoding: [utf-8] for text data
+        :param fsync: [True] False skips fsyncs: still atomic, not durable
+        :param batch: [None] cu.atomic.AtomicBatch to defer the rename and
+                      share fsync costs with other writes until it commits
+        :return: self (for chaining)
+        '''
+        log.info('Atomic write to %s' % (self._path, ))
+        if batch is not None:
+            batch.write(self._fs, data, encoding)
+        else:
+            from cu.atomic import write_atomic
+            write_atomic(self._fs, data, encoding, fsync)
+            self.refresh()
+        return self
+
+    def tail(self, n=10, encoding=None, keepends=True):
+        '''Last n lines, reading backwards from the end so the rest of the
+        file isn't read. See cu.follow.
+        :param encoding: [None] decode lines with this, else bytes
+        :param keepends: [True] leave line endings on
+        :return: list of lines
+        '''
+        from cu.follow import tail
+        return tail(self._fs, n, encoding, keepends)
+
+    def follow(self, offset=None, inode=None, encoding=None, keepends=True, interval=1.0, timeout=None):
+        '''Iterate lines as they are appended, like ``tail -F``: survives
+        rotation and truncation. See cu.follow.Follow.
+        :param offset: [None] start here, None is the current end of file
+        :param inode: [None] only honour offset if the file still has this inode
+        :param encoding: [None] decode lines with this, else bytes
+        :param keepends: [True] leave line endings on
+        :param interval: [1.0] most seconds between checks (inotify wakes sooner)
+        :param timeout: [None] stop after this many seconds with no new lines
+        :return: cu.follow.Follow, its offset and inode say where it got to
+        '''
+        from cu.follow import Follow
+        return Follow(self._fs, offset, inode, encoding, keepends, interval, timeout)
+
+    def watch(self, recursive=True, debounce=0.1, timeout=None, poll=False, interval=1.0):
+        '''Batches of coalesced cu.watch.Events as this file or directory
+        changes, via inotify where available, else by polling. Watching
+        starts when called.
+        :param recursive: [True] changes anywhere below this directory
+        :param debounce: [0.1] collect events until none arrive for this long
+        :param timeout: [None] yield an empty batch after this many quiet seconds
+        :param poll: [False] poll even where inotify works
+        :param interval: [1.0] seconds between polls
+        '''
+        from cu.watch import watch
+        roots = ((self._path, self._fs), )
+
+        def pathize(path):
+            return self._pathize(_unresolve(path, roots))
+
+        def pathize_all(events):
+            return [e._replace(path=pathize(e.path), dest=e.dest and pathize(e.dest)) for e in events]
+        return (pathize_all(events) for events in watch(self._fs, recursive, debounce, timeout, poll, interval))
+
+    def find_duplicates(self, *roots, **kwargs):
+        '''Groups of identical files under this path and any other roots.
+        Files are compared by size, then a digest of their first and last
+        blocks, and only then hashed in full. See cu.digest.find_duplicates.
+        :param algo: ['sha256'] any hashlib algorithm
+        :param min_size: [1] ignore smaller files, by default empty ones
+        :param workers: [8] hashing threads
+        :param link: [None] 'hard' or 'reflink' to atomically replace each
+                     duplicate with a link to (or clone of) the first of its group
+        :return: list of lists of Path()s, largest files first
+        '''
+        from cu.digest import find_duplicates, link_duplicates
+        link = kwargs.pop('link', None)
+        if link not in (None, 'hard', 'reflink'):
+            raise ValueError('Invalid link: %r' % (link, ))
+        roots = [(r, _resolve(r)) for r in [self._path] + [self._text(r) for r in roots]]
+        groups = find_duplicates([resolved for r, resolved in roots], **kwargs)
+        if link is not None:
+            link_duplicates(groups, reflink=link == 'reflink')
+        return [[self._pathize(_unresolve(p, roots)) for p in group] for group in groups]
+
     def readlink(self):
         '''Path this symbolic link points to.
         Error if self is not a symbolic link
         :return: relative or absolute Path()
         '''
-        return os.readlink(self._path)
+        return os.readlink(self._fs)
 
     def link(self, link, force=False, symbolic=False):
         '''Create link to this path.
@@ -661,10 +1183,10 @@ class Path(object):
             Path(link).delete()
         if symbolic:
             log.info('Symlink to %s' % (self._path, ))
-            os.symlink(self._path, self._text(link))
+            os.symlink(self._path, _resolve(self._text(link)))
         else:
             log.info('Hardlink to %s' % (self._path, ))
-            os.link(self._path, self._text(link))
+            os.link(self._fs, _resolve(self._text(link)))
         return self._pathize(link)
 
     def hardlink(self, link, force=False):
@@ -688,33 +1210,61 @@ class Path(object):
         :return: list of Path()s'''
         if self.isfile():
             return [self, ]
-        return [self / file for file in os.listdir(self._path)]
+        return [self / file for file in os.listdir(self._fs)]
 
     def chdir(self):
-        '''Changes current working directory to this path.
+        '''Changes the (virtual, see CWD) working directory to this path.
         :return: self (for chaining)
         '''
-        log.info('Chdir to %s' % (self._path, ))
-        os.chdir(self._path)
+        _chdir(self._path)
         return self
 
-    def copy(self, dest, force=False, symlinks=False):
+    def copy(self, dest, force=False, symlinks=False, workers=None, progress=None, verify=None):
         '''Copies this path (recursively, if a directory) to the destination.
+        Files are reflinked or copied in-kernel where possible, directory
+        trees with a pool of threads. See cu.copier.
         :param dest: fullpath including filename
         :param force: [False] existing dest is deleted
-        :parm symlinks: [False] passed to shutil.copytree
+        :parm symlinks: [False] copy symbolic links as links, like shutil.copytree
+        :param workers: [8] threads copying files of a directory tree
+        :param progress: [None] called with a cu.copier.Progress after each file
+        :param verify: [None] hashlib algorithm, compare digests after copying
         :return: new Path(dest)
         '''
+        from cu.copier import copy_file, copy_tree, Progress
         dest = self._pathize(dest)
         if force:
             dest.delete()
         log.info('Copy to %s' % (dest._path, ))
         if self.isdir():
-            shutil.copytree(self._path, dest._path, symlinks)
+            copy_tree(self._fs, dest._fs, symlinks, workers, progress, verify=verify)
         else:
-            shutil.copy2(self._path, dest._path)
+            target = dest
+            if dest.isdir():  # like shutil.copy2
+                target = dest / self.basename
+            size = copy_file(self._fs, target._fs, verify=verify)
+            if progress is not None:
+                totals = Progress()
+                totals.add(size)
+                progress(totals)
         return dest
 
+    def sync(self, dest, checksum=False, delete=False, manifest=None, workers=None):
+        '''Make directory dest a mirror of this directory, copying only new
+        and changed files (size and mtime, or content if ``checksum``).
+        See cu.copier.sync.
+        :param checksum: [False] compare content digests instead of mtime
+        :param delete: [False] remove files in dest that aren't here
+        :param manifest: [None] file to remember synced state in, so
+                         unchanged files need no stat of dest next time
+        :param workers: [8] copying threads
+        :return: cu.copier.SyncSummary
+        '''
+        from cu.copier import sync
+        dest = self._pathize(dest)
+        log.info('Sync to %s' % (dest._path, ))
+        return sync(self._fs, dest._fs, checksum, delete, manifest and _resolve(str(manifest)), workers)
+
     def move(self, dest, force=False):
         '''Moves this path to a different location.
         :param force: delete any existing dest.
@@ -724,7 +1274,7 @@ class Path(object):
         if force:
             dest.delete()
         log.info('Move to %s' % (self._path, ))
-        shutil.move(self._path, dest._path)
+        shutil.move(self._fs, dest._fs)
         return dest
 
     def rename(self, newname, force=False):
@@ -734,16 +1284,20 @@ class Path(object):
         '''
         return self.move(self.up() / newname, force)
 
-    def delete(self):
+    def delete(self, workers=None, background=False):
         '''Deletes this path (recursively, if a directory).
+        No error if it doesn't exist. Directories are removed with
+        dir_fd-relative calls, subtrees in parallel. See cu.remover.
+        :param workers: [8] threads removing subtrees, 1 for none
+        :param background: [False] rename directory aside and delete it from
+                           a background thread, returning immediately.
         :return: self (for chaining)
         '''
-        if self.exists:
+        if os.path.lexists(self._fs):
+            from cu.remover import remove
             log.info('Delete %s' % (self._path, ))
-            if self.isdir():
-                shutil.rmtree(self._path)
-            else:
-                os.remove(self._path)
+            self.refresh()
+            remove(self._fs, workers, background)
         return self
 
     # Unixisms
@@ -759,7 +1313,7 @@ class Path(object):
         '''os.mkfifo
         :param mode: [666]
         '''
-        os.mkfifo(self._path, mode)
+        os.mkfifo(self._fs, mode)
         return self
 
     mkfifo = fifo  # what it is called in os module
@@ -773,7 +1327,7 @@ class Path(object):
         '''
         if major is not None and minor is not None:
             device = os.makeddev(major, minor)
-        os.mknod(self._path, mode, device)
+        os.mknod(self._fs, mode, device)
         return self
 
     mknod = mknode  # what it is called in os module
@@ -786,8 +1340,8 @@ class Path(object):
         :param mtime: [True] set modified time to stamp
         :return: self (for chaining)
         '''
-        if not self.exists:
-            with open(self._path, 'w') as fh:
+        if not self.exists():
+            with open(self._fs, 'w') as fh:
                 fh.write('')
         if stamp is None:
             times = None
@@ -796,14 +1350,15 @@ class Path(object):
             if atime:
                 _atime = stamp
             else:
-                _atime = os.stat(self._path).st_atime
+                _atime = os.stat(self._fs).st_atime
             if mtime:
                 _mtime = stamp
             else:
-                _mtime = os.stat(self._path).st_mtime
+                _mtime = os.stat(self._fs).st_mtime
             times = (_atime, _mtime)
         log.info('Touch %s %s' % (stamp, self._path))
-        os.utime(self._path, times)
+        self.refresh()
+        os.utime(self._fs, times)
         return self
 
     def mkdir(self, force=False):
@@ -814,49 +1369,68 @@ class Path(object):
         '''
         if force:
             self.delete()
-        if not self.exists:
+        if not self.exists():
             log.info('Mkdir %s' % (self._path, ))
-            os.makedirs(self._path)
+            os.makedirs(self._fs)
         return self
 
     def chown(self, owner='', group='', recursive=False):
         '''Change ownership of leaf component of this path.
         :param owner: username or user id.  Also, user:group
         :param group: groupname or group id
-        :param recursive: [False] Apply ownership recursively
+        :param recursive: [False] Apply ownership recursively, symbolic links
+                          inside the tree are changed not followed.
         :return: self (for chaining)
         '''
         owner = str(owner)  # str so uid 0 (int) isn't seen as False
         group = str(group)
-        args = list()
-        if recursive:
-            args.append('-R')
-        if group:
-            owner = '%s:%s' % (owner, group)
-        args.append(owner)
-        args.append(self._path)
-        log.info('Chown %s %s' % (owner, self._path))
-        # TODO: native version not using chown
-        from cu import local
-        local['chown'](*args)
+        if ':' in owner:
+            owner, group = owner.split(':', 1)
+        log.info('Chown %s:%s %s' % (owner, group, self._path))
+        self.refresh()
+        uid, gid = _uid(owner), _gid(group)
+        if uid == -1 and gid == -1:
+            return self
+
+        def chown(path, dir_fd, st):
+            if uid in (-1, st.st_uid) and gid in (-1, st.st_gid):
+                return
+            if dir_fd is None:
+                if stat.S_ISLNK(st.st_mode):
+                    os.lchown(path, uid, gid)
+                else:
+                    os.chown(path, uid, gid)
+            else:
+                os.chown(path, uid, gid, dir_fd=dir_fd, follow_symlinks=False)
+        _apply(self._fs, chown, recursive)
         return self
 
     def chmod(self, mode, recursive=False):
         '''Change file mode of leaf component of this path.
-        :param mode: Any mode recognized by /bin/chown
-        :param recursive: [False] Apply mode recursively
+        :param mode: Any mode recognized by /bin/chmod, octal or symbolic.
+                     See `parse_mode`.
+        :param recursive: [False] Apply mode recursively, symbolic links
+                          inside the tree are skipped.
         :return: self (for chaining)
         '''
-        mode = str(mode)
-        args = list()
-        if recursive:
-            args.append('-R')
-        args.extend(mode.split())
-        args.append(self._path)
+        mode = str(mode).strip()
         log.info('Chmod %s %s' % (mode, self._path))
-        # TODO: native version not using chown
-        from cu import local
-        local['chmod'](*args)
+        self.refresh()
+        umask = None
+        if _uses_umask(mode):
+            umask = _umask()
+
+        def chmod(path, dir_fd, st):
+            if stat.S_ISLNK(st.st_mode):
+                return
+            bits = parse_mode(mode, st.st_mode, stat.S_ISDIR(st.st_mode), umask)
+            if bits == stat.S_IMODE(st.st_mode):
+                return
+            if dir_fd is None:
+                os.chmod(path, bits)
+            else:
+                os.chmod(path, bits, dir_fd=dir_fd)
+        _apply(self._fs, chmod, recursive)
         return self
 
 
@@ -872,26 +1446,117 @@ for attr in dir(str):
         setattr(Path, attr, closure(method))
 
 
+class Snapshot(object):
+    '''One stat result of a path, read as many times as needed.
+    Mirrors the read-only bits of Path: size(), atime(), mtime(), ctime(),
+    owner, group and mode.
+    '''
+    def __init__(self, path, followlinks=True, ttl=None):
+        '''
+        :param followlinks: [True] if False use os.lstat
+        :param ttl: [None] seconds until stat() re-stats, None never
+        '''
+        self.path = path
+        self.followlinks = followlinks
+        self.ttl = ttl
+        self.refresh()
+
+    def __repr__(self):
+        return '<%s(\'%s\')>' % (self.__class__.__name__, self.path)
+
+    def refresh(self):
+        '''Stat again.
+        :return: self (for chaining)
+        '''
+        if self.followlinks:
+            self._stat = os.stat(str(self.path))
+        else:
+            self._stat = os.lstat(str(self.path))
+        self._time = time.time()
+        return self
+
+    def stat(self):
+        '''The os.stat result, re-stat'ed if older than ttl.'''
+        if self.ttl is not None and time.time() - self._time >= self.ttl:
+            self.refresh()
+        return self._stat
+
+    def size(self):
+        '''Size in bytes.'''
+        return self.stat().st_size
+
+    def atime(self):
+        '''Access time.'''
+        return self.stat().st_atime
+
+    def mtime(self):
+        '''Modified time.'''
+        return self.stat().st_mtime
+
+    def ctime(self):
+        '''Change/creation(win32) time.'''
+        return self.stat().st_ctime
+
+    @property
+    def owner(self):
+        '''Owner name.'''
+        return _user_name(self.stat().st_uid)
+
+    @property
+    def group(self):
+        '''Group name.'''
+        return _group_name(self.stat().st_gid)
+
+    @property
+    def mode(self):
+        '''st_mode'''
+        return self.stat().st_mode
+
+
 class CWD(Path):
     '''Current Working Directory manipulator.
+    The directory is virtual and local to the thread (or asyncio task):
+    chdir validates and records it but never calls os.chdir, commands run
+    from cu are started in it, and Path.cwd and Path.abs resolve against
+    it. Threads start in the process's working directory.
     Some properties of CWD instances:
       - Path subclass
       - Are mutable
     '''
     def __init__(self, path=None, *bits, **kwargs):
-        if path is None:
-            path = os.getcwd()
-        super(CWD, self).__init__(path, *bits, **kwargs)
+        '''
+        :param path: [None] chdir to path, otherwise leave as is.
+        '''
+        self._kts = kwargs.get('keep_trailing_slash', True)
+        self._snapshots = None
+        if path is not None:
+            self.chdir(os.path.join(str(path), *[str(b) for b in bits]))
+
+    def _get_path(self):
+        return self._text(getcwd())
+
+    def _set_path(self, path):
+        _cwd.set(str(path))
+
+    _path = property(_get_path, _set_path)
 
     def __hash__(self):
         raise TypeError('unhashable type')
 
+    def _pathize(self, result):
+        '''Results are plain, immutable Paths.'''
+        if isinstance(result, six.string_types):
+            return Path(result, keep_trailing_slash=self._kts)
+        elif isinstance(result, (list, tuple)):
+            return type(result)(Path(r, keep_trailing_slash=self._kts) for r in result)
+        return result
+
     def chdir(self, directory):
         '''Changes current working directory and self to directory.
         :param directory: Relative unless starting with slash.
+        :raises OSError: if directory is missing or not searchable, as os.chdir would
         '''
-        os.chdir(directory)
-        self.__init_path__(os.getcwd())
+        _chdir(directory)
 
     @contextlib.contextmanager
     def __call__(self, directory):
@@ -899,9 +1564,9 @@ class CWD(Path):
         ``chdir`` back to the previous location; much like ``pushd``/``popd``.
         :param directory: The destination director (a string or a ``Path``)
         '''
-        previous = self._path
+        previous = _cwd.get()
+        self.chdir(directory)
         try:
-            self.chdir(directory)
             yield
         finally:
-            self.chdir(previous)
+            _cwd.set(previous)
@@ -0,0 +1,134 @@
+'''Pool
+
+Tiny thread pool for overlapping filesystem syscalls. Syscalls release the
+GIL, so on high-latency filesystems (NFS, FUSE) a handful of threads hides
+most of the round trip time.
+'''
+from __future__ import with_statement
+import sys
+import threading
+import logging
+log = logging.getLogger('cu.pool')
+
+import six
+queue = six.moves.queue
+
+
+DEFAULT_WORKERS = 8
+
+
+class WorkerPool(object):
+    '''Fixed number of daemon threads draining a task queue.
+
+    Tasks may ``submit`` further tasks; ``join`` waits until no task is
+    queued or running and re-raises the first exception any task raised.
+    After ``cancel`` queued tasks are dropped rather than run.
+
+    Instances of this class may be used as *context-managers*.
+    '''
+    def __init__(self, workers=None):
+        '''
+        :param workers: [DEFAULT_WORKERS] number of threads
+        '''
+        if workers is None:
+            workers = DEFAULT_WORKERS
+        self.workers = max(1, int(workers))
+        self.cancelled = False
+        self._tasks = queue.Queue()
+        self._error = None
+        self._lock = threading.Lock()  # no submit after close's sentinels
+        self._threads = list()
+        for _ in range(self.workers):
+            thd = threading.Thread(target=self._run)
+            thd.daemon = True
+            thd.start()
+            self._threads.append(thd)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, t, v, tb):
+        try:
+            if t is None:
+                self.join()
+            else:
+                self.cancel()
+        finally:
+            self.close()
+
+    def _run(self):
+        while True:
+            task = self._tasks.get()
+            if task is None:
+                self._tasks.task_done()
+                return
+            func, args = task
+            try:
+                if not self.cancelled:
+                    func(*args)
+            except Exception:
+                if self._error is None:
+                    self._error = sys.exc_info()
+            self._tasks.task_done()
+
+    def submit(self, func, *args):
+        '''Queue ``func(*args)`` to run on a worker thread. Dropped once
+        cancelled or closed.
+        '''
+        with self._lock:
+            if not self.cancelled and self._threads:
+                self._tasks.put((func, args))
+
+    def cancel(self):
+        '''Drop queued tasks; running tasks are left to finish.'''
+        self.cancelled = True
+
+    def join(self):
+        '''Wait for all submitted tasks (including ones they submit).'''
+        self._tasks.join()
+        if self._error is not None:
+            error, self._error = self._error, None
+            six.reraise(*error)
+
+    def close(self):
+        '''Stop worker threads once the queue drains.'''
+        with self._lock:
+            for _ in self._threads:
+                self._tasks.put(None)
+            self._threads = list()
+
+
+def imap_unordered(func, iterable, workers=None):
+    '''Apply ``func`` to each item from a WorkerPool.
+
+    At most a few items per worker are in flight, so ``iterable`` may be a
+    lazy generator over millions of entries.
+
+    :param workers: [DEFAULT_WORKERS] number of threads
+    :yields: (item, result, error) as calls complete, error is the exception
+             ``func`` raised or ``None``
+    '''
+    pool = WorkerPool(workers)
+    results = queue.Queue()
+
+    def call(item):
+        try:
+            results.put((item, func(item), None))
+        except Exception:
+            results.put((item, None, sys.exc_info()[1]))
+
+    limit = pool.workers * 4
+    inflight = 0
+    try:
+        for item in iterable:
+            pool.submit(call, item)
+            inflight += 1
+            while inflight >= limit:
+                yield results.get()
+                inflight -= 1
+        while inflight:
+            yield results.get()
+            inflight -= 1
+    finally:
+        pool.cancel()
+        pool.close()
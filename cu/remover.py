@@ -0,0 +1,175 @@
+'''Remover
+
+Recursive delete that addresses every entry relative to an open directory
+fd (unlinkat/rmdirat), so the kernel never re-resolves the full path, and
+that removes independent subtrees from a WorkerPool. A tree can also be
+renamed aside and removed by a background thread.
+'''
+from __future__ import with_statement
+import os
+import sys
+import stat
+import errno
+import shutil
+import random
+import threading
+import logging
+log = logging.getLogger('cu.remover')
+
+from cu.pool import WorkerPool, DEFAULT_WORKERS
+
+
+HAVE_DIR_FD = (
+        hasattr(os, 'supports_dir_fd')
+        and set([os.open, os.unlink, os.rmdir]) <= os.supports_dir_fd
+        and os.scandir in getattr(os, 'supports_fd', ()))
+
+_O_DIR = os.O_RDONLY | getattr(os, 'O_DIRECTORY', 0) | getattr(os, 'O_NOFOLLOW', 0)
+
+# Split the top of the tree until there are this many subtrees per worker.
+SPLIT_FACTOR = 4
+SPLIT_DEPTH = 3
+
+
+def _ignore_missing(func, *args, **kwargs):
+    '''Someone else deleting the same tree is not an error.'''
+    try:
+        func(*args, **kwargs)
+    except OSError:
+        if sys.exc_info()[1].errno != errno.ENOENT:
+            raise
+
+
+def _clear(fd):
+    '''Unlink everything but directories in directory fd.
+    :return: names of subdirectories
+    '''
+    subdirs = list()
+    entries = os.scandir(fd)
+    try:
+        for entry in entries:
+            try:
+                isdir = entry.is_dir(follow_symlinks=False)
+            except OSError:
+                isdir = False
+            if isdir:
+                subdirs.append(entry.name)
+            else:
+                _ignore_missing(os.unlink, entry.name, dir_fd=fd)
+    finally:
+        entries.close()
+    return subdirs
+
+
+def _rmtree_at(parent_fd, name):
+    '''Remove directory name, relative to parent_fd, and everything in it.
+    Iterative so depth is limited by open fds, not Python's stack.
+    '''
+    try:
+        fd = os.open(name, _O_DIR, dir_fd=parent_fd)
+    except OSError:
+        if sys.exc_info()[1].errno == errno.ENOENT:
+            return
+        raise
+    stack = [(fd, name, parent_fd, _clear(fd))]
+    try:
+        while stack:
+            fd, name, parent_fd, subdirs = stack[-1]
+            if subdirs:
+                child = subdirs.pop()
+                try:
+                    child_fd = os.open(child, _O_DIR, dir_fd=fd)
+                except OSError:
+                    if sys.exc_info()[1].errno == errno.ENOENT:
+                        continue
+                    raise
+                stack.append((child_fd, child, fd, _clear(child_fd)))
+            else:
+                stack.pop()
+                os.close(fd)
+                _ignore_missing(os.rmdir, name, dir_fd=parent_fd)
+    finally:
+        for fd, _, _, _ in stack:
+            os.close(fd)
+
+
+def _rmtree(path):
+    path = str(path).rstrip(os.sep) or os.sep
+    if not HAVE_DIR_FD:
+        shutil.rmtree(path)
+        return
+    parent_fd = os.open(os.path.dirname(path) or os.curdir, _O_DIR & ~getattr(os, 'O_NOFOLLOW', 0))
+    try:
+        _rmtree_at(parent_fd, os.path.basename(path))
+    finally:
+        os.close(parent_fd)
+
+
+def rmtree(path, workers=None):
+    '''Remove directory path and everything in it, like shutil.rmtree.
+    The top few levels are cleared in this thread until there are enough
+    independent subtrees to keep ``workers`` threads busy, then each
+    subtree is removed by a worker.
+    :param workers: [8] threads, 1 removes everything in this thread
+    '''
+    path = str(path).rstrip(os.sep) or os.sep
+    if workers is None:
+        workers = DEFAULT_WORKERS
+    if workers <= 1 or not HAVE_DIR_FD:
+        _rmtree(path)
+        return
+    expanded = list()
+    frontier = [path]
+    for _ in range(SPLIT_DEPTH):
+        if not frontier or len(frontier) >= workers * SPLIT_FACTOR:
+            break
+        below = list()
+        for d in frontier:
+            fd = os.open(d, _O_DIR)
+            try:
+                below.extend(os.path.join(d, name) for name in _clear(fd))
+            finally:
+                os.close(fd)
+            expanded.append(d)
+        frontier = below
+    if frontier:
+        with WorkerPool(min(workers, len(frontier))) as pool:
+            for d in frontier:
+                pool.submit(_rmtree, d)
+    for d in reversed(expanded):
+        _ignore_missing(os.rmdir, d)
+
+
+def _background(path, workers):
+    try:
+        rmtree(path, workers)
+    except Exception:
+        log.exception('Background delete of %s failed', path)
+
+
+def remove(path, workers=None, background=False):
+    '''Remove path whatever it is; missing is not an error.
+    :param workers: [8] see rmtree
+    :param background: [False] rename a directory aside (same directory, so
+                       same filesystem) and remove it from another thread.
+    :return: the removing Thread if ``background``, else None
+    '''
+    path = str(path).rstrip(os.sep) or os.sep
+    try:
+        st = os.lstat(path)
+    except OSError:
+        if sys.exc_info()[1].errno == errno.ENOENT:
+            return None
+        raise
+    if not stat.S_ISDIR(st.st_mode):
+        _ignore_missing(os.remove, path)
+        return None
+    if not background:
+        rmtree(path, workers)
+        return None
+    aside = os.path.join(os.path.dirname(path), '.%s.cu-delete-%06x' % (os.path.basename(path), random.getrandbits(24)))
+    os.rename(path, aside)
+    # Not a daemon, interpreter exit waits rather than leaving half a tree.
+    thd = threading.Thread(target=_background, args=(aside, workers), name='cu-delete %s' % (path, ))
+    thd.start()
+    return thd
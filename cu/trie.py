@@ -0,0 +1,193 @@
+'''Trie
+
+Paths indexed by segment. A PathTrie is nested dicts, one per directory,
+keyed by interned segment strings, so a million paths under a few roots
+share their leading segments and every lookup is O(depth) dict probes,
+whatever the number of paths stored. PathSet is the same without values.
+'''
+import os
+import logging
+log = logging.getLogger('cu.trie')
+
+from six.moves import intern
+
+
+_VALUE = object()  # key of a node's value, can't collide with a segment
+
+
+def segments(path, sep=os.sep):
+    '''Path split into interned segments, as Path.split: a leading sep is
+    kept as the first segment, empty segments are dropped.
+    '''
+    path = str(path)
+    if not path:
+        return []
+    bits = path.split(sep)
+    if bits[0] == '':
+        bits[0] = sep
+    return [intern(b) for b in bits if b]
+
+
+def _join(bits, sep=os.sep):
+    if not bits:
+        return ''
+    if bits[0] == sep:
+        return sep + sep.join(bits[1:])
+    return sep.join(bits)
+
+
+class PathTrie(object):
+    '''Mapping of paths to values with prefix queries.
+    Paths are compared by segment, so '/var/log/' is '/var/log' and
+    '/var/log' is not under '/var/lo'.
+    '''
+    def __init__(self, items=()):
+        '''
+        :param items: [()] mapping or iterable of (path, value)
+        '''
+        self._root = dict()
+        self._len = 0
+        if hasattr(items, 'items'):
+            items = items.items()
+        for path, value in items:
+            self[path] = value
+
+    def __repr__(self):
+        return '<%s %d paths>' % (self.__class__.__name__, self._len)
+
+    def __len__(self):
+        return self._len
+
+    def _node(self, path):
+        node = self._root
+        for segment in segments(path):
+            node = node.get(segment)
+            if node is None:
+                return None
+        return node
+
+    def __setitem__(self, path, value):
+        node = self._root
+        for segment in segments(path):
+            child = node.get(segment)
+            if child is None:
+                child = node[segment] = dict()
+            node = child
+        if _VALUE not in node:
+            self._len += 1
+        node[_VALUE] = value
+
+    def __getitem__(self, path):
+        node = self._node(path)
+        if node is None or _VALUE not in node:
+            raise KeyError(path)
+        return node[_VALUE]
+
+    def __contains__(self, path):
+        node = self._node(path)
+        return node is not None and _VALUE in node
+
+    def __delitem__(self, path):
+        trail = [(None, self._root)]
+        for segment in segments(path):
+            node = trail[-1][1].get(segment)
+            if node is None:
+                raise KeyError(path)
+            trail.append((segment, node))
+        if _VALUE not in trail[-1][1]:
+            raise KeyError(path)
+        del trail[-1][1][_VALUE]
+        self._len -= 1
+        # prune now empty nodes
+        while len(trail) > 1 and not trail[-1][1]:
+            segment, node = trail.pop()
+            del trail[-1][1][segment]
+
+    def get(self, path, default=None):
+        node = self._node(path)
+        if node is None:
+            return default
+        return node.get(_VALUE, default)
+
+    def _items(self, node, prefix):
+        '''(path, value) of node and below, depth first, without recursion.'''
+        stack = [(node, prefix)]
+        while stack:
+            node, bits = stack.pop()
+            if _VALUE in node:
+                yield _join(bits), node[_VALUE]
+            children = [k for k in node if k is not _VALUE]
+            children.sort(reverse=True)
+            for segment in children:
+                stack.append((node[segment], bits + [segment]))
+
+    def items(self):
+        '''(path, value) pairs, sorted by segment.'''
+        return self._items(self._root, [])
+
+    def __iter__(self):
+        for path, value in self.items():
+            yield path
+
+    keys = __iter__
+
+    def longest_prefix(self, path, default=None):
+        '''The longest stored path that path is, or is under.
+        :return: (prefix, value), (None, default) if there is none
+        '''
+        node = self._root
+        found, value = None, default
+        bits = list()
+        if _VALUE in node:
+            found, value = list(), node[_VALUE]  # '' is a prefix of everything relative
+        for segment in segments(path):
+            node = node.get(segment)
+            if node is None:
+                break
+            bits.append(segment)
+            if _VALUE in node:
+                found, value = list(bits), node[_VALUE]
+        if found is None:
+            return None, default
+        return _join(found), value
+
+    def under(self, root):
+        '''(path, value) of stored paths that are root or under it.'''
+        node = self._node(root)
+        if node is None:
+            return iter(())
+        return self._items(node, segments(root))
+
+    def common_prefix(self):
+        '''Longest path every stored path is, or is under; '' if none.'''
+        node = self._root
+        bits = list()
+        while _VALUE not in node and len(node) == 1:
+            segment = next(iter(node))
+            bits.append(segment)
+            node = node[segment]
+        if not self._len:
+            return ''
+        return _join(bits)
+
+
+class PathSet(PathTrie):
+    '''Set of paths with prefix queries, see PathTrie.'''
+    def __init__(self, paths=()):
+        super(PathSet, self).__init__((p, True) for p in paths)
+
+    def add(self, path):
+        self[path] = True
+
+    def discard(self, path):
+        if path in self:
+            del self[path]
+
+    def longest_prefix(self, path):
+        '''The longest path in the set that path is, or is under; None if none.'''
+        return super(PathSet, self).longest_prefix(path)[0]
+
+    def under(self, root):
+        '''Paths in the set that are root or under it.'''
+        for path, value in super(PathSet, self).under(root):
+            yield path
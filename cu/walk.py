@@ -0,0 +1,175 @@
+'''Walk
+
+Parallel directory tree traversal. Directories are listed concurrently
+from a WorkerPool and results stream back through a bounded queue, so
+listing a share with millions of entries overlaps the per-directory round
+trips instead of paying them one after another.
+'''
+from __future__ import with_statement
+import os
+import sys
+import threading
+import logging
+log = logging.getLogger('cu.walk')
+
+import six
+queue = six.moves.queue
+
+from cu.pool import WorkerPool
+
+DEFAULT_MAXSIZE = 1024
+
+_DONE = object()
+
+
+def _close(iterator):
+    close = getattr(iterator, 'close', None)
+    if close is not None:
+        close()
+
+
+def listdir(path, followlinks=False, stat=False):
+    '''One directory level; ``os.scandir`` where available (d_type saves a
+    stat per entry), else ``os.listdir`` plus ``os.path.isdir``.
+
+    :returns: (dirnames, filenames, recurse, stats) recurse are the dirnames
+              to descend into, stats maps name to ``os.lstat`` result (only
+              if ``stat`` is True).
+    '''
+    dirnames, filenames, recurse, stats = list(), list(), list(), dict()
+    if hasattr(os, 'scandir'):
+        entries = os.scandir(path)
+        try:
+            for entry in entries:
+                try:
+                    isdir = entry.is_dir()
+                except OSError:
+                    isdir = False
+                if isdir:
+                    dirnames.append(entry.name)
+                    if followlinks or not entry.is_symlink():
+                        recurse.append(entry.name)
+                else:
+                    filenames.append(entry.name)
+                if stat:
+                    try:
+                        stats[entry.name] = entry.stat(follow_symlinks=False)
+                    except OSError:
+                        pass  # vanished between readdir and stat
+        finally:
+            _close(entries)
+    else:
+        for name in os.listdir(path):
+            full = os.path.join(path, name)
+            if os.path.isdir(full):
+                dirnames.append(name)
+                if followlinks or not os.path.islink(full):
+                    recurse.append(name)
+            else:
+                filenames.append(name)
+            if stat:
+                try:
+                    stats[name] = os.lstat(full)
+                except OSError:
+                    pass
+    return dirnames, filenames, recurse, stats
+
+
+def walk(top, workers=None, followlinks=False, stat=False, ordered=False, onerror=None, maxsize=DEFAULT_MAXSIZE):
+    '''os.walk (top down) with directories listed concurrently.
+
+    Unlike os.walk removing names from dirnames does not prune the walk,
+    subdirectories are queued as soon as their parent is listed.
+
+    :param workers: [DEFAULT_WORKERS] listing threads
+    :param followlinks: [False] descend into symlinks to directories
+    :param stat: [False] also lstat every entry, from the worker threads
+    :param ordered: [False] yield in the same order as os.walk; costs memory
+                    for results that arrive ahead of their turn
+    :param onerror: [None] called with the OSError of unlistable directories
+    :param maxsize: [DEFAULT_MAXSIZE] directories buffered before workers block
+    :yields: (dirpath, dirnames, filenames) or, if ``stat``,
+             (dirpath, dirnames, filenames, stats)
+    '''
+    top = str(top)
+    pool = WorkerPool(workers)
+    results = queue.Queue(maxsize)
+
+    def put(item):
+        while not pool.cancelled:
+            try:
+                results.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+
+    def visit(dirpath):
+        try:
+            dirnames, filenames, recurse, stats = listdir(dirpath, followlinks, stat)
+        except OSError:
+            put((dirpath, None, sys.exc_info()[1]))
+            return
+        # Submit before put so pool.join can't see an empty queue early.
+        children = [os.path.join(dirpath, name) for name in recurse]
+        for child in children:
+            pool.submit(visit, child)
+        put((dirpath, (dirnames, filenames, stats, children), None))
+
+    def finish():
+        try:
+            pool.join()
+        except Exception:
+            put((_DONE, None, sys.exc_info()))
+        else:
+            put((_DONE, None, None))
+
+    pool.submit(visit, top)
+    waiter = threading.Thread(target=finish)
+    waiter.daemon = True
+    waiter.start()
+
+    def done(item):
+        '''Re-raise the error a worker died of, if any.'''
+        if item[2] is not None:
+            six.reraise(*item[2])
+
+    def emit(dirpath, listing):
+        dirnames, filenames, stats, children = listing
+        if stat:
+            return (dirpath, dirnames, filenames, stats)
+        return (dirpath, dirnames, filenames)
+
+    try:
+        if ordered:
+            early = dict()
+            stack = [top]
+            while stack:
+                dirpath = stack.pop()
+                while dirpath not in early:
+                    item = results.get()
+                    if item[0] is _DONE:
+                        done(item)
+                        raise RuntimeError('walk of %s lost %s' % (top, dirpath))
+                    early[item[0]] = item[1:]
+                listing, error = early.pop(dirpath)
+                if error is not None:
+                    if onerror is not None:
+                        onerror(error)
+                    continue
+                yield emit(dirpath, listing)
+                stack.extend(reversed(listing[3]))
+        else:
+            while True:
+                item = results.get()
+                if item[0] is _DONE:
+                    done(item)
+                    break
+                dirpath, listing, error = item
+                if error is not None:
+                    if onerror is not None:
+                        onerror(error)
+                    continue
+                yield emit(dirpath, listing)
+    finally:
+        pool.cancel()
+        pool.close()
@@ -0,0 +1,357 @@
+'''Watch
+
+Filesystem change notification. On Linux, inotify through ctypes (no
+extra dependency); elsewhere, or when asked, a poller that diffs scandir
+snapshots. Either way raw events are debounced, collected until things go
+quiet, and coalesced (created+modified is created, created+deleted is
+nothing, ...) so an event storm arrives as one batch.
+'''
+from __future__ import with_statement
+import os
+import sys
+import stat
+import time
+import errno
+import struct
+import select
+import collections
+import logging
+log = logging.getLogger('cu.watch')
+
+
+CREATED = 'created'
+MODIFIED = 'modified'
+DELETED = 'deleted'
+MOVED = 'moved'
+
+Event = collections.namedtuple('Event', 'kind path dest isdir')
+Event.__new__.__defaults__ = (None, False)
+
+
+# inotify(7)
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_DONT_FOLLOW = 0x02000000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = getattr(os, 'O_CLOEXEC', 0)
+
+_MASK = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO
+         | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF | IN_DONT_FOLLOW)
+_HEADER = struct.Struct('iIII')
+
+_libc = None
+if sys.platform.startswith('linux'):
+    try:
+        import ctypes
+        import ctypes.util
+        _libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        _libc.inotify_init1
+    except (ImportError, OSError, AttributeError):
+        _libc = None
+
+HAVE_INOTIFY = _libc is not None
+
+
+def _error(path=None):
+    import ctypes
+    code = ctypes.get_errno()
+    return OSError(code, os.strerror(code), path)
+
+
+class Inotify(object):
+    '''Raw inotify events for a path, and everything under it if recursive.'''
+    def __init__(self, path, recursive=True):
+        self.path = str(path)
+        self.recursive = recursive
+        self._paths = dict()  # wd -> path
+        self._fd = _libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self._fd < 0:
+            raise _error()
+        self._add(self.path)
+
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    def _watch(self, path):
+        wd = _libc.inotify_add_watch(self._fd, path.encode(sys.getfilesystemencoding()), _MASK)
+        if wd < 0:
+            error = _error(path)
+            if error.errno in (errno.ENOENT, errno.ENOTDIR):
+                return False  # gone already
+            raise error
+        self._paths[wd] = path
+        return True
+
+    def _add(self, top, events=None):
+        '''Watch top (and below, if recursive). Entries found under a new
+        directory may have been created before the watch; they are added
+        to events as created.
+        '''
+        if not self._watch(top) or not self.recursive or not os.path.isdir(top) or os.path.islink(top):
+            return
+        for dirpath, dirnames, filenames in os.walk(top):
+            for name in dirnames:
+                path = os.path.join(dirpath, name)
+                self._watch(path)
+                if events is not None:
+                    events.append(Event(CREATED, path, None, True))
+            if events is not None:
+                events.extend(Event(CREATED, os.path.join(dirpath, name)) for name in filenames)
+
+    def _forget(self, top):
+        '''Stop watching top and below, it moved out of view.'''
+        prefix = top + os.sep
+        for wd, path in list(self._paths.items()):
+            if path == top or path.startswith(prefix):
+                del self._paths[wd]
+                _libc.inotify_rm_watch(self._fd, wd)
+
+    def _moved(self, src, dst):
+        '''Directory src was renamed dst, rewrite paths of its watches.'''
+        prefix = src + os.sep
+        for wd, path in list(self._paths.items()):
+            if path == src:
+                self._paths[wd] = dst
+            elif path.startswith(prefix):
+                self._paths[wd] = dst + path[len(src):]
+
+    def read(self, timeout=None):
+        '''Wait up to timeout seconds (None forever) for events.
+        :return: list of Events, empty if none arrived in time
+        '''
+        if self._fd is None:
+            return list()
+        try:
+            ready = select.select([self._fd], [], [], timeout)[0]
+        except select.error:
+            if sys.exc_info()[1].args[0] == errno.EINTR:
+                return list()
+            raise
+        if not ready:
+            return list()
+        try:
+            data = os.read(self._fd, 65536)
+        except OSError:
+            if sys.exc_info()[1].errno == errno.EAGAIN:
+                return list()
+            raise
+        events = list()
+        moves = dict()  # cookie -> (events index, src path, isdir)
+        offset = 0
+        while offset < len(data):
+            wd, mask, cookie, length = _HEADER.unpack_from(data, offset)
+            offset += _HEADER.size
+            name = data[offset:offset + length].rstrip(bytes(bytearray(1))).decode(sys.getfilesystemencoding())
+            offset += length
+            if mask & IN_Q_OVERFLOW:
+                log.warning('inotify queue overflowed watching %s, events lost', self.path)
+                continue
+            base = self._paths.get(wd)
+            if base is None:
+                continue
+            if mask & IN_IGNORED:
+                del self._paths[wd]
+                continue
+            path = name and os.path.join(base, name) or base
+            isdir = bool(mask & IN_ISDIR)
+            if mask & IN_CREATE:
+                events.append(Event(CREATED, path, None, isdir))
+                if isdir and self.recursive:
+                    self._add(path, events)
+            elif mask & IN_DELETE:
+                events.append(Event(DELETED, path, None, isdir))
+            elif mask & IN_MOVED_FROM:
+                moves[cookie] = (len(events), path, isdir)
+                events.append(Event(DELETED, path, None, isdir))
+            elif mask & IN_MOVED_TO:
+                if cookie in moves:
+                    n, src, isdir = moves.pop(cookie)
+                    events[n] = Event(MOVED, src, path, isdir)
+                    if isdir:
+                        self._moved(src, path)
+                else:
+                    events.append(Event(CREATED, path, None, isdir))
+                    if isdir and self.recursive:
+                        self._add(path, events)
+            elif mask & (IN_DELETE_SELF | IN_MOVE_SELF):
+                if base == self.path:
+                    events.append(Event(DELETED, path, None, os.path.isdir(path)))
+            elif not isdir:
+                events.append(Event(MODIFIED, path))
+        for n, src, isdir in moves.values():
+            if isdir:
+                self._forget(src)  # moved out of view, now deleted
+        return events
+
+
+def _scan(top, recursive):
+    '''path -> (isdir, dev, ino, size, mtime) for top and below.'''
+    found = dict()
+    try:
+        st = os.lstat(top)
+    except OSError:
+        return found
+    found[top] = (stat.S_ISDIR(st.st_mode), st.st_dev, st.st_ino, st.st_size, st.st_mtime)
+    if not stat.S_ISDIR(st.st_mode):
+        return found
+    stack = [top]
+    while stack:
+        dirpath = stack.pop()
+        try:
+            if hasattr(os, 'scandir'):
+                entries = [(e.path, e.stat(follow_symlinks=False)) for e in os.scandir(dirpath)]
+            else:
+                entries = [(os.path.join(dirpath, n), os.lstat(os.path.join(dirpath, n))) for n in os.listdir(dirpath)]
+        except OSError:
+            continue
+        for path, st in entries:
+            isdir = stat.S_ISDIR(st.st_mode)
+            found[path] = (isdir, st.st_dev, st.st_ino, st.st_size, st.st_mtime)
+            if isdir and recursive:
+                stack.append(path)
+    return found
+
+
+class Poller(object):
+    '''Raw events by diffing scandir snapshots every ``interval`` seconds.
+    Renames are recognised by inode.
+    '''
+    def __init__(self, path, recursive=True, interval=1.0):
+        self.path = str(path)
+        self.recursive = recursive
+        self.interval = interval
+        self._last = _scan(self.path, recursive)
+
+    def close(self):
+        pass
+
+    def read(self, timeout=None):
+        if timeout is None or timeout > self.interval:
+            timeout = self.interval
+        time.sleep(timeout)
+        current = _scan(self.path, self.recursive)
+        last, self._last = self._last, current
+        events = list()
+        gone = dict()  # (dev, ino) -> path, for recognising renames
+        for path, info in last.items():
+            if path not in current:
+                gone[info[1:3]] = path
+        for path in sorted(current):
+            info = current[path]
+            old = last.get(path)
+            if old is None:
+                src = gone.pop(info[1:3], None)
+                if src is not None:
+                    events.append(Event(MOVED, src, path, info[0]))
+                else:
+                    events.append(Event(CREATED, path, None, info[0]))
+            elif old[0] != info[0]:
+                events.append(Event(DELETED, path, None, old[0]))
+                events.append(Event(CREATED, path, None, info[0]))
+            elif not info[0] and old[1:] != info[1:]:
+                events.append(Event(MODIFIED, path))
+        for path in sorted(gone.values()):
+            events.append(Event(DELETED, path, None, last[path][0]))
+        # children of a moved directory moved with it
+        moved = [(e.path + os.sep, e.dest + os.sep) for e in events if e.kind == MOVED and e.isdir]
+        if moved:
+            def inside(e):
+                for src, dst in moved:
+                    if e.kind == MOVED and e.path.startswith(src) and e.dest.startswith(dst):
+                        return True
+                return False
+            events = [e for e in events if not inside(e)]
+        return events
+
+
+def coalesce(events):
+    '''Reduce a burst of events to their net effect, keeping order.'''
+    out = list()
+    latest = dict()  # path -> index in out
+
+    def add(event, key):
+        latest[key] = len(out)
+        out.append(event)
+
+    for e in events:
+        n = latest.get(e.path)
+        prev = n is not None and out[n] or None
+        if e.kind == MOVED:
+            if prev is not None:
+                latest.pop(e.path)
+                if prev.kind == CREATED:
+                    out[n] = None
+                    add(Event(CREATED, e.dest, None, e.isdir), e.dest)
+                    continue
+            add(e, e.dest)
+        elif prev is None:
+            add(e, e.path)
+        elif prev.kind == CREATED:
+            if e.kind == DELETED:
+                out[n] = None
+                del latest[e.path]
+        elif prev.kind == DELETED:
+            if e.kind == CREATED:
+                out[n] = None
+                add(Event(MODIFIED, e.path, None, e.isdir), e.path)
+        elif prev.kind == MODIFIED:
+            if e.kind == DELETED:
+                out[n] = None
+                add(e, e.path)
+        else:
+            add(e, e.path)
+    return [e for e in out if e is not None]
+
+
+def _batches(source, debounce, timeout, latency):
+    try:
+        while True:
+            events = source.read(timeout)
+            if not events:
+                if timeout is not None:
+                    yield list()
+                continue
+            start = time.time()
+            while debounce:
+                remaining = latency - (time.time() - start)
+                if remaining <= 0:
+                    break
+                more = source.read(min(debounce, remaining))
+                if not more:
+                    break
+                events.extend(more)
+            events = coalesce(events)
+            if events:
+                yield events
+    finally:
+        source.close()
+
+
+def watch(path, recursive=True, debounce=0.1, timeout=None, poll=False, interval=1.0, latency=1.0):
+    '''Batches of coalesced Events as path (a directory or file) changes.
+    Watching starts now, not at the first next().
+    :param recursive: [True] watch everything below path too
+    :param debounce: [0.1] collect events until none arrive for this long
+    :param timeout: [None] yield an empty batch after this many quiet seconds
+    :param poll: [False] use the snapshot poller even where inotify works
+    :param interval: [1.0] seconds between poller snapshots
+    :param latency: [1.0] yield after this long even if events keep coming
+    :return: generator of lists of Events
+    '''
+    if HAVE_INOTIFY and not poll:
+        source = Inotify(path, recursive)
+    else:
+        source = Poller(path, recursive, interval)
+    return _batches(source, debounce, timeout, latency)
@@ -0,0 +1,105 @@
+from __future__ import with_statement
+try:
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+import os
+import stat
+import shutil
+import tempfile
+
+import six
+
+from cu import Path
+from cu.atomic import write_atomic, AtomicBatch
+
+
+class FileIOTestCase(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp(prefix='cuprum_test_')
+        self.path = Path(self.root) / 'file'
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def test_bytes(self):
+        data = six.b('abc\n') * 100000
+        self.assertEqual(self.path, self.path.write_bytes(data))
+        self.assertEqual(data, self.path.read_bytes())
+        self.assertEqual(six.b(''), self.path.write_bytes(six.b('')).read_bytes())
+
+    def test_text(self):
+        text = six.u('caf\xe9\n')
+        self.path.write_text(text, 'latin-1')
+        self.assertEqual(six.b('caf\xe9\n'), self.path.read_bytes())
+        self.assertEqual(text, self.path.read_text('latin-1'))
+
+    def test_iter_lines(self):
+        self.path.write_bytes(six.b('one\ntwo\r\nthree'))
+        self.assertEqual([six.b('one\n'), six.b('two\r\n'), six.b('three')], list(self.path.iter_lines(bufsize=4)))
+        self.assertEqual(['one', 'two', 'three'], list(self.path.iter_lines('ascii', keepends=False)))
+
+    def test_mmap(self):
+        self.path.write_bytes(six.b('0123456789'))
+        m = self.path.mmap()
+        try:
+            self.assertEqual(six.b('345'), m[3:6])
+            self.assertRaises(TypeError, m.__setitem__, 0, six.b('x'))
+        finally:
+            m.close()
+        with self.path.write_bytes(six.b('')).mmap() as m:
+            self.assertEqual(six.b(''), m)
+        m.close()
+
+
+class AtomicTestCase(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp(prefix='cuprum_test_')
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def test_write_atomic(self):
+        path = os.path.join(self.root, 'file')
+        write_atomic(path, six.b('one'))
+        os.chmod(path, stat.S_IRUSR | stat.S_IWUSR | stat.S_IXUSR)
+        Path(path).write_atomic(six.u('two'))
+        with open(path, 'rb') as fh:
+            self.assertEqual(six.b('two'), fh.read())
+        self.assertEqual(stat.S_IRWXU, stat.S_IMODE(os.stat(path).st_mode))
+        self.assertEqual(['file'], os.listdir(self.root))
+
+    def test_batch(self):
+        paths = [Path(self.root) / ('f%d' % i) for i in range(20)]
+        with AtomicBatch(workers=4) as batch:
+            for p in paths:
+                p.write_atomic(six.b(str(p.basename)), batch=batch)
+            self.assertEqual(20, len(batch))
+            self.assertFalse(paths[0].exists())
+        for p in paths:
+            self.assertEqual(six.b(str(p.basename)), p.read_bytes())
+        self.assertEqual(20, len(os.listdir(self.root)))
+
+    def test_batch_large(self):
+        try:
+            import resource
+        except ImportError:
+            self.skipTest('no resource module')
+        soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+        resource.setrlimit(resource.RLIMIT_NOFILE, (64, hard))
+        try:
+            with AtomicBatch() as batch:
+                for i in range(200):
+                    batch.write(os.path.join(self.root, 'f%d' % i), six.b('data'))
+        finally:
+            resource.setrlimit(resource.RLIMIT_NOFILE, (soft, hard))
+        self.assertEqual(200, len(os.listdir(self.root)))
+
+    def test_batch_discard(self):
+        try:
+            with AtomicBatch() as batch:
+                batch.write(os.path.join(self.root, 'file'), six.b('data'))
+                raise ValueError()
+        except ValueError:
+            pass
+        self.assertEqual([], os.listdir(self.root))
@@ -0,0 +1,108 @@
+from __future__ import with_statement
+try:
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+import os
+import sys
+import stat
+import shutil
+import tempfile
+
+from cu import Path
+from cu.batch import Batch, BatchError
+
+
+class BatchTestCase(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp(prefix='cuprum_test_')
+
+    def tearDown(self):
+        for dirpath, dirnames, filenames in os.walk(self.root):
+            for name in dirnames:
+                os.chmod(os.path.join(dirpath, name), stat.S_IRWXU)
+        shutil.rmtree(self.root)
+
+    def path(self, *bits):
+        return os.path.join(self.root, *bits)
+
+    def mode(self, *bits):
+        return stat.S_IMODE(os.lstat(self.path(*bits)).st_mode)
+
+    def test_apply(self):
+        root = Path(self.root)
+        with Path.batch() as b:
+            # recorded children first, applied parents first
+            b.chmod(root / 'a', 'a-w')
+            b.touch(root / 'a' / 'b' / 'file', stamp=1000)
+            b.symlink('file', root / 'a' / 'b' / 'link')
+            b.mkdir(root / 'a' / 'b')
+            b.chmod(root / 'a' / 'b' / 'file', '640')
+            b.chmod(root / 'a' / 'b' / 'file', '600')  # last wins
+            b.chown(root / 'a' / 'b' / 'link', os.getuid())
+            self.assertEqual(6, len(b))
+            self.assertFalse(os.path.exists(self.path('a')))
+        self.assertEqual(1000, os.stat(self.path('a', 'b', 'file')).st_mtime)
+        self.assertEqual('file', os.readlink(self.path('a', 'b', 'link')))
+        self.assertEqual(int('600', 8), self.mode('a', 'b', 'file'))
+        self.assertFalse(self.mode('a') & stat.S_IWUSR)
+
+    def test_idempotent(self):
+        for _ in range(2):
+            with Batch(workers=4) as b:
+                for i in range(20):
+                    b.mkdir(self.path('d%d' % i, 'sub'))
+                    b.touch(self.path('d%d' % i, 'sub', 'f'))
+                    b.symlink('sub', self.path('d%d' % i, 'link'))
+        self.assertEqual(20, len(os.listdir(self.root)))
+        self.assertEqual(['f'], os.listdir(self.path('d7', 'link')))
+
+    def test_failures(self):
+        open(self.path('file'), 'w').close()
+        os.symlink('elsewhere', self.path('link'))
+        b = Batch()
+        b.mkdir(self.path('file'))
+        b.touch(self.path('missing', 'f'))
+        b.symlink('file', self.path('link'))
+        b.touch(self.path('ok'))
+        try:
+            b.apply()
+            self.fail('no BatchError')
+        except BatchError:
+            failures = sys.exc_info()[1].failures
+        self.assertEqual(
+                [('mkdir', self.path('file')), ('symlink', self.path('link')), ('touch', self.path('missing', 'f'))],
+                sorted((op, path) for op, path, error in failures))
+        self.assertTrue(os.path.exists(self.path('ok')))
+        self.assertEqual(0, len(b))
+        b.symlink('file', self.path('link'), force=True)
+        b.apply()
+        self.assertEqual('file', os.readlink(self.path('link')))
+
+    def test_invalid_mode(self):
+        self.assertRaises(ValueError, Batch().chmod, self.root, 'q+z')
+
+    def test_unknown_owner(self):
+        b = Batch()
+        self.assertRaises(KeyError, b.chown, self.root, 'cu-no-such-user')
+        self.assertRaises(KeyError, b.chown, self.root, '', 'cu-no-such-group')
+        self.assertEqual(0, len(b))
+
+    def test_touch_readonly(self):
+        open(self.path('ro'), 'w').close()
+        os.chmod(self.path('ro'), stat.S_IRUSR)
+        os.mkdir(self.path('dir'))
+        with Batch() as b:
+            b.touch(self.path('ro'), stamp=1000)
+            b.touch(self.path('dir'), stamp=1000)
+        self.assertEqual(1000, os.stat(self.path('ro')).st_mtime)
+        self.assertEqual(1000, os.stat(self.path('dir')).st_mtime)
+
+    def test_discard(self):
+        try:
+            with Batch() as b:
+                b.mkdir(self.path('nope'))
+                raise KeyError()
+        except KeyError:
+            pass
+        self.assertEqual([], os.listdir(self.root))
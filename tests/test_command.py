@@ -3,8 +3,13 @@ try:
     import unittest2 as unittest
 except ImportError:
     import unittest
+import os
+import sys
+import copy
+import pickle
+import collections
 
-from cu.command import Command  # CommandNotFound, ProcessExecutionError, ProcessTimedOut
+from cu.command import Command, Popen, RunResult, shquote  # CommandNotFound, ProcessExecutionError, ProcessTimedOut
 
 
 class CommandTestCase(unittest.TestCase):
@@ -12,3 +17,87 @@ class CommandTestCase(unittest.TestCase):
         t = Command('/bin/ls')
         self.assertEqual('/bin/ls', str(t))
         self.assertEqual('Command("/bin/ls")', repr(t))
+
+    def test_shquote(self):
+        self.assertEqual("''", shquote(''))
+        self.assertEqual('/usr/bin/a_b-c', shquote('/usr/bin/a_b-c'))
+        self.assertEqual("'a b'", shquote('a b'))
+        self.assertEqual('"it\'s \\$HOME \\"q\\""', shquote('it\'s $HOME "q"'))
+        self.assertEqual('5', shquote(5))
+
+    def test_bound(self):
+        from cu import local
+        t = Command('/bin/ls')
+        b = t['-l', 'a b']
+        self.assertEqual(['/bin/ls', '-l', 'a b', 'x'], b.formulate(0, ('x', )))
+        self.assertEqual(['/bin/ls', '-l', 'a b'], b.formulate(0))
+        b.formulate(0).append('junk')  # callers get their own list
+        self.assertEqual(['/bin/ls', '-l', 'a b'], b.formulate(0))
+        self.assertEqual(['/bin/ls', '-l', "'a b'", "'y z'"], b.formulate(2, ('y z', )))
+        self.assertEqual('/bin/ls -l a b', str(b))
+        self.assertEqual(['/bin/ls', '-l', 'a b', '-a'], b['-a'].formulate(0))
+        # a CWD formulates differently as it changes, so isn't cached
+        c = t[local.cwd]
+        with local.cwd('/'):
+            self.assertEqual(['/bin/ls', '/'], c.formulate(0))
+        self.assertNotEqual(['/bin/ls', '/'], c.formulate(0))
+
+    def test_script(self):
+        from cu import ERROUT
+        ls, grep, cat = Command('/bin/ls'), Command('/bin/grep'), Command('/bin/cat')
+        self.assertEqual(
+                "/bin/ls 'a b' | /bin/grep '\\.py' > 'out file'",
+                ((ls | grep['\\.py']) > 'out file').as_script().script(['a b']))
+        self.assertEqual('{ /bin/cat | /bin/grep x ; } < in', ((cat | grep['x']) < 'in').as_script().script())
+        self.assertEqual('/bin/grep -q 2>&1', (grep['-q'] >= ERROUT).as_script().script())
+        self.assertEqual(
+                'printf \'%s\' "it\'s \\$HOME" | /bin/cat',
+                (cat << "it's $HOME").as_script().script())
+        script = Command('/my bin/x').as_script()
+        self.assertEqual(['/bin/sh', '-c', "'/my bin/x'"], script.formulate())
+        self.assertTrue(script.as_script(pipefail=True).script().startswith('set -o pipefail; '))
+
+    @unittest.skipUnless(hasattr(os, 'wait4'), 'needs os.wait4')
+    def test_rusage(self):
+        p = Popen([sys.executable, '-c', 'sum(range(10 ** 6))'])
+        p.wait()
+        self.assertEqual(0, p.returncode)
+        self.assertTrue(p.rusage.ru_utime > 0)
+        self.assertTrue(p.rusage.ru_maxrss > 0)
+
+    def test_result(self):
+        usage = collections.namedtuple('usage', 'ru_utime ru_stime ru_maxrss ru_inblock ru_oublock')
+        r = RunResult(1, 'out', '', ['/bin/x'], 2.0, [usage(1.0, .5, 10, 1, 2), usage(.5, .5, 20, 0, 3)])
+        rc, out, err = r
+        self.assertEqual((1, 'out', ''), r)
+        self.assertEqual((1, 'out', ''), (r.returncode, r.stdout, r.stderr))
+        self.assertEqual('/bin/x', r.executable)
+        self.assertEqual((1.5, 1.0, 2.5, 20, 1, 5), (r.utime, r.stime, r.cpu, r.maxrss, r.inblock, r.oublock))
+        r = RunResult(0, '', '')
+        self.assertEqual((None, None, None), (r.cpu, r.maxrss, r.executable))
+
+    def test_result_pickle(self):
+        r = RunResult(1, 'out', 'err', ['/bin/x'], 2.0)
+        r.utime = 1.5
+        for copied in (copy.copy(r), copy.deepcopy(r), pickle.loads(pickle.dumps(r))):
+            self.assertEqual((1, 'out', 'err'), copied)
+            self.assertEqual((['/bin/x'], '/bin/x', 2.0, 1.5), (copied.argv, copied.executable, copied.wall, copied.utime))
+
+    def test_stages(self):
+        from cu.command import _stages
+
+        class Stage(object):
+            srcproc = None
+            polls = 0
+
+            def poll(self):
+                self.polls += 1
+                if self.polls < 3:
+                    return None
+                return 0
+        first, last = Stage(), Stage()
+        last.srcproc = first
+        self.assertEqual([last, first], _stages(last))
+        self.assertEqual(1, first.polls)
+        _stages(last, 10)
+        self.assertEqual(3, first.polls)
@@ -0,0 +1,127 @@
+from __future__ import with_statement
+try:
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+import os
+import shutil
+import tempfile
+
+import six
+
+from cu import Path
+from cu.copier import copy_file, copy_tree, SameFileError, SpecialFileError
+
+
+class CopierTestCase(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp(prefix='cuprum_test_')
+        self.src = os.path.join(self.root, 'src')
+        os.makedirs(os.path.join(self.src, 'a', 'b'))
+        for i, name in enumerate(('one', 'a/two', 'a/b/three')):
+            with open(os.path.join(self.src, name), 'wb') as fh:
+                fh.write(six.b('data %d\n' % i) * 1000 * i)
+        os.chmod(os.path.join(self.src, 'one'), int('640', 8))
+        os.utime(os.path.join(self.src, 'one'), (1000, 2000))
+        os.symlink('one', os.path.join(self.src, 'link'))
+        os.symlink('a', os.path.join(self.src, 'dirlink'))
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def read(self, *bits):
+        with open(os.path.join(*bits), 'rb') as fh:
+            return fh.read()
+
+    def test_copy_file(self):
+        dst = os.path.join(self.root, 'copy')
+        size = copy_file(os.path.join(self.src, 'a', 'two'), dst, verify='sha1')
+        self.assertEqual(self.read(self.src, 'a', 'two'), self.read(dst))
+        self.assertEqual(size, len(self.read(dst)))
+        copy_file(os.path.join(self.src, 'one'), dst, reflink=False)
+        self.assertEqual(self.read(self.src, 'one'), self.read(dst))
+        st = os.stat(dst)
+        self.assertEqual(int('640', 8), st.st_mode & int('777', 8))
+        self.assertEqual(2000, st.st_mtime)
+
+    def test_refused(self):
+        one = os.path.join(self.src, 'one')
+        data = self.read(one)
+        self.assertRaises(SameFileError, copy_file, one, one)
+        self.assertRaises(SameFileError, copy_file, one, os.path.join(self.src, 'link'))
+        self.assertEqual(data, self.read(one))
+        fifo = os.path.join(self.src, 'a', 'fifo')
+        os.mkfifo(fifo)
+        self.assertRaises(SpecialFileError, copy_file, fifo, os.path.join(self.root, 'copy'))
+        self.assertRaises(SpecialFileError, copy_file, one, fifo)
+        self.assertRaises(shutil.Error, copy_tree, self.src, os.path.join(self.root, 'dst'))
+        self.assertEqual(data, self.read(self.root, 'dst', 'one'))
+
+    @unittest.skipUnless(hasattr(os, 'SEEK_DATA'), 'needs SEEK_DATA')
+    def test_sparse(self):
+        src = os.path.join(self.root, 'sparse')
+        with open(src, 'wb') as fh:
+            fh.seek(1024 * 1024 * 16)
+            fh.write(six.b('end'))
+        if os.stat(src).st_blocks * 512 >= os.stat(src).st_size:
+            self.skipTest('filesystem does not support sparse files')
+        dst = os.path.join(self.root, 'sparse.copy')
+        copy_file(src, dst, reflink=False)
+        self.assertEqual(os.stat(src).st_size, os.stat(dst).st_size)
+        self.assertTrue(os.stat(dst).st_blocks * 512 < os.stat(dst).st_size)
+        self.assertEqual(self.read(src), self.read(dst))
+
+    def test_copy_tree(self):
+        dst = os.path.join(self.root, 'dst')
+        seen = list()
+        totals = copy_tree(self.src, dst, workers=2, progress=lambda p: seen.append(p.files))
+        self.assertEqual(6, totals.files)  # link and dirlink followed
+        self.assertEqual([1, 2, 3, 4, 5, 6], sorted(seen))
+        self.assertEqual(self.read(self.src, 'a', 'b', 'three'), self.read(dst, 'a', 'b', 'three'))
+        self.assertFalse(os.path.islink(os.path.join(dst, 'link')))
+        self.assertTrue(os.path.isfile(os.path.join(dst, 'dirlink', 'two')))
+        self.assertRaises(OSError, copy_tree, self.src, dst)
+
+    def test_copy_tree_symlinks(self):
+        dst = os.path.join(self.root, 'dst')
+        copy_tree(self.src, dst, symlinks=True)
+        self.assertEqual('one', os.readlink(os.path.join(dst, 'link')))
+        self.assertEqual('a', os.readlink(os.path.join(dst, 'dirlink')))
+
+    def test_path_copy(self):
+        t = Path(self.src)
+        dst = t.copy(Path(self.root) / 'dst', workers=3)
+        self.assertTrue((dst / 'a' / 'b' / 'three').isfile())
+        dst = (t / 'one').copy(Path(self.root) / 'dst')
+        self.assertEqual(self.read(self.src, 'one'), self.read(self.root, 'dst', 'one'))
+
+    def test_sync(self):
+        dst = os.path.join(self.root, 'dst')
+        manifest = os.path.join(self.root, 'manifest.json')
+        summary = Path(self.src).sync(dst, manifest=manifest)
+        self.assertEqual(['a/b/three', 'a/two', 'dirlink', 'link', 'one'], sorted(summary.copied))
+        self.assertEqual('a', os.readlink(os.path.join(dst, 'dirlink')))
+        summary = Path(self.src).sync(dst, manifest=manifest)
+        self.assertFalse(summary)
+        self.assertEqual(5, summary.unchanged)
+        other = os.path.join(self.root, 'other')
+        self.assertEqual(5, len(Path(self.src).sync(other, manifest=manifest).copied))
+        os.symlink('stale', os.path.join(other, '.link.cu-sync'))
+        os.unlink(os.path.join(other, 'link'))
+        self.assertEqual(['link'], Path(self.src).sync(other).copied)
+        with open(os.path.join(self.src, 'a', 'two'), 'ab') as fh:
+            fh.write(six.b('more'))
+        open(os.path.join(dst, 'extra'), 'w').close()
+        summary = Path(self.src).sync(dst, delete=True)
+        self.assertEqual(['a/two'], summary.updated)
+        self.assertEqual(['extra'], summary.deleted)
+        self.assertEqual(self.read(self.src, 'a', 'two'), self.read(dst, 'a', 'two'))
+        # same size and mtime, different content: only checksum notices
+        three = os.path.join(dst, 'a', 'b', 'three')
+        st = os.stat(three)
+        with open(three, 'r+b') as fh:
+            fh.write(six.b('X'))
+        os.utime(three, (st.st_atime, st.st_mtime))
+        self.assertFalse(Path(self.src).sync(dst))
+        self.assertEqual(['a/b/three'], Path(self.src).sync(dst, checksum=True).updated)
+        self.assertEqual(self.read(self.src, 'a', 'b', 'three'), self.read(three))
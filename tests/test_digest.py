@@ -0,0 +1,110 @@
+from __future__ import with_statement
+try:
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+import os
+import shutil
+import hashlib
+import tempfile
+
+import six
+
+from cu import Path
+from cu.digest import hash_file, hash_tree, DigestCache, find_duplicates, link_duplicates
+
+
+class DigestTestCase(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp(prefix='cuprum_test_')
+        self.data = dict()
+        os.mkdir(os.path.join(self.root, 'sub'))
+        for name, size in (('empty', 0), ('small', 10), ('sub/big', 3 * 1024 * 1024 + 7)):
+            data = six.b('abcdefg') * (size // 7) + six.b('x') * (size % 7)
+            with open(os.path.join(self.root, name), 'wb') as fh:
+                fh.write(data)
+            self.data[name] = data
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def test_hash_file(self):
+        for name, data in self.data.items():
+            path = os.path.join(self.root, name)
+            self.assertEqual(hashlib.sha256(data).hexdigest(), hash_file(path))
+            self.assertEqual(hashlib.md5(data).hexdigest(), hash_file(path, 'md5', bufsize=4096))
+            self.assertEqual(hashlib.sha1(data).hexdigest(), hash_file(path, 'sha1', use_mmap=True))
+
+    def test_hash_tree(self):
+        expected = dict((n, hashlib.sha1(d).hexdigest()) for n, d in self.data.items())
+        self.assertEqual(expected, hash_tree(self.root, 'sha1', workers=3))
+        self.assertEqual(expected, Path(self.root).hash_tree('sha1'))
+
+    def test_cache(self):
+        path = os.path.join(self.root, 'small')
+        store = os.path.join(self.root, 'digests.json')
+        with DigestCache(store) as cache:
+            digest = hash_file(path, cache=cache)
+            self.assertEqual(1, len(cache))
+        cache = DigestCache(store)
+        self.assertEqual(1, len(cache))
+        self.assertEqual(digest, cache.lookup(os.stat(path), 'sha256'))
+        self.assertEqual(digest, Path(path).hash(cache=cache))
+        with open(path, 'ab') as fh:
+            fh.write(six.b('more'))
+        self.assertEqual(None, cache.lookup(os.stat(path), 'sha256'))
+        self.assertNotEqual(digest, Path(path).hash(cache=cache))
+        self.assertEqual(2, len(cache))
+
+
+class DuplicatesTestCase(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp(prefix='cuprum_test_')
+        big = os.urandom(300 * 1024)
+        contents = dict(
+            a=big, b=big,
+            c=big[:-1] + six.b('!'),  # differs in the last block
+            d=big[:150000] + six.b('?') + big[150001:],  # only a full hash tells
+            e=six.b('small'), f=six.b('small'), g=six.b('other'), h=six.b(''), i=six.b(''),
+            )
+        os.mkdir(os.path.join(self.root, 'x'))
+        for name, data in contents.items():
+            with open(os.path.join(self.root, name if name < 'e' else os.path.join('x', name)), 'wb') as fh:
+                fh.write(data)
+        os.link(os.path.join(self.root, 'a'), os.path.join(self.root, 'a2'))
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def rel(self, groups):
+        return [[os.path.relpath(str(p), self.root) for p in g] for g in groups]
+
+    def test_find(self):
+        self.assertEqual([['a', 'b'], ['x/e', 'x/f']], self.rel(find_duplicates([self.root], workers=2)))
+        self.assertEqual(
+                [['a', 'b'], ['x/e', 'x/f'], ['x/h', 'x/i']],
+                self.rel(find_duplicates([self.root], min_size=0)))
+
+    def test_path(self):
+        t = Path(self.root)
+        groups = (t / 'x').find_duplicates(t / 'x')  # same files twice are not duplicates
+        self.assertEqual([['x/e', 'x/f']], self.rel(groups))
+        self.assertIsInstance(groups[0][0], Path)
+
+    def test_link(self):
+        groups = Path(self.root).find_duplicates(link='hard')
+        self.assertEqual(2, len(groups))
+        a, b = [os.stat(os.path.join(self.root, n)) for n in ('a', 'b')]
+        self.assertEqual(a.st_ino, b.st_ino)
+        self.assertEqual([], find_duplicates([self.root]))
+        self.assertRaises(ValueError, Path(self.root).find_duplicates, link='soft')
+
+    def test_link_changed(self):
+        groups = find_duplicates([self.root])
+        with open(os.path.join(self.root, 'x', 'f'), 'ab') as fh:
+            fh.write(six.b('!'))
+        os.utime(os.path.join(self.root, 'b'), (1000, 2000))
+        self.assertEqual(0, link_duplicates(groups))
+        with open(os.path.join(self.root, 'x', 'f'), 'rb') as fh:
+            self.assertEqual(six.b('small!'), fh.read())
+        self.assertNotEqual(os.stat(os.path.join(self.root, 'a')).st_ino, os.stat(os.path.join(self.root, 'b')).st_ino)
@@ -0,0 +1,86 @@
+from __future__ import with_statement
+try:
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+import os
+import shutil
+import tempfile
+
+from cu import Path
+from cu.du import du
+
+
+def make_tree(root, width=3, depth=3, files=4):
+    '''Synthetic tree, width**depth leaf directories.'''
+    if depth == 0:
+        return
+    for i in range(files):
+        with open(os.path.join(root, 'file%d.txt' % i), 'w') as fh:
+            fh.write('x' * i)
+    for i in range(width):
+        sub = os.path.join(root, 'dir%d' % i)
+        os.mkdir(sub)
+        make_tree(sub, width, depth - 1, files)
+
+
+class DuTestCase(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp(prefix='cuprum_test_')
+        make_tree(self.root)
+        os.link(os.path.join(self.root, 'file3.txt'), os.path.join(self.root, 'dir1', 'hardlink'))
+        os.symlink('file3.txt', os.path.join(self.root, 'symlink'))
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def expected(self, top):
+        size, files, dirs, seen = 0, 0, 0, set()
+        for dirpath, dirnames, filenames in os.walk(top):
+            dirs += 1
+            size += os.lstat(dirpath).st_size
+            for name in filenames:
+                st = os.lstat(os.path.join(dirpath, name))
+                if st.st_ino not in seen:
+                    seen.add(st.st_ino)
+                    size += st.st_size
+                    files += 1
+        return size, files, dirs
+
+    def test_du(self):
+        totals = du(self.root, workers=4)
+        self.assertEqual(['.'], list(totals))
+        usage = totals['.']
+        self.assertEqual(self.expected(self.root), (usage.size, usage.files, usage.dirs))
+        self.assertEqual(4 * 13 + 1, usage.files)  # hardlink counted once
+        self.assertTrue(usage.blocks > 0)
+
+    def test_sparse(self):
+        path = os.path.join(self.root, 'dir2', 'sparse')
+        with open(path, 'wb') as fh:
+            fh.truncate(1024 * 1024 * 1024)
+        st = os.lstat(path)
+        if st.st_blocks:
+            self.skipTest('filesystem does not support sparse files')
+        whole = du(self.root)['.']
+        os.unlink(path)
+        without = du(self.root)['.']
+        self.assertTrue(whole.size - without.size >= st.st_size)
+        self.assertEqual(0, whole.blocks - without.blocks)
+
+    def test_depth(self):
+        totals = du(self.root, depth=2)
+        self.assertEqual(1 + 3 + 9, len(totals))
+        # hard link is counted in whichever directory is listed first
+        for rel in ('dir0', 'dir2', os.path.join('dir0', 'dir1')):
+            usage = totals[rel]
+            self.assertEqual(self.expected(os.path.join(self.root, rel)), (usage.size, usage.files, usage.dirs))
+        self.assertEqual(totals['.'].size, du(self.root)['.'].size)
+
+    def test_path(self):
+        t = Path(self.root)
+        totals = t.du(1)
+        self.assertEqual(4, len(totals))
+        self.assertEqual(totals[t].files, du(self.root)['.'].files)
+        self.assertEqual(1 + 3 + 9 + 27, totals[t].dirs)
+        self.assertEqual(1 + 3 + 9, totals[t / 'dir0'].dirs)
@@ -4,6 +4,7 @@ try:
 except ImportError:
     import unittest
 import os
+import sys
 
 from cu import local, Path
 from cu import CommandNotFound, ProcessExecutionError
@@ -94,3 +95,134 @@ class SystemPathListTestCase(unittest.TestCase):
         checkit(4, '/bin:/:/sbin:/usr/sbin')
         t.remove('/sbin/')
         checkit(3, '/bin:/:/usr/sbin')
+
+    def test_safe(self):
+        env = dict(PATH='/bin')
+        t = SystemPathList(env, safe=True)
+        first = t[0]
+        self.assertTrue(first is t[0])  # unchanged PATH isn't reparsed
+        env['PATH'] = '/usr/bin:/bin'
+        self.assertEqual('/usr/bin', t[0])
+        self.assertTrue('/bin' in t)
+        data = dict(PATH='/bin')
+        t = Environment(data).safe_path
+        data['PATH'] = '/sbin'
+        self.assertEqual('/sbin', t[0])
+
+    def test_batch(self):
+        class Counting(dict):
+            writes = 0
+
+            def __setitem__(self, name, value):
+                self.writes += 1
+                super(Counting, self).__setitem__(name, value)
+        env = Counting(PATH='/bin')
+        t = SystemPathList(env, safe=True)
+        with t.batch():
+            t.insert(0, '/sbin')
+            t.append('/usr/bin')
+            with t.batch():
+                t.remove('/bin')
+            self.assertEqual('/bin', env['PATH'])
+        self.assertEqual(1, env.writes)
+        self.assertEqual('/sbin:/usr/bin', env['PATH'])
+        with t.batch():
+            pass
+        self.assertEqual(1, env.writes)
+
+
+class SnapshotTestCase(unittest.TestCase):
+    def test_snapshot(self):
+        t = Environment(dict(A='1', PATH='/bin'))
+        snap = t.snapshot()
+        self.assertTrue(snap is t.snapshot())
+        self.assertRaises(TypeError, snap.__setitem__, 'B', '2')
+        self.assertRaises(TypeError, snap.update, B='2')
+        key = list(snap)[0]
+        self.assertTrue(isinstance(key, bytes) or os.name != 'posix')
+        for change in (
+                lambda: t.__setitem__('B', 2),
+                lambda: t.update(C=3),
+                lambda: t.__delitem__('B'),
+                lambda: t.pop('C'),
+                lambda: t.setdefault('D', 'x'),
+                lambda: t.path.append('/usr/bin'),
+                ):
+            change()
+            self.assertFalse(snap is t.snapshot())
+            snap = t.snapshot()
+        self.assertEqual(sorted(t.as_dict().items()), sorted((k.decode(), v.decode()) if isinstance(k, bytes) else (k, v) for k, v in snap.items()))
+        self.assertEqual('/bin:/usr/bin', t['PATH'])
+
+    def test_direct(self):
+        data = dict(A='1')
+        t = Environment(data)
+        t.snapshot()
+        data['A'] = '2'  # behind its back, same length
+        snap = dict((k.decode(), v.decode()) if isinstance(k, bytes) else (k, v) for k, v in t.snapshot().items())
+        self.assertEqual(dict(A='2'), snap)
+
+    def test_shared(self):
+        data = dict(A='1')
+        t1, t2 = Environment(data), Environment(data)
+        snap = t1.snapshot()
+        t2['A'] = '2'
+        self.assertFalse(snap is t1.snapshot())
+
+
+class LayerTestCase(unittest.TestCase):
+    def decode(self, snap):
+        return dict((k.decode(), v.decode()) if isinstance(k, bytes) else (k, v) for k, v in snap.items())
+
+    def test_layers(self):
+        data = dict(A='1', B='2')
+        t = Environment(data)
+        base = t.snapshot()
+        with t(A='x'):
+            self.assertEqual('x', t['A'])
+            del t['B']
+            self.assertFalse('B' in t)
+            self.assertRaises(KeyError, t.__delitem__, 'B')
+            with t(C=3):
+                self.assertEqual(dict(A='x', C='3'), t.as_dict())
+                self.assertEqual(dict(A='x', C='3'), self.decode(t.snapshot()))
+                self.assertTrue(t.snapshot() is t.snapshot())
+            self.assertEqual(['A'], sorted(t))
+            self.assertEqual(dict(A='x'), self.decode(t.snapshot()))
+            self.assertEqual(dict(A='1', B='2'), data)  # underlying untouched
+        self.assertEqual(dict(A='1', B='2'), t.as_dict())
+        self.assertTrue(base is t.snapshot())
+
+    def test_os_environ(self):
+        t = Environment()
+        with t(FOOBAR74='spam'):
+            self.assertEqual('spam', t['FOOBAR74'])
+            self.assertFalse('FOOBAR74' in os.environ)
+            self.assertEqual('spam/x', t.expand('${FOOBAR74}/x'))
+
+    @unittest.skipUnless(sys.version_info >= (3, 7), 'needs contextvars')
+    def test_copied_context(self):
+        import contextvars
+        t = Environment(dict(A='1'))
+
+        def child():
+            t['A'] = 'child'
+            del t['B']
+            return t.as_dict()
+        with t(A='2', B='3'):
+            self.assertEqual(dict(A='child'), contextvars.copy_context().run(child))
+            self.assertEqual(dict(A='2', B='3'), t.as_dict())
+            t['A'] = '4'
+            self.assertEqual('4', t['A'])
+        self.assertEqual(dict(A='1'), t.as_dict())
+
+    def test_threads(self):
+        import threading
+        t = Environment(dict(A='1'))
+        seen = list()
+        with t(A='2'):
+            thread = threading.Thread(target=lambda: seen.append(t['A']))
+            thread.start()
+            thread.join()
+            self.assertEqual('2', t['A'])
+        self.assertEqual(['1'], seen)
@@ -0,0 +1,93 @@
+from __future__ import with_statement
+try:
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+import os
+import shutil
+import tempfile
+
+import six
+
+from cu import Path
+from cu.follow import tail, Follow
+
+
+class FileTestCase(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp(prefix='cuprum_test_')
+        self.path = os.path.join(self.root, 'log')
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def write(self, data, mode='wb'):
+        with open(self.path, mode) as fh:
+            fh.write(six.b(data))
+
+
+class TailTestCase(FileTestCase):
+    def test_tail(self):
+        lines = ['line %d\n' % i for i in range(1000)]
+        self.write(''.join(lines))
+        for n in (0, 1, 2, 10, 999, 1000, 2000):
+            for blocksize in (1, 7, 4096):
+                expected = [six.b(l) for l in lines[len(lines) - n:]] if n else []
+                self.assertEqual(expected, tail(self.path, n, blocksize=blocksize), (n, blocksize))
+
+    def test_no_final_newline(self):
+        self.write('one\ntwo\nthree')
+        self.assertEqual(['two', 'three'], tail(self.path, 2, 'ascii', keepends=False))
+        self.assertEqual(['two', 'three'], Path(self.path).tail(2, 'ascii', keepends=False))
+        self.write('')
+        self.assertEqual([], tail(self.path))
+
+
+class FollowTestCase(FileTestCase):
+    def test_follow(self):
+        self.write('old\n')
+        f = Follow(self.path, encoding='ascii', interval=0.05, timeout=0.2)
+        self.write('one\ntw', 'ab')
+        self.assertEqual('one\n', next(f))
+        self.write('o\n', 'ab')
+        self.assertEqual('two\n', next(f))
+        self.assertEqual(12, f.offset)
+        self.assertRaises(StopIteration, next, f)
+        f.close()
+
+    def test_offset(self):
+        self.write('one\ntwo\n')
+        inode = os.stat(self.path).st_ino
+        with Path(self.path).follow(offset=4, inode=inode, timeout=0.1) as f:
+            self.assertEqual([six.b('two\n')], list(f))
+        with Path(self.path).follow(offset=4, inode=inode + 1, timeout=0.1) as f:
+            self.assertEqual([six.b('one\n'), six.b('two\n')], list(f))
+
+    def test_resume(self):
+        self.write('')
+        f = Follow(self.path, interval=0.05, timeout=0.2)
+        self.write('one\ntwo\nthr', 'ab')
+        self.assertEqual(six.b('one\n'), next(f))
+        self.assertEqual(4, f.offset)  # two read, not yet yielded
+        self.assertEqual(six.b('two\n'), next(f))
+        self.assertEqual(8, f.offset)  # unfinished line not counted
+        offset, inode = f.offset, f.inode
+        f.close()
+        self.write('ee\n', 'ab')
+        with Follow(self.path, offset=offset, inode=inode, timeout=0.1) as f:
+            self.assertEqual([six.b('three\n')], list(f))
+
+    def test_rotate_and_truncate(self):
+        self.write('')
+        f = Follow(self.path, encoding='ascii', keepends=False, interval=0.05, timeout=0.3)
+        self.write('before\n', 'ab')
+        self.assertEqual('before', next(f))
+        self.write('last\n', 'ab')
+        os.rename(self.path, self.path + '.1')
+        self.write('new\n')
+        self.assertEqual('last', next(f))
+        self.assertEqual('new', next(f))
+        self.write('x\n')  # truncated, shorter than before
+        self.assertEqual('x', next(f))
+        self.assertRaises(StopIteration, next, f)
+        f.close()
@@ -0,0 +1,98 @@
+from __future__ import with_statement
+try:
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+import os
+import glob
+import shutil
+import tempfile
+
+from cu import Path
+from cu.globber import Matcher, iglob
+
+
+class MatcherTestCase(unittest.TestCase):
+    def test_match(self):
+        tests = (
+            ('*.log', 'a.log', True),
+            ('*.log', 'x/a.log', False),
+            ('*.log', '.a.log', False),
+            ('.*.log', '.a.log', True),
+            ('**/*.log', 'a.log', True),
+            ('**/*.log', 'x/y/a.log', True),
+            ('**/*.log', 'x/.y/a.log', False),
+            ('x/**', 'x/y/z', True),
+            ('x/**', 'x', True),  # as glob.glob(recursive=True)
+            ('x/**/z', 'x/z', True),
+            ('x/**/**/z', 'x/a/b/z', True),
+            ('x/[ab]?', 'x/bc', True),
+            ('x/', 'x', False),
+            )
+        for pattern, path, expected in tests:
+            self.assertEqual(expected, Matcher(pattern).match(path), '%s %s' % (pattern, path))
+        self.assertTrue(Matcher('x/').match('x', isdir=True))
+
+    def test_negate(self):
+        m = Matcher('**/*.log', '!**/skip/**', '!b.log')
+        self.assertTrue(m.match('a/a.log'))
+        self.assertFalse(m.match('a/skip/a.log'))
+        self.assertFalse(m.match('b.log'))
+        self.assertTrue(m.match('a/b.log'))
+        self.assertFalse(Matcher('!*').match('a'))
+
+
+class GlobTestCase(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp(prefix='cuprum_test_')
+        for d in ('a', 'a/b', 'a/b/c', 'a/skip', '.hid', 'z'):
+            os.mkdir(os.path.join(self.root, d))
+        for f in ('one.log', 'a/two.log', 'a/two.gz', 'a/b/three.log', 'a/b/c/four.txt',
+                  'a/skip/five.log', '.hid/six.log', 'z/seven.gz', '.eight.log'):
+            open(os.path.join(self.root, f), 'w').close()
+        os.symlink(self.root, os.path.join(self.root, 'a', 'loop'))
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def rel(self, paths):
+        return sorted(os.path.relpath(str(p), self.root) for p in paths)
+
+    def test_like_glob(self):
+        for pattern in ('*', '*/*', '*.log', 'a/*/*', '.*', 'a/b', 'a/../z/*', 'a/loop/a/b/*', 'nope/*', 'a/'):
+            expected = self.rel(glob.glob(os.path.join(self.root, pattern)))
+            self.assertEqual(expected, self.rel(iglob(self.root, pattern)), pattern)
+
+    def test_recursive(self):
+        self.assertEqual(
+                ['a/b/three.log', 'a/skip/five.log', 'a/two.log', 'one.log'],
+                self.rel(iglob(self.root, '**/*.log')))
+        self.assertEqual(
+                ['a/b/three.log', 'a/skip/five.log', 'a/two.gz', 'a/two.log', 'one.log', 'z/seven.gz'],
+                self.rel(iglob(self.root, ['**/*.log', '**/*.gz'])))
+        self.assertEqual(['a/b', 'a/b/c', 'a/b/c/four.txt', 'a/b/three.log'], self.rel(iglob(self.root, 'a/b/**')))
+
+    def test_negate(self):
+        self.assertEqual(
+                ['a/b/three.log', 'a/two.log', 'one.log'],
+                self.rel(iglob(self.root, '**/*.log', '!a/skip/**')))
+
+    def test_prune(self):
+        m = Matcher('a/b/*.log')
+        listed = list()
+        names = m._names
+
+        def spy(dirpath, states):
+            listed.append(os.path.relpath(dirpath, self.root))
+            return names(dirpath, states)
+        m._names = spy
+        self.assertEqual(['a/b/three.log'], self.rel(m.walk(self.root)))
+        self.assertEqual(['.', 'a', 'a/b'], listed)
+
+    def test_path(self):
+        t = Path(self.root)
+        result = list(t.glob('**/*.gz', '/*.log'))
+        for p in result:
+            self.assertIsInstance(p, Path)
+        self.assertEqual(['a/two.gz', 'one.log', 'z/seven.gz'], self.rel(result))
+        self.assertEqual(['one.log'], self.rel(t // '*.log'))
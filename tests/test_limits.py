@@ -0,0 +1,57 @@
+from __future__ import with_statement
+try:
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+import os
+import sys
+import subprocess
+
+from cu.limits import Limits
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+class LimitsTestCase(unittest.TestCase):
+    def test_pop(self):
+        kwargs = dict(nice=5, rlimits=dict(nofile=64), stdout=None)
+        limits = Limits.pop(kwargs, dict(nice=1, affinity=3, rlimits=dict(cpu=(10, 20))))
+        self.assertEqual(dict(stdout=None), kwargs)
+        self.assertEqual(5, limits.nice)
+        self.assertEqual(set([0, 1]), limits.affinity)
+        self.assertEqual(2, len(limits.rlimits))
+        self.assertTrue(Limits.pop(dict()) is None)
+        self.assertTrue(Limits.pop(dict(limits=Limits(preexec=True))) is None)
+        kwargs = dict(limits=Limits(nice=2, preexec=True), ionice='idle')
+        limits = Limits.pop(kwargs)
+        self.assertEqual(dict(), kwargs)
+        self.assertEqual((2, 3 << 13), (limits.nice, limits.ionice))
+        self.assertTrue(limits.in_child())
+
+    def test_ionice(self):
+        self.assertEqual((2 << 13) | 4, Limits(ionice='best-effort').ionice)
+        self.assertEqual((1 << 13) | 7, Limits(ionice=('realtime', 7)).ionice)
+        self.assertRaises(ValueError, Limits, ionice=('idle', 9))
+        self.assertRaises(KeyError, Limits, ionice='bogus')
+        self.assertEqual(0, Limits(ionice=(0, 0)).ionice)
+        self.assertTrue(Limits.pop(dict(ionice=(0, 0))) is not None)
+
+    @unittest.skipUnless(hasattr(resource, 'prlimit') and hasattr(os, 'setpriority'), 'needs prlimit')
+    def test_apply(self):
+        script = 'import os, resource; print(os.nice(0)); print(resource.getrlimit(resource.RLIMIT_NOFILE)[0])'
+        for preexec in (False, True):
+            limits = Limits(nice=3, rlimits=dict(nofile=77), preexec=preexec)
+            self.assertTrue(limits.in_child())
+            self.assertEqual(preexec, Limits(nice=3, preexec=preexec).in_child())
+            base = os.nice(0)
+            if preexec:
+                proc = subprocess.Popen([sys.executable, '-c', script], stdout=subprocess.PIPE, preexec_fn=limits.preexec_fn())
+            else:
+                proc = subprocess.Popen([sys.executable, '-c', 'import sys; sys.stdin.read();' + script],
+                                        stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+                limits.apply(proc.pid)
+            out = proc.communicate(b'')[0].decode().split()
+            self.assertEqual([str(base + 3), '77'], out)
@@ -6,7 +6,7 @@ except ImportError:
 import os
 import sys
 
-from cu import local, FG, BG, ERROUT
+from cu import local, Path, FG, BG, ERROUT
 from cu import CommandNotFound, ProcessExecutionError, ProcessTimedOut
 
 local.cwd.chdir('tests')
@@ -27,7 +27,8 @@ class LocalMachineTestCase(unittest.TestCase):
 
     def test_cwd(self):
         from cu.syspath import ls
-        self.assertEqual(local.cwd, os.getcwd())
+        self.assertEqual(local.cwd, Path.cwd())
+        self.assertEqual(os.path.join(os.getcwd(), 'tests'), local.cwd)  # virtual, process cwd untouched
         self.assertTrue('__init__.py' not in ls().splitlines())
         with local.cwd('../cu'):
             self.assertTrue('__init__.py' in ls().splitlines())
@@ -102,6 +103,15 @@ class LocalMachineTestCase(unittest.TestCase):
         self.assertEqual(rc, 2)
         self.assertTrue('Usage' in out)
 
+    def test_shell_mode(self):
+        from cu.syspath import ls, grep, false, cat, sleep
+        chain = (ls['-a'] | grep['test'] | grep['local'])
+        self.assertEqual(chain(), chain(shell_mode=True))
+        rc, out, _ = (false | cat).run(shell_mode=True)
+        self.assertEqual(0, rc)
+        self.assertRaises(ProcessExecutionError, (false | cat).run, shell_mode=True, pipefail=True)
+        self.assertRaises(ProcessTimedOut, (sleep[10] | cat).run, shell_mode=True, timeout=0.1)
+
     def test_popen(self):
         from cu.syspath import ls
         p = ls.popen(['-a'])
@@ -0,0 +1,190 @@
+from __future__ import with_statement
+try:
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+import os
+import time
+import shutil
+import tempfile
+
+import six
+
+from cu import local
+from cu import memo
+from cu.command import BaseCommand, Command, CachedCommand, RunResult, ProcessExecutionError
+
+
+class FakeCommand(BaseCommand):
+    '''Counts runs instead of spawning.'''
+    def __init__(self, returncode=0):
+        super(FakeCommand, self).__init__()
+        self.returncode = returncode
+        self.runs = 0
+
+    def _get_encoding(self):
+        return 'utf-8'
+
+    def formulate(self, level=0, args=()):
+        return ['fake'] + list(args)
+
+    def run(self, args=(), **kwargs):
+        self.runs += 1
+        retcode = kwargs.get('retcode', 0)
+        if retcode is not None and self.returncode != retcode:
+            raise ProcessExecutionError(self.formulate(0, args), self.returncode, '', '')
+        return RunResult(self.returncode, 'out %d' % (self.runs, ), '', self.formulate(0, args))
+
+
+class LRUTestCase(unittest.TestCase):
+    def test_evict(self):
+        lru = memo.LRU(2)
+        lru['a'] = 1
+        lru['b'] = 2
+        self.assertEqual(1, lru.get('a'))
+        lru['c'] = 3
+        self.assertEqual(2, len(lru))
+        self.assertEqual(None, lru.get('b'))
+        self.assertEqual(1, lru.get('a'))
+        self.assertEqual(3, lru.get('c'))
+
+
+class DiskStoreTestCase(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def test_roundtrip(self):
+        store = memo.DiskStore(self.root)
+        store.put('ab12', (0, b'\x00\xffbytes', u'text'))
+        self.assertEqual((0, b'\x00\xffbytes', u'text'), store.get('ab12'))
+        self.assertEqual(None, store.get('cd34'))
+        # another process sees it
+        self.assertEqual((0, b'\x00\xffbytes', u'text'), memo.DiskStore(self.root).get('ab12'))
+        store.clear()
+        self.assertEqual(None, store.get('ab12'))
+
+    def test_evict(self):
+        store = memo.DiskStore(self.root, max_bytes=350)
+        for i in range(3):
+            key = '%02d' % (i, )
+            store.put(key, (0, six.u('x') * 80, six.u('')))
+            past = time.time() - 100 + i
+            os.utime(store._path(key), (past, past))
+        store.get('00')  # recently used
+        store.put('03', (0, six.u('x') * 80, six.u('')))
+        self.assertNotEqual(None, store.get('00'))
+        self.assertEqual(None, store.get('01'))
+        self.assertNotEqual(None, store.get('03'))
+
+    def test_overwrite(self):
+        store = memo.DiskStore(self.root)
+        store.put('ab12', (0, 'x' * 80, ''))
+        store.put('cd34', (0, 'y' * 80, ''))
+        size = store._size
+        store.put('cd34', (0, 'y' * 80, ''))
+        self.assertEqual(size, store._size)
+
+
+class KeyTestCase(unittest.TestCase):
+    def test_key(self):
+        fd, path = tempfile.mkstemp()
+        os.close(fd)
+        try:
+            base = memo.key(['ls', '-l'], '/tmp', dict(LANG='C'), 'utf-8', [path])
+            self.assertEqual(base, memo.key(['ls', '-l'], '/tmp', dict(LANG='C'), 'utf-8', [path]))
+            self.assertNotEqual(base, memo.key(['ls'], '/tmp', dict(LANG='C'), 'utf-8', [path]))
+            self.assertNotEqual(base, memo.key(['ls', '-l'], '/', dict(LANG='C'), 'utf-8', [path]))
+            self.assertNotEqual(base, memo.key(['ls', '-l'], '/tmp', dict(LANG='de'), 'utf-8', [path]))
+            self.assertNotEqual(base, memo.key(['ls', '-l'], '/tmp', dict(LANG='C'), None, [path]))
+            with open(path, 'w') as f:
+                f.write('changed')
+            self.assertNotEqual(base, memo.key(['ls', '-l'], '/tmp', dict(LANG='C'), 'utf-8', [path]))
+        finally:
+            os.unlink(path)
+        self.assertNotEqual(base, memo.key(['ls', '-l'], '/tmp', dict(LANG='C'), 'utf-8', [path]))
+
+
+class CachedTestCase(unittest.TestCase):
+    def setUp(self):
+        self.memo = memo.Memo()
+
+    def test_hit(self):
+        fake = FakeCommand()
+        cached = fake.cached(memo=self.memo)
+        first = cached.run(['a'])
+        self.assertFalse(first.cached)
+        second = cached.run(['a'])
+        self.assertTrue(second.cached)
+        self.assertEqual(1, fake.runs)
+        self.assertEqual(tuple(first), tuple(second))
+        self.assertEqual(['fake', 'a'], second.argv)
+        cached.run(['b'])
+        self.assertEqual(2, fake.runs)
+        self.assertEqual((1, 2), (self.memo.hits, self.memo.misses))
+
+    def test_env(self):
+        fake = FakeCommand()
+        cached = fake.cached(env=['CU_MEMO_TEST'], memo=self.memo)
+        with local.env(CU_MEMO_TEST='1'):
+            cached.run()
+            cached.run()
+        self.assertEqual(1, fake.runs)
+        with local.env(CU_MEMO_TEST='2'):
+            cached.run()
+        self.assertEqual(2, fake.runs)
+
+    def test_uncached(self):
+        fake = FakeCommand()
+        cached = fake.cached(memo=self.memo)
+        cached.run(stdin=None)
+        cached.run(stdin=None)
+        self.assertEqual(2, fake.runs)
+
+    def test_retcode(self):
+        fake = FakeCommand(returncode=1)
+        cached = fake.cached(memo=self.memo)
+        self.assertRaises(ProcessExecutionError, cached.run)
+        self.assertEqual(1, cached.run(retcode=None).returncode)
+        self.assertRaises(ProcessExecutionError, cached.run)
+        self.assertEqual(1, cached.run(retcode=1).returncode)
+        self.assertEqual(2, fake.runs)
+
+    def test_bind(self):
+        cached = FakeCommand().cached(env=['CU_MEMO_TEST'], inputs=['/nonexistent'], memo=self.memo)
+        bound = cached['-a']
+        self.assertTrue(isinstance(bound, CachedCommand))
+        self.assertTrue(bound.memo is self.memo)
+        self.assertEqual((('CU_MEMO_TEST', ), ('/nonexistent', )), (bound.env_names, bound.inputs))
+        self.assertEqual(['fake', '-a', 'b'], bound.formulate(0, ['b']))
+        self.assertTrue(cached[()] is cached)
+
+    def test_context(self):
+        command = Command('/bin/true')
+        cached = command.cached(env=['CU_MEMO_TEST'], memo=self.memo)
+        base = cached['-x']._key(())
+        command.cwd = '/'
+        self.assertNotEqual(base, cached['-x']._key(()))
+        command.env = dict(CU_MEMO_TEST='1')
+        with local.env(CU_MEMO_TEST='1'):
+            keyed = cached['-x']._key(())
+        command.env = dict(CU_MEMO_TEST='2')
+        with local.env(CU_MEMO_TEST='1'):
+            self.assertNotEqual(keyed, cached['-x']._key(()))
+
+    def test_disk(self):
+        root = tempfile.mkdtemp()
+        try:
+            fake = FakeCommand()
+            fake.cached(memo=memo.Memo(store=root)).run()
+            result = fake.cached(memo=memo.Memo(store=root)).run()
+            self.assertTrue(result.cached)
+            self.assertEqual(1, fake.runs)
+        finally:
+            shutil.rmtree(root)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,147 @@
+from __future__ import with_statement
+try:
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+import os
+import shutil
+import tempfile
+
+import six
+
+from cu import metrics
+
+
+class FakeProc(object):
+    returncode = 0
+
+    def __init__(self, start, end, srcproc=None):
+        self._start_time = start
+        self._end_time = end
+        if srcproc is not None:
+            self.srcproc = srcproc
+
+
+class MetricsTestCase(unittest.TestCase):
+    def setUp(self):
+        self.registry = metrics.Registry()
+
+    def test_collect(self):
+        r = self.registry
+        src, dst = FakeProc(0, None), FakeProc(0, 0.3)
+        dst.srcproc = src
+        r.spawned(src, '/bin/ls')
+        r.spawned(dst, '/bin/grep')
+        self.assertEqual(1, r.as_dict()['/bin/ls'][metrics.RUNNING])
+        r.finished(dst, (10, 2), failed=True)
+        r.finished(dst, (10, 2), failed=True)  # only once
+        stats = r.as_dict()
+        grep = stats['/bin/grep']
+        self.assertEqual(1, grep[metrics.STARTED])
+        self.assertEqual(1, grep[metrics.FINISHED])
+        self.assertEqual(1, grep[metrics.FAILED])
+        self.assertEqual(0, grep[metrics.RUNNING])
+        self.assertEqual(dict(stdout=10, stderr=2), grep[metrics.CAPTURED])
+        self.assertEqual(1, grep[metrics.SECONDS]['count'])
+        self.assertEqual((.5, 1), grep[metrics.SECONDS]['buckets'][6])
+        self.assertEqual((.25, 0), grep[metrics.SECONDS]['buckets'][5])
+        ls = stats['/bin/ls']
+        self.assertEqual(0, ls[metrics.RUNNING])
+        self.assertFalse(metrics.FAILED in ls)
+        self.assertFalse(metrics.CAPTURED in ls)
+
+    def test_stage_running(self):
+        r = self.registry
+        src = FakeProc(0, None)
+        src.returncode = None
+        dst = FakeProc(0, 0.3, src)
+        r.spawned(src, 'yes')
+        r.spawned(dst, 'head')
+        r.finished(dst)
+        self.assertEqual(1, r.as_dict()['yes'][metrics.RUNNING])
+        self.assertFalse(metrics.SECONDS in r.as_dict()['yes'])
+        src.returncode = -13
+        r.reaped(src)
+        self.assertEqual(0, r.as_dict()['yes'][metrics.RUNNING])
+
+    def test_reaped(self):
+        r = self.registry
+        proc = FakeProc(0, None)
+        r.spawned(proc, 'x')
+        r.reaped(proc)
+        r.reaped(proc)
+        self.assertEqual(0, r.as_dict()['x'][metrics.RUNNING])
+        r.finished(proc, (3, 0), failed=True)
+        stats = r.as_dict()['x']
+        self.assertEqual(1, stats[metrics.FINISHED])
+        self.assertEqual(1, stats[metrics.FAILED])
+        self.assertEqual(dict(stdout=3), stats[metrics.CAPTURED])
+
+    def test_popen_wait(self):
+        from cu.command import Popen
+        registry = metrics.enable()
+        try:
+            proc = Popen(['true'])
+            registry.spawned(proc, 'true')
+            self.assertEqual(1, registry.as_dict()['true'][metrics.RUNNING])
+            proc.wait()
+            self.assertEqual(0, registry.as_dict()['true'][metrics.RUNNING])
+        finally:
+            metrics.disable()
+
+    def test_reset(self):
+        r = self.registry
+        proc = FakeProc(0, 1)
+        r.spawned(proc, 'x')
+        r.reset()
+        r.finished(proc)
+        self.assertEqual(dict(), r.as_dict())
+
+    def test_prometheus(self):
+        r = self.registry
+        proc = FakeProc(0, 2)
+        r.spawned(proc, '/my "bin"/x')
+        r.finished(proc, (5, 0), timed_out=True)
+        text = r.prometheus()
+        self.assertTrue('cu_command_timed_out_total{executable="/my \\"bin\\"/x"} 1\n' in text)
+        self.assertTrue('cu_command_captured_bytes_total{executable="/my \\"bin\\"/x",stream="stdout"} 5\n' in text)
+        self.assertTrue('cu_command_duration_seconds_bucket{executable="/my \\"bin\\"/x",le="+Inf"} 1\n' in text)
+        self.assertTrue('# TYPE cu_command_running gauge\n' in text)
+        root = tempfile.mkdtemp(prefix='cuprum_test_')
+        try:
+            path = os.path.join(root, 'cu.prom')
+            r.write_prometheus(path)
+            with open(path) as f:
+                self.assertEqual(text, f.read())
+        finally:
+            shutil.rmtree(root)
+
+    def test_enable(self):
+        self.assertTrue(metrics.registry is None)
+        r = metrics.enable()
+        try:
+            self.assertTrue(r is metrics.enable())
+        finally:
+            self.assertTrue(r is metrics.disable())
+        self.assertTrue(metrics.registry is None)
+
+
+class ProfileTestCase(unittest.TestCase):
+    def test_report(self):
+        from cu.command import RunResult
+        out = six.StringIO()
+        with metrics.profile(out, sort='count') as p:
+            self.assertEqual([p], metrics.profiles)
+            metrics.profiled(RunResult(0, '', '', ['/bin/a'], 1.5))
+            metrics.profiled(RunResult(0, '', '', ['/bin/b'], .5))
+            metrics.profiled(RunResult(0, '', '', ['/bin/b'], .25))
+        self.assertEqual([], metrics.profiles)
+        metrics.profiled(RunResult(0, '', '', ['/bin/c'], 1))  # not collected
+        self.assertEqual(2, p.stats()['/bin/b']['count'])
+        self.assertEqual(.75, p.stats()['/bin/b']['wall'])
+        lines = out.getvalue().splitlines()
+        self.assertEqual(3, len(lines))
+        self.assertTrue(lines[1].endswith('/bin/b'))
+        self.assertTrue('0.750' in lines[1])
+        self.assertTrue(lines[2].endswith('/bin/a'))
+        self.assertRaises(ValueError, metrics.profile, sort='bogus')
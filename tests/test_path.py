@@ -7,6 +7,7 @@ import os
 import sys
 import pwd
 import grp
+import shutil
 import tempfile
 
 import six
@@ -185,12 +186,13 @@ class PathTestCase(unittest.TestCase):
         self.assertFalse(Path(''))
 
     def test_abs(self):
+        cwd = str(Path.cwd())  # virtual, see CWD
         tests = (
             ('', ''),
-            ('.', os.getcwd()),
+            ('.', cwd),
             ('/', '/'),
-            ('./file.txt', os.getcwd() + '/file.txt'),
-            ('file.txt', os.getcwd() + '/file.txt'),
+            ('./file.txt', cwd + '/file.txt'),
+            ('file.txt', cwd + '/file.txt'),
             ('/../../file.txt', '/file.txt'),
             ('/path/to/some/place', '/path/to/some/place'),
             ('/path/../place/', '/place/'),
@@ -420,6 +422,61 @@ class PathTestCase(unittest.TestCase):
         finally:
             os.remove(fh.name)
 
+    def test_parse_mode(self):
+        from cu.path import parse_mode
+        tests = (  # octal strings, same as /bin/chmod
+            (('644', ), '644'),
+            ((644, ), '644'),
+            (('0755', ), '755'),
+            (('u+x', '644'), '744'),
+            (('u+rwX,go-w', '666'), '644'),
+            (('u+rwX,go-w', '666', True), '744'),
+            (('a+X', '744'), '755'),
+            (('a=r', '777'), '444'),
+            (('g=u', '640'), '660'),
+            (('o=g', '750'), '755'),
+            (('u=rw,g=r,o=', '777'), '640'),
+            (('u+s,+t', '755'), '5755'),
+            (('+x', '644', False, '022'), '755'),
+            (('+w', '444', False, '022'), '644'),
+            )
+        for args, expected in tests:
+            args = list(args)
+            if len(args) > 1:
+                args[1] = int(args[1], 8)
+            if len(args) > 3:
+                args[3] = int(args[3], 8)
+            self.assertEqual(int(expected, 8), parse_mode(*args), args)
+        self.assertRaises(ValueError, parse_mode, 'u')
+        self.assertRaises(ValueError, parse_mode, 'u+q')
+
+    def test_umask(self):
+        from cu.path import _umask, _uses_umask
+        mask = os.umask(int('027', 8))
+        try:
+            self.assertEqual(int('027', 8), _umask())
+        finally:
+            os.umask(mask)
+        self.assertFalse(_uses_umask('644'))
+        self.assertFalse(_uses_umask('u+x,go-w'))
+        self.assertTrue(_uses_umask('u+x,+w'))
+
+    def test_chmod_recursive(self):
+        root = Path(tempfile.mkdtemp(prefix='cuprum_test_'))
+        try:
+            os.mkdir(str(root / 'sub'))
+            open(str(root / 'sub' / 'file'), 'w').close()
+            os.chmod(str(root / 'sub' / 'file'), int('600', 8))
+            os.symlink(str(root / 'sub' / 'file'), str(root / 'link'))
+            root.chmod('go+rX', recursive=True)
+            self.assertEqual(int('644', 8), os.stat(str(root / 'sub' / 'file')).st_mode & int('7777', 8))
+            self.assertEqual(int('755', 8), os.stat(str(root / 'sub')).st_mode & int('777', 8))
+            me = pwd.getpwuid(os.getuid()).pw_name
+            root.chown(me, recursive=True)
+            self.assertEqual(me, (root / 'sub' / 'file').owner)
+        finally:
+            root.delete()
+
     @unittest.skip('TODO: changing owner/group requires root.')
     def test_group_owner_chown(self):
         PATH = '/tmp/delme.txt'
@@ -455,6 +512,50 @@ class PathTestCase(unittest.TestCase):
         t.statfs()
         t.statvfs()
 
+    @unittest.skipIf(sys.version.startswith('2.5'), 'Unsupported for Python 2.5 (see tmpfile)')
+    def test_stat_cached(self):
+        fh = tmpfile()
+        try:
+            t = Path(fh.name)
+            self.assertEqual(os.stat(fh.name), t.stat(cached=True))
+            os.utime(fh.name, (12, 12))
+            self.assertNotEqual(12, t.stat(cached=True).st_mtime)
+            self.assertEqual(12, t.stat().st_mtime)
+            self.assertEqual(12, t.refresh().stat(cached=True).st_mtime)
+            t.touch(28)
+            self.assertEqual(28, t.stat(cached=True).st_mtime)
+        finally:
+            os.remove(fh.name)
+
+    @unittest.skipIf(sys.version.startswith('2.5'), 'Unsupported for Python 2.5 (see tmpfile)')
+    def test_snapshot(self):
+        fh = tmpfile()
+        try:
+            fh.write(six.b('hello'))
+            fh.flush()
+            t = Path(fh.name)
+            s = t.snapshot()
+            self.assertEqual(5, s.size())
+            self.assertEqual(t.mtime(), s.mtime())
+            self.assertEqual(t.atime(), s.atime())
+            self.assertEqual(t.ctime(), s.ctime())
+            self.assertEqual(t.owner, s.owner)
+            self.assertEqual(t.group, s.group)
+            self.assertEqual(t.mode, s.mode)
+            fh.write(six.b(' world'))
+            fh.flush()
+            self.assertEqual(5, s.size())
+            self.assertEqual(11, s.refresh().size())
+            fh.write(six.b('!'))
+            fh.flush()
+            self.assertEqual(12, t.snapshot(ttl=0).size())
+            s = t.snapshot(ttl=0)
+            fh.write(six.b('!'))
+            fh.flush()
+            self.assertEqual(13, s.size())
+        finally:
+            os.remove(fh.name)
+
     def test_split(self):
         # testing that Python's string.split works, just that os.sep is default
         # rather than whitespace.
@@ -665,14 +766,18 @@ class PathTestCase(unittest.TestCase):
         self.assertRaises(OSError, Path('/tmp').readlink)
 
     def test_chdir(self):
+        from cu.path import CWD
         self.assertTrue('/tmp' != os.getcwd())
         old_cwd = os.getcwd()
-        try:
+        with CWD()(old_cwd):
             Path('/tmp').chdir()
-            self.assertEqual('/tmp', os.getcwd())
+            self.assertEqual('/tmp', Path.cwd())
+            self.assertEqual('/tmp/x', Path('x').abs)
             self.assertRaises(OSError, Path('/doesnot_exist').chdir)
-        finally:
-            os.chdir(old_cwd)
+            with Path('/'):
+                self.assertEqual('/', Path.cwd())
+            self.assertEqual('/tmp', Path.cwd())
+        self.assertEqual(old_cwd, os.getcwd())
 
     def test_fifo(self):
         name = '/tmp/cuprum_test_fifo'
@@ -718,3 +823,73 @@ class PathTestCase(unittest.TestCase):
             os.rmdir(str(t))
         t.mkdir()
         t.mkdir()  # silently ignores existing
+
+
+class CWDTestCase(unittest.TestCase):
+    def test_virtual(self):
+        import threading
+        from cu.path import CWD, getcwd
+        process, start = os.getcwd(), getcwd()
+        cwd = CWD()
+        self.assertEqual(start, cwd)
+        with cwd('/tmp'):
+            self.assertEqual('/tmp', cwd)
+            self.assertEqual('/tmp', Path.cwd())
+            self.assertEqual('/tmp/x', Path('x').abs)
+            self.assertEqual(process, os.getcwd())
+            self.assertTrue(type(cwd / 'x') is Path)
+            seen = list()
+            thread = threading.Thread(target=lambda: seen.append(str(CWD())))
+            thread.start()
+            thread.join()
+            self.assertEqual([process], seen)
+            with cwd('..'):
+                self.assertEqual('/', cwd)
+            self.assertRaises(OSError, cwd.chdir, 'doesnot_exist')
+            self.assertEqual('/tmp', cwd)
+        self.assertEqual(start, cwd)
+
+    def test_cached_stat(self):
+        from cu.path import CWD
+        root = tempfile.mkdtemp(prefix='cuprum_test_')
+        try:
+            for name, data in (('a', 'x'), ('b', 'xyz')):
+                os.mkdir(os.path.join(root, name))
+                with open(os.path.join(root, name, 'f'), 'w') as fh:
+                    fh.write(data)
+            f = Path('f')
+            with CWD()(os.path.join(root, 'a')):
+                self.assertEqual(1, f.stat(cached=True).st_size)
+            with CWD()(os.path.join(root, 'b')):
+                self.assertEqual(3, f.stat(cached=True).st_size)
+        finally:
+            shutil.rmtree(root)
+
+    def test_relative_io(self):
+        from cu.path import CWD
+        root = tempfile.mkdtemp(prefix='cuprum_test_')
+        try:
+            os.mkdir(os.path.join(root, 'build'))
+            with CWD()(root):
+                Path('out.txt').write_text(six.u('process'))
+            with CWD()(os.path.join(root, 'build')):
+                out = Path('out.txt')
+                self.assertFalse(out.exists())
+                out.write_text(six.u('build'))
+                self.assertTrue(out.isfile())
+                self.assertEqual(six.u('build'), out.read_text())
+                self.assertEqual(5, out.size())
+                Path('sub').mkdir()
+                Path('sub/f').touch()
+                self.assertEqual(['out.txt', 'sub'], sorted(str(p) for p in Path('.').list()))
+                self.assertEqual(['sub/f'], [str(p) for p in Path('').glob('sub/*')])
+                self.assertEqual(['sub'], [d for d, ds, fs in Path('sub').walk()])
+                out.copy('copy.txt')
+                Path('copy.txt').move('moved.txt')
+                out.delete()
+                self.assertFalse(out.exists())
+            self.assertEqual(['moved.txt', 'sub'], sorted(os.listdir(os.path.join(root, 'build'))))
+            with open(os.path.join(root, 'out.txt')) as fh:
+                self.assertEqual('process', fh.read())
+        finally:
+            shutil.rmtree(root)
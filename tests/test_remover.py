@@ -0,0 +1,62 @@
+from __future__ import with_statement
+try:
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+import os
+import shutil
+import tempfile
+
+from cu import Path
+from cu.remover import remove, rmtree
+
+
+def make_tree(root, width=4, depth=3):
+    for i in range(width):
+        open(os.path.join(root, 'file%d' % i), 'w').close()
+    os.symlink('file0', os.path.join(root, 'link'))
+    if depth:
+        for i in range(width):
+            sub = os.path.join(root, 'dir%d' % i)
+            os.mkdir(sub)
+            make_tree(sub, width, depth - 1)
+
+
+class RemoverTestCase(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp(prefix='cuprum_test_')
+        self.tree = os.path.join(self.root, 'tree')
+        os.mkdir(self.tree)
+        make_tree(self.tree)
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def test_serial(self):
+        rmtree(self.tree, workers=1)
+        self.assertEqual([], os.listdir(self.root))
+
+    def test_parallel(self):
+        rmtree(self.tree, workers=4)
+        self.assertEqual([], os.listdir(self.root))
+
+    def test_symlinked_dir_not_followed(self):
+        os.symlink(self.tree, os.path.join(self.root, 'link'))
+        remove(os.path.join(self.root, 'link'))
+        self.assertEqual(['tree'], os.listdir(self.root))
+        self.assertEqual(5 + 4, len(os.listdir(self.tree)))
+
+    def test_missing(self):
+        self.assertEqual(None, remove(os.path.join(self.root, 'nope')))
+
+    def test_background(self):
+        thd = remove(self.tree, background=True)
+        self.assertFalse(os.path.exists(self.tree))
+        thd.join()
+        self.assertEqual([], os.listdir(self.root))
+
+    def test_path_delete(self):
+        t = Path(self.tree)
+        self.assertEqual(t, t.delete(workers=2))
+        self.assertFalse(t.exists())
+        t.delete()  # missing is fine
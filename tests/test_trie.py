@@ -0,0 +1,75 @@
+try:
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+
+from cu import Path
+from cu.trie import PathTrie, PathSet, segments
+
+
+class TrieTestCase(unittest.TestCase):
+    def test_segments(self):
+        self.assertEqual([], segments(''))
+        self.assertEqual(['/'], segments('/'))
+        self.assertEqual(['/', 'var', 'log'], segments('//var//log/'))
+        self.assertEqual(['var', 'log'], segments(Path('var/log')))
+
+    def test_mapping(self):
+        t = PathTrie({'/srv/a': 1, '/srv/b/': 2})
+        t['/srv/a/sub'] = 3
+        t['/srv/a'] = 4
+        self.assertEqual(3, len(t))
+        self.assertEqual(4, t['/srv/a/'])
+        self.assertEqual(2, t[Path('/srv/b')])
+        self.assertTrue('/srv/a/sub' in t)
+        self.assertFalse('/srv' in t)
+        self.assertEqual(None, t.get('/srv'))
+        self.assertRaises(KeyError, t.__getitem__, '/srv')
+        self.assertEqual([('/srv/a', 4), ('/srv/a/sub', 3), ('/srv/b', 2)], list(t.items()))
+        del t['/srv/a/sub']
+        self.assertEqual(['/srv/a', '/srv/b'], list(t))
+        self.assertRaises(KeyError, t.__delitem__, '/srv/a/sub')
+        self.assertEqual(2, len(t))
+
+    def test_longest_prefix(self):
+        t = PathTrie([('/srv', 'root'), ('/srv/app', 'app'), ('rel', 'rel')])
+        tests = (
+            ('/srv/app/src/x.py', ('/srv/app', 'app')),
+            ('/srv/app', ('/srv/app', 'app')),
+            ('/srv/apple', ('/srv', 'root')),
+            ('/etc', (None, None)),
+            ('rel/x', ('rel', 'rel')),
+            )
+        for path, expected in tests:
+            self.assertEqual(expected, t.longest_prefix(path), path)
+        self.assertEqual((None, 0), t.longest_prefix('/', 0))
+
+    def test_under(self):
+        s = PathSet(['/a/b', '/a/b/c', '/a/bc', '/d'])
+        self.assertEqual(['/a/b', '/a/b/c'], list(s.under('/a/b')))
+        self.assertEqual(['/a/b', '/a/b/c', '/a/bc'], list(s.under('/a')))
+        self.assertEqual([], list(s.under('/x')))
+        self.assertEqual('/a/b', s.longest_prefix('/a/b/c2'))
+        self.assertEqual(None, s.longest_prefix('/a'))
+
+    def test_common_prefix(self):
+        tests = (
+            ((), ''),
+            (('/var/log/', '/var/log/kernel'), '/var/log'),
+            (('/var/log', '/var/logged', '/var/log/kernel'), '/var'),
+            (('/var', 'var'), ''),
+            (('a/b/c', ), 'a/b/c'),
+            )
+        for paths, expected in tests:
+            self.assertEqual(expected, PathSet(paths).common_prefix(), paths)
+            self.assertEqual(expected, Path.common_prefix(paths), paths)
+
+    def test_set(self):
+        s = PathSet()
+        s.add('/x/y')
+        s.add('/x/y/')
+        self.assertEqual(1, len(s))
+        s.discard('/x/y')
+        s.discard('/x/y')
+        self.assertEqual(0, len(s))
+        self.assertEqual(['/'], list(PathSet(['/'])))
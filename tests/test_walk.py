@@ -0,0 +1,87 @@
+from __future__ import with_statement
+try:
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+import os
+import time
+import shutil
+import tempfile
+import threading
+
+import cu.walk
+from cu import Path
+from cu.walk import walk
+
+
+def make_tree(root, width=3, depth=3, files=4):
+    '''Synthetic tree, width**depth leaf directories.'''
+    if depth == 0:
+        return
+    for i in range(files):
+        with open(os.path.join(root, 'file%d.txt' % i), 'w') as fh:
+            fh.write('x' * i)
+    for i in range(width):
+        sub = os.path.join(root, 'dir%d' % i)
+        os.mkdir(sub)
+        make_tree(sub, width, depth - 1, files)
+
+
+class WalkTestCase(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp(prefix='cuprum_test_')
+        make_tree(self.root)
+        os.symlink(os.path.join(self.root, 'dir0'), os.path.join(self.root, 'linked'))
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def expected(self, followlinks=False):
+        return sorted((d, sorted(ds), sorted(fs)) for d, ds, fs in os.walk(self.root, followlinks=followlinks))
+
+    def test_unordered(self):
+        for workers in (1, 4):
+            found = sorted((d, sorted(ds), sorted(fs)) for d, ds, fs in walk(self.root, workers))
+            self.assertEqual(self.expected(), found)
+
+    def test_ordered(self):
+        self.assertEqual(list(os.walk(self.root)), list(walk(self.root, 4, ordered=True)))
+
+    def test_followlinks(self):
+        found = sorted((d, sorted(ds), sorted(fs)) for d, ds, fs in walk(self.root, 4, followlinks=True))
+        self.assertEqual(self.expected(followlinks=True), found)
+
+    def test_stat(self):
+        for dirpath, dirnames, filenames, stats in walk(self.root, 4, stat=True):
+            self.assertEqual(sorted(dirnames + filenames), sorted(stats))
+            for name in filenames:
+                self.assertEqual(os.lstat(os.path.join(dirpath, name)), stats[name])
+
+    def test_onerror(self):
+        errors = list()
+        self.assertEqual([], list(walk(os.path.join(self.root, 'nope'), onerror=errors.append)))
+        self.assertEqual(1, len(errors))
+        self.assertIsInstance(errors[0], OSError)
+
+    def test_early_exit(self):
+        before = set(threading.enumerate())
+        for x in walk(self.root, 2, maxsize=1):
+            break
+        deadline = time.time() + 5
+        while set(threading.enumerate()) - before and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(set(), set(threading.enumerate()) - before)
+
+    def test_worker_error(self):
+        def listdir(*args):
+            raise ValueError('boom')
+        original, cu.walk.listdir = cu.walk.listdir, listdir
+        try:
+            for ordered in (False, True):
+                self.assertRaises(ValueError, list, walk(self.root, 2, ordered=ordered))
+        finally:
+            cu.walk.listdir = original
+
+    def test_path(self):
+        found = sorted(d for d, _, _ in Path(self.root).walk_parallel(ordered=True))
+        self.assertEqual(sorted(d for d, _, _ in os.walk(self.root)), found)
@@ -0,0 +1,91 @@
+from __future__ import with_statement
+try:
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+import os
+import shutil
+import tempfile
+
+from cu import Path
+from cu.watch import watch, coalesce, Event, HAVE_INOTIFY, CREATED, MODIFIED, DELETED, MOVED
+
+
+class CoalesceTestCase(unittest.TestCase):
+    def test_coalesce(self):
+        tests = (
+            ([Event(CREATED, 'a'), Event(MODIFIED, 'a')], [Event(CREATED, 'a')]),
+            ([Event(CREATED, 'a'), Event(MODIFIED, 'a'), Event(DELETED, 'a')], []),
+            ([Event(MODIFIED, 'a'), Event(MODIFIED, 'b'), Event(MODIFIED, 'a')], [Event(MODIFIED, 'a'), Event(MODIFIED, 'b')]),
+            ([Event(MODIFIED, 'a'), Event(DELETED, 'a')], [Event(DELETED, 'a')]),
+            ([Event(DELETED, 'a'), Event(CREATED, 'a')], [Event(MODIFIED, 'a')]),
+            ([Event(CREATED, 'a'), Event(MOVED, 'a', 'b')], [Event(CREATED, 'b')]),
+            ([Event(MOVED, 'a', 'b'), Event(MODIFIED, 'b')], [Event(MOVED, 'a', 'b'), Event(MODIFIED, 'b')]),
+            )
+        for events, expected in tests:
+            self.assertEqual(expected, coalesce(events))
+
+
+class WatchMixin(object):
+    poll = False
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp(prefix='cuprum_test_')
+        os.mkdir(os.path.join(self.root, 'sub'))
+        open(os.path.join(self.root, 'sub', 'old'), 'w').close()
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def events(self, watcher):
+        result = set()
+        for batch in watcher:
+            if not batch:
+                return result
+            for e in batch:
+                dest = e.dest and os.path.relpath(e.dest, self.root)
+                result.add((e.kind, os.path.relpath(e.path, self.root), dest))
+
+    def watcher(self):
+        return watch(self.root, debounce=0.2, timeout=0.5, poll=self.poll, interval=0.05)
+
+    def test_changes(self):
+        w = self.watcher()
+        with open(os.path.join(self.root, 'new'), 'w') as fh:
+            fh.write('data')
+        with open(os.path.join(self.root, 'sub', 'old'), 'w') as fh:
+            fh.write('data')
+        self.assertEqual(
+                set([(CREATED, 'new', None), (MODIFIED, 'sub/old', None)]),
+                self.events(w))
+        os.rename(os.path.join(self.root, 'new'), os.path.join(self.root, 'sub', 'moved'))
+        os.remove(os.path.join(self.root, 'sub', 'old'))
+        self.assertEqual(
+                set([(MOVED, 'new', 'sub/moved'), (DELETED, 'sub/old', None)]),
+                self.events(w))
+
+    def test_new_directory(self):
+        w = self.watcher()
+        os.makedirs(os.path.join(self.root, 'a', 'b'))
+        open(os.path.join(self.root, 'a', 'b', 'file'), 'w').close()
+        self.assertEqual(
+                set([(CREATED, 'a', None), (CREATED, 'a/b', None), (CREATED, 'a/b/file', None)]),
+                self.events(w))
+        open(os.path.join(self.root, 'a', 'b', 'file2'), 'w').close()
+        self.assertEqual(set([(CREATED, 'a/b/file2', None)]), self.events(w))
+
+    def test_path_watch(self):
+        w = Path(self.root).watch(timeout=0.5, poll=self.poll, interval=0.05)
+        open(os.path.join(self.root, 'new'), 'w').close()
+        batch = next(w)
+        self.assertEqual(1, len(batch))
+        self.assertIsInstance(batch[0].path, Path)
+
+
+@unittest.skipUnless(HAVE_INOTIFY, 'inotify not available')
+class InotifyTestCase(WatchMixin, unittest.TestCase):
+    pass
+
+
+class PollTestCase(WatchMixin, unittest.TestCase):
+    poll = True